@@ -0,0 +1,359 @@
+import numpy as np
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Sequence
+import models
+import stats
+
+# Dimensions a report can group by; screening attributes are joined onto bookings by array index
+DIMENSIONS = ("genre", "movie", "theater", "hour", "weekday", "month")
+
+class AnalyticsError(ValueError):
+    pass
+
+@dataclass
+class Snapshot:
+    # Per booking
+    screening_index: np.ndarray
+    tickets: np.ndarray
+    revenue: np.ndarray
+    booking_month: np.ndarray
+    # Per screening
+    screening_movie_index: np.ndarray
+    screening_theater_id: np.ndarray
+    screening_price: np.ndarray
+    screening_hour: np.ndarray
+    screening_weekday: np.ndarray
+    screening_capacity: np.ndarray
+    # Per movie
+    movie_ids: np.ndarray
+    movie_genre_code: np.ndarray
+    genres: List[str]
+
+    def __len__(self) -> int:
+        return len(self.tickets)
+
+def datetimes(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[s]")
+
+def hour_of_day(times: np.ndarray) -> np.ndarray:
+    return ((times - times.astype("datetime64[D]")).astype("timedelta64[h]")).astype(np.int64)
+
+def day_of_week(times: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; shift so Monday is 0
+    return (times.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+def month_label(months: np.ndarray) -> List[str]:
+    return [str(month) for month in months.astype("datetime64[M]")]
+
+async def load_snapshot(db: AsyncSession, chunk_size: int = 100_000) -> Snapshot:
+    # Small dimension tables are read in one go; bookings are streamed in chunks and
+    # converted column by column, so no ORM object is ever built
+    movies = (await db.execute(select(models.Movie.id, models.Movie.genre).order_by(models.Movie.id))).all()
+    movie_ids = np.array([row.id for row in movies], dtype=np.int64)
+    genres, movie_genre_code = np.unique(
+        np.array([row.genre or "Unknown" for row in movies], dtype=object).astype(str), return_inverse=True
+    )
+
+    screenings = (await db.execute(
+        select(
+            models.Screening.id, models.Screening.movie_id, models.Screening.theater_id,
+            models.Screening.screening_time, models.Screening.price, models.Screening.available_seats,
+            models.Theater.total_seats
+        )
+        .outerjoin(models.Theater, models.Screening.theater_id == models.Theater.id)
+        .order_by(models.Screening.id)
+    )).all()
+    screening_ids = np.array([row.id for row in screenings], dtype=np.int64)
+    screening_times = datetimes([row.screening_time for row in screenings])
+
+    chunks: Dict[str, list] = {"screening_id": [], "tickets": [], "revenue": [], "booking_time": []}
+    result = await db.stream(
+        select(models.Booking.screening_id, models.Booking.num_seats, models.Booking.total_amount, models.Booking.booking_time)
+        .filter(stats.sold_bookings())
+        .execution_options(yield_per=chunk_size)
+    )
+    async for partition in result.partitions():
+        screening_id, tickets, revenue, booking_time = zip(*partition)
+        chunks["screening_id"].append(np.array(screening_id, dtype=np.int64))
+        chunks["tickets"].append(np.array([value or 0 for value in tickets], dtype=np.int64))
+        chunks["revenue"].append(np.array([value or 0.0 for value in revenue], dtype=np.float64))
+        chunks["booking_time"].append(datetimes(booking_time))
+
+    def concat(name, dtype):
+        return np.concatenate(chunks[name]) if chunks[name] else np.array([], dtype=dtype)
+
+    booking_screening_ids = concat("screening_id", np.int64)
+    screening_index = np.searchsorted(screening_ids, booking_screening_ids)
+    # Bookings pointing at a missing screening are dropped rather than attributed to a neighbour
+    known = (screening_index < len(screening_ids))
+    known[known] = screening_ids[screening_index[known]] == booking_screening_ids[known]
+
+    return Snapshot(
+        screening_index=screening_index[known],
+        tickets=concat("tickets", np.int64)[known],
+        revenue=concat("revenue", np.float64)[known],
+        booking_month=concat("booking_time", "datetime64[s]")[known].astype("datetime64[M]"),
+        screening_movie_index=np.clip(
+            np.searchsorted(movie_ids, np.array([row.movie_id for row in screenings], dtype=np.int64)),
+            0, max(len(movie_ids) - 1, 0)
+        ),
+        screening_theater_id=np.array([row.theater_id for row in screenings], dtype=np.int64),
+        screening_price=np.array([row.price for row in screenings], dtype=np.float64),
+        screening_hour=hour_of_day(screening_times),
+        screening_weekday=day_of_week(screening_times),
+        screening_capacity=np.array(
+            [row.total_seats or row.available_seats or 0 for row in screenings], dtype=np.int64
+        ),
+        movie_ids=movie_ids,
+        movie_genre_code=movie_genre_code.astype(np.int64),
+        genres=[str(genre) for genre in genres],
+    )
+
+def dimension_codes(snapshot: Snapshot, dimension: str):
+    # Integer codes per booking plus a function turning codes back into labels
+    screening = snapshot.screening_index
+    if dimension == "genre":
+        codes = snapshot.movie_genre_code[snapshot.screening_movie_index[screening]]
+        return codes, lambda values: [snapshot.genres[value] for value in values]
+    if dimension == "movie":
+        codes = snapshot.screening_movie_index[screening]
+        return codes, lambda values: [int(snapshot.movie_ids[value]) for value in values]
+    if dimension == "theater":
+        return snapshot.screening_theater_id[screening], lambda values: [int(value) for value in values]
+    if dimension == "hour":
+        return snapshot.screening_hour[screening], lambda values: [int(value) for value in values]
+    if dimension == "weekday":
+        return snapshot.screening_weekday[screening], lambda values: [int(value) for value in values]
+    if dimension == "month":
+        codes = snapshot.booking_month.astype(np.int64)
+        return codes, lambda values: month_label(np.array(values, dtype=np.int64).astype("datetime64[M]"))
+    raise AnalyticsError(f"Unknown dimension '{dimension}'; allowed: {', '.join(DIMENSIONS)}")
+
+# Above this many possible key combinations the group-by sorts instead of counting into a dense array
+DENSE_GROUP_LIMIT = 1 << 22
+
+def factorize(codes: np.ndarray):
+    # Distinct values and a dense 0..k-1 code per element; small integer ranges are
+    # counted directly instead of sorted
+    low, high = int(codes.min()), int(codes.max())
+    if high - low < DENSE_GROUP_LIMIT:
+        offset = codes - low
+        present = np.flatnonzero(np.bincount(offset, minlength=high - low + 1))
+        lookup = np.zeros(high - low + 1, dtype=np.int64)
+        lookup[present] = np.arange(len(present))
+        return present + low, lookup[offset]
+    return np.unique(codes, return_inverse=True)
+
+def group_by(snapshot: Snapshot, by: Sequence[str]) -> List[dict]:
+    # Bookings, tickets and revenue per distinct combination of the requested dimensions
+    if not by:
+        raise AnalyticsError("At least one dimension is required")
+    if len(snapshot) == 0:
+        return []
+
+    # Mixed-radix key over the factorized dimensions, so one bincount per metric does the grouping
+    columns = [dimension_codes(snapshot, dimension) for dimension in by]
+    factors = [factorize(codes) for codes, _ in columns]
+    sizes = [len(values) for values, _ in factors]
+    key = np.zeros(len(snapshot), dtype=np.int64)
+    for size, (_, inverse) in zip(sizes, factors):
+        key = key * size + inverse
+
+    combinations = int(np.prod(sizes, dtype=np.float64))
+    if combinations <= DENSE_GROUP_LIMIT:
+        groups = np.flatnonzero(np.bincount(key, minlength=combinations))
+        lookup = np.zeros(combinations, dtype=np.int64)
+        lookup[groups] = np.arange(len(groups))
+        inverse = lookup[key]
+    else:
+        groups, inverse = np.unique(key, return_inverse=True)
+    bookings = np.bincount(inverse, minlength=len(groups))
+    tickets = np.bincount(inverse, weights=snapshot.tickets, minlength=len(groups))
+    revenue = np.bincount(inverse, weights=snapshot.revenue, minlength=len(groups))
+
+    # Decode each group's key back into per-dimension values
+    positions = np.unravel_index(groups, sizes)
+    labels = [
+        labeler(values[position])
+        for position, (values, _), (_, labeler) in zip(positions, factors, columns)
+    ]
+    return [
+        {
+            **{dimension: labels[position][row] for position, dimension in enumerate(by)},
+            "bookings": int(bookings[row]),
+            "tickets": int(tickets[row]),
+            "revenue": round(float(revenue[row]), 2),
+        }
+        for row in np.argsort(-revenue, kind="stable")
+    ]
+
+def price_elasticity(snapshot: Snapshot, min_screenings: int = 3) -> List[dict]:
+    # Per theater, the least-squares slope of log(fill rate) on log(price) across its screenings.
+    # The price is what tickets actually sold for, revenue over tickets, not the screening's base
+    # price, since dynamic pricing moves the two apart
+    screening_count = len(snapshot.screening_price)
+    tickets = np.bincount(snapshot.screening_index, weights=snapshot.tickets, minlength=screening_count)
+    revenue = np.bincount(snapshot.screening_index, weights=snapshot.revenue, minlength=screening_count)
+    usable = (tickets > 0) & (revenue > 0) & (snapshot.screening_capacity > 0)
+
+    theater = snapshot.screening_theater_id[usable]
+    x = np.log(revenue[usable] / tickets[usable])
+    y = np.log(tickets[usable] / snapshot.screening_capacity[usable])
+    theaters, index = np.unique(theater, return_inverse=True)
+
+    n = np.bincount(index, minlength=len(theaters)).astype(np.float64)
+    sum_x = np.bincount(index, weights=x, minlength=len(theaters))
+    sum_y = np.bincount(index, weights=y, minlength=len(theaters))
+    sum_xy = np.bincount(index, weights=x * y, minlength=len(theaters))
+    sum_xx = np.bincount(index, weights=x * x, minlength=len(theaters))
+    denominator = n * sum_xx - sum_x ** 2
+
+    report = []
+    for row, theater_id in enumerate(theaters):
+        # A theater that always charges the same price has no slope to estimate
+        if n[row] < min_screenings or abs(denominator[row]) < 1e-12:
+            continue
+        report.append({
+            "theater": int(theater_id),
+            "screenings": int(n[row]),
+            "elasticity": round(float((n[row] * sum_xy[row] - sum_x[row] * sum_y[row]) / denominator[row]), 4),
+            "mean_price": round(float(np.exp(sum_x[row] / n[row])), 2),
+        })
+    return report
+
+def run_report(snapshot: Snapshot, report: str, by: Sequence[str] = ()) -> List[dict]:
+    if report == "group_by":
+        return group_by(snapshot, by)
+    if report == "elasticity":
+        return price_elasticity(snapshot)
+    raise AnalyticsError("report must be 'group_by' or 'elasticity'")
+
+def parse_dimensions(value: str) -> List[str]:
+    return [dimension.strip() for dimension in value.split(",") if dimension.strip()]
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import json
+    import random
+    import time
+    from collections import defaultdict
+    from datetime import datetime, timedelta
+
+    parser = argparse.ArgumentParser(description="Columnar analytics over bookings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="run a report against the configured database")
+    report_parser.add_argument("report", choices=["group_by", "elasticity"])
+    report_parser.add_argument("--by", default="genre,hour", help=f"comma separated, from {', '.join(DIMENSIONS)}")
+    benchmark_parser = commands.add_parser("benchmark", help="vectorised group-by versus a per-object Python loop")
+    benchmark_parser.add_argument("--bookings", type=int, default=10_000_000)
+    benchmark_parser.add_argument("--orm-bookings", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        from config import AsyncSessionLocal
+
+        async def run():
+            async with AsyncSessionLocal() as db:
+                snapshot = await load_snapshot(db)
+            print(json.dumps(run_report(snapshot, args.report, parse_dimensions(args.by)), indent=2))
+
+        asyncio.run(run())
+    else:
+        # Part 1: revenue by genre by hour at --bookings rows, arrays versus a loop over row objects
+        # holding the same attributes an ORM loop would touch. Part 2: the real end-to-end paths,
+        # ORM objects with joined relationships versus load_snapshot, on an in-memory SQLite database.
+        rng = np.random.default_rng(7)
+        movie_count, screening_count = 500, 20_000
+        genre_names = ["Action", "Drama", "Comedy", "Sci-Fi", "Thriller", "Crime"]
+        screening_times = np.datetime64("2024-01-01T10:00") + rng.integers(0, 365 * 24, screening_count).astype("timedelta64[h]")
+        snapshot = Snapshot(
+            screening_index=rng.integers(0, screening_count, args.bookings),
+            tickets=rng.integers(1, 6, args.bookings),
+            revenue=rng.integers(1, 6, args.bookings) * 250.0,
+            booking_month=np.full(args.bookings, np.datetime64("2024-01", "M")),
+            screening_movie_index=rng.integers(0, movie_count, screening_count),
+            screening_theater_id=rng.integers(1, 4, screening_count),
+            screening_price=rng.choice([200.0, 250.0, 300.0, 350.0], screening_count),
+            screening_hour=hour_of_day(screening_times.astype("datetime64[s]")),
+            screening_weekday=day_of_week(screening_times.astype("datetime64[s]")),
+            screening_capacity=np.full(screening_count, 150),
+            movie_ids=np.arange(1, movie_count + 1),
+            movie_genre_code=rng.integers(0, len(genre_names), movie_count),
+            genres=genre_names,
+        )
+
+        started = time.perf_counter()
+        vectorised = group_by(snapshot, ["genre", "hour"])
+        vectorised_seconds = time.perf_counter() - started
+
+        class Row:
+            __slots__ = ("genre", "hour", "tickets", "revenue")
+
+        hours = snapshot.screening_hour.tolist()
+        movie_genres = [genre_names[code] for code in snapshot.movie_genre_code[snapshot.screening_movie_index]]
+        rows = []
+        for screening, tickets, revenue in zip(snapshot.screening_index.tolist(), snapshot.tickets.tolist(), snapshot.revenue.tolist()):
+            row = Row()
+            row.genre, row.hour, row.tickets, row.revenue = movie_genres[screening], hours[screening], tickets, revenue
+            rows.append(row)
+        started = time.perf_counter()
+        totals = defaultdict(float)
+        for row in rows:
+            totals[(row.genre, row.hour)] += row.revenue
+        loop_seconds = time.perf_counter() - started
+        del rows
+        assert abs(sum(totals.values()) - sum(group["revenue"] for group in vectorised)) < 1e-3 * args.bookings
+        print(f"group-by genre,hour over {args.bookings:,} bookings: numpy {vectorised_seconds:.2f}s, "
+              f"object loop {loop_seconds:.2f}s ({loop_seconds / vectorised_seconds:.1f}x)")
+
+        from sqlalchemy import insert
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.orm import joinedload
+
+        async def orm_benchmark():
+            engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+            async with engine.begin() as connection:
+                await connection.run_sync(models.Base.metadata.create_all)
+            session_factory = async_sessionmaker(engine, expire_on_commit=False)
+            random.seed(7)
+            async with session_factory() as db:
+                await db.execute(insert(models.Theater), [{"id": i, "name": f"T{i}", "total_seats": 150} for i in range(1, 4)])
+                await db.execute(insert(models.Movie), [
+                    {"id": i, "title": f"M{i}", "description": "", "duration": 120, "release_date": datetime(2020, 1, 1),
+                     "genre": random.choice(genre_names), "rating": 7.0} for i in range(1, 201)
+                ])
+                await db.execute(insert(models.Screening), [
+                    {"id": i, "movie_id": random.randint(1, 200), "theater_id": random.randint(1, 3),
+                     "screening_time": datetime(2024, 1, 1) + timedelta(hours=random.randint(0, 8760)),
+                     "price": random.choice([200.0, 300.0]), "available_seats": 150} for i in range(1, 2001)
+                ])
+                for start in range(0, args.orm_bookings, 50_000):
+                    await db.execute(insert(models.Booking), [
+                        {"user_id": 1, "screening_id": random.randint(1, 2000), "num_seats": 2, "total_amount": 500.0,
+                         "booking_time": datetime(2024, 1, 1), "status": "confirmed"}
+                        for _ in range(start, min(start + 50_000, args.orm_bookings))
+                    ])
+                await db.commit()
+
+            async with session_factory() as db:
+                started = time.perf_counter()
+                totals = defaultdict(float)
+                bookings = await db.scalars(
+                    select(models.Booking).options(joinedload(models.Booking.screening).joinedload(models.Screening.movie))
+                )
+                for booking in bookings:
+                    totals[(booking.screening.movie.genre, booking.screening.screening_time.hour)] += booking.total_amount
+                orm_seconds = time.perf_counter() - started
+
+            async with session_factory() as db:
+                started = time.perf_counter()
+                group_by(await load_snapshot(db), ["genre", "hour"])
+                snapshot_seconds = time.perf_counter() - started
+            await engine.dispose()
+            print(f"end to end over {args.orm_bookings:,} bookings in SQLite: snapshot {snapshot_seconds:.2f}s, "
+                  f"ORM loop {orm_seconds:.2f}s ({orm_seconds / snapshot_seconds:.1f}x)")
+
+        asyncio.run(orm_benchmark())
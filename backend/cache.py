@@ -0,0 +1,92 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+class TTLCache:
+    # Bounded LRU cache whose entries also expire after ttl_seconds
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def keys(self):
+        return list(self.entries.keys())
+
+class ResponseCache:
+    # Serialised JSON responses with ETags. Any backend with get/set/invalidate/keys/stats
+    # (such as TTLCache, or a shared store adapter) can be plugged in.
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def make_key(namespace: str, **params) -> str:
+        query = urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+        return f"{namespace}?{query}"
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.backend.get(key)
+
+    def put(self, key: str, body: bytes) -> dict:
+        entry = {"etag": f'"{hashlib.sha1(body).hexdigest()}"', "body": body}
+        self.backend.set(key, entry)
+        return entry
+
+    def invalidate(self, key: str):
+        self.backend.invalidate(key)
+
+    def invalidate_where(self, namespace: str, predicate: Callable[[dict], bool]):
+        invalidate_where(self.backend, namespace, predicate)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+def invalidate_where(backend, namespace: str, predicate: Callable[[dict], bool]):
+    # Drop only the entries in a namespace whose parameters the change can affect;
+    # parameters are recovered from the key, so entries are not read (or counted as hits)
+    prefix = f"{namespace}?"
+    for key in backend.keys():
+        if key.startswith(prefix) and predicate(dict(parse_qsl(key[len(prefix):]))):
+            backend.invalidate(key)
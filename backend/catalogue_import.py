@@ -0,0 +1,256 @@
+import asyncio
+import csv
+import json
+from dataclasses import dataclass, field
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import models
+import schemas
+
+MOVIE_FIELDS = ("title", "description", "duration", "release_date", "genre", "rating", "image_url")
+movie_adapter = TypeAdapter(schemas.MovieCreate)
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    conflicts: int = 0
+    errors: List[dict] = field(default_factory=list)
+    max_errors: int = 1000
+
+    def add_error(self, row: int, errors):
+        # Every failure is counted; only the first max_errors are kept for the report
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted, "updated": self.updated, "failed": self.failed,
+            "conflicts": self.conflicts, "errors": self.errors,
+        }
+
+def iter_csv_records(stream: TextIO) -> Iterator[dict]:
+    # Empty cells are treated as missing so optional fields fall back to their defaults
+    for record in csv.DictReader(stream):
+        yield {key: value for key, value in record.items() if key and value not in ("", None)}
+
+def iter_json_records(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    # Accepts a top-level JSON array or newline-delimited objects, decoding one object at a time
+    # from a rolling buffer so the document is never held in memory whole
+    decoder = json.JSONDecoder()
+    buffer, position, exhausted, started = "", 0, False, False
+
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) or exhausted:
+                break
+            chunk = stream.read(chunk_size)
+            buffer, position, exhausted = buffer[position:] + chunk, 0, not chunk
+        if position >= len(buffer):
+            return
+
+        if not started:
+            started = True
+            if buffer[position] == "[":
+                position += 1
+                continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Most likely an object cut off at the end of the buffer; read more and retry
+            if exhausted:
+                raise
+            chunk = stream.read(chunk_size)
+            buffer, position, exhausted = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield record
+
+def iter_records(stream: TextIO, format: str) -> Iterator[dict]:
+    if format == "csv":
+        return iter_csv_records(stream)
+    if format == "json":
+        return iter_json_records(stream)
+    raise ValueError("format must be 'csv' or 'json'")
+
+def normalize_record(record):
+    # Catalogues usually carry plain dates; the schema expects a datetime
+    release_date = record.get("release_date") if isinstance(record, dict) else None
+    if isinstance(release_date, str) and len(release_date) == 10:
+        record = {**record, "release_date": f"{release_date}T00:00:00"}
+    return record
+
+def read_batch(records: Iterator[dict], size: int, first_row: int, report: ImportReport) -> Tuple[Dict, Dict, int]:
+    # Reads and validates up to size records; returns the valid movies keyed for upsert, the row
+    # each of them came from and the rows consumed
+    movies: Dict[Tuple[str, object], dict] = {}
+    rows: Dict[Tuple[str, object], int] = {}
+    consumed = 0
+    for record in records:
+        consumed += 1
+        try:
+            movie = movie_adapter.validate_python(normalize_record(record))
+        except ValidationError as e:
+            report.add_error(first_row + consumed, [
+                {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+                for error in e.errors()
+            ])
+        else:
+            values = movie.model_dump(include=set(MOVIE_FIELDS))
+            # A later row for the same movie in the same batch wins, as it would across batches
+            movies[(values["title"], values["release_date"])] = values
+            rows[(values["title"], values["release_date"])] = first_row + consumed
+        if consumed >= size:
+            break
+    return movies, rows, consumed
+
+async def upsert_batch(db: AsyncSession, movies: Dict[Tuple[str, object], dict]) -> Tuple[int, int]:
+    # Existing movies are matched on (title, release_date); matches are updated by primary key,
+    # the rest inserted, each side as a single executemany
+    keys = list(movies)
+    existing = dict(
+        ((row.title, row.release_date), row.id)
+        for row in (await db.execute(
+            select(models.Movie.id, models.Movie.title, models.Movie.release_date).filter(
+                tuple_(models.Movie.title, models.Movie.release_date).in_(keys)
+            )
+        )).all()
+    )
+    updates = [{"id": existing[key], **values} for key, values in movies.items() if key in existing]
+    inserts = [values for key, values in movies.items() if key not in existing]
+    if updates:
+        await db.execute(update(models.Movie), updates)
+    if inserts:
+        await db.execute(insert(models.Movie), inserts)
+    return len(inserts), len(updates)
+
+async def upsert_each(db: AsyncSession, movies: Dict[Tuple[str, object], dict], rows: Dict, report: ImportReport) -> Tuple[int, int]:
+    # Last resort when a batch keeps conflicting: one savepoint per movie, so only the movies
+    # that still clash are reported and the rest of the batch is kept
+    inserted = updated = 0
+    for key, values in movies.items():
+        try:
+            async with db.begin_nested():
+                added, changed = await upsert_batch(db, {key: values})
+        except IntegrityError:
+            report.conflicts += 1
+            report.add_error(rows[key], [{
+                "field": "title", "message": "Conflicts with a movie written by a concurrent import; retry the row"
+            }])
+        else:
+            inserted += added
+            updated += changed
+    await db.commit()
+    return inserted, updated
+
+async def import_movies(
+    db: AsyncSession,
+    records: Iterable[dict],
+    batch_size: int = 5000,
+    max_errors: int = 1000,
+    on_batch: Optional[Callable[[List[tuple]], None]] = None,
+    report: Optional[ImportReport] = None
+) -> ImportReport:
+    # A report passed in keeps the counts of committed batches if a later batch fails
+    report = report or ImportReport(max_errors=max_errors)
+    records = iter(records)
+    row_number = 0
+    while True:
+        # Reading and validating is blocking work, so it runs in a worker thread between database round trips
+        movies, rows, consumed = await asyncio.to_thread(read_batch, records, batch_size, row_number, report)
+        if not consumed:
+            break
+        row_number += consumed
+        if not movies:
+            continue
+
+        try:
+            inserted, updated = await upsert_batch(db, movies)
+            await db.commit()
+        except IntegrityError:
+            # A concurrent import inserted some of these movies first; they are updates now
+            await db.rollback()
+            try:
+                inserted, updated = await upsert_batch(db, movies)
+                await db.commit()
+            except IntegrityError:
+                # It raced again; settle the batch movie by movie instead of failing the import
+                await db.rollback()
+                inserted, updated = await upsert_each(db, movies, rows, report)
+        report.inserted += inserted
+        report.updated += updated
+
+        if on_batch:
+            on_batch((await db.execute(
+                select(models.Movie.id, models.Movie.title, models.Movie.description, models.Movie.genre).filter(
+                    tuple_(models.Movie.title, models.Movie.release_date).in_(list(movies))
+                )
+            )).all())
+    return report
+
+if __name__ == "__main__":
+    # python catalogue_import.py movies.csv
+    # python catalogue_import.py --benchmark 1000000
+    import argparse
+    import asyncio
+    import os
+    import random
+    import tempfile
+    import time
+    from config import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import movies from a CSV or JSON catalogue")
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--format", choices=["csv", "json"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="import ROWS synthetic movies into in-memory SQLite")
+    args = parser.parse_args()
+
+    async def run(path: str, format: str, session_factory):
+        started = time.perf_counter()
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            async with session_factory() as db:
+                report = await import_movies(db, iter_records(stream, format), args.batch_size)
+        elapsed = time.perf_counter() - started
+        summary = report.as_dict()
+        summary["errors"] = summary["errors"][:20]
+        print(json.dumps(summary, indent=2, default=str))
+        print(f"{report.inserted + report.updated + report.failed} rows in {elapsed:.1f}s")
+
+    if args.benchmark:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        async def benchmark():
+            engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+            async with engine.begin() as connection:
+                await connection.run_sync(models.Base.metadata.create_all)
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as catalogue:
+                writer = csv.writer(catalogue)
+                writer.writerow(MOVIE_FIELDS)
+                for number in range(args.benchmark):
+                    writer.writerow([
+                        f"Movie {number}", "A synthetic catalogue entry", random.randint(80, 180),
+                        f"{random.randint(1950, 2024)}-{random.randint(1, 12):02d}-01", "Drama",
+                        round(random.uniform(1, 10), 1), f"https://example.com/{number}.jpg",
+                    ])
+            try:
+                await run(catalogue.name, "csv", async_sessionmaker(engine, expire_on_commit=False))
+            finally:
+                os.unlink(catalogue.name)
+                await engine.dispose()
+
+        asyncio.run(benchmark())
+    else:
+        if not args.path:
+            parser.error("path is required unless --benchmark is given")
+        format = args.format or ("json" if args.path.endswith((".json", ".ndjson", ".jsonl")) else "csv")
+        asyncio.run(run(args.path, format, AsyncSessionLocal))
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -12,20 +14,200 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Defaults to DATABASE_URL with its driver swapped for the async one (aiomysql, aiosqlite)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
 
-# Create SQLAlchemy engine
+# Connection pool settings for the async engine
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Password hashing pool
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+# Authenticated principal cache
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+# Movie catalogue response cache
+MOVIE_CACHE_SIZE = int(os.getenv("MOVIE_CACHE_SIZE", "1024"))
+MOVIE_CACHE_TTL_SECONDS = float(os.getenv("MOVIE_CACHE_TTL_SECONDS", "300"))
+MOVIE_COUNT_CACHE_TTL_SECONDS = float(os.getenv("MOVIE_COUNT_CACHE_TTL_SECONDS", "600"))
+MOVIE_PAGE_MAX_LIMIT = int(os.getenv("MOVIE_PAGE_MAX_LIMIT", "100"))
+
+# Movie search index
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+SEARCH_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_PREFIX_EXPANSIONS", "50"))
+
+# Admin bookings listing and export
+BOOKING_PAGE_MAX_LIMIT = int(os.getenv("BOOKING_PAGE_MAX_LIMIT", "500"))
+BOOKING_EXPORT_BATCH_SIZE = int(os.getenv("BOOKING_EXPORT_BATCH_SIZE", "1000"))
+
+# Columnar analytics snapshots
+ANALYTICS_CHUNK_SIZE = int(os.getenv("ANALYTICS_CHUNK_SIZE", "100000"))
+ANALYTICS_SNAPSHOT_TTL_SECONDS = float(os.getenv("ANALYTICS_SNAPSHOT_TTL_SECONDS", "300"))
+
+# Bulk screening scheduler
+SCHEDULE_MAX_SLOTS = int(os.getenv("SCHEDULE_MAX_SLOTS", "5000"))
+SCHEDULE_TURNAROUND_MINUTES = int(os.getenv("SCHEDULE_TURNAROUND_MINUTES", "15"))
+SCHEDULE_SEAT_BATCH_SIZE = int(os.getenv("SCHEDULE_SEAT_BATCH_SIZE", "10000"))
+
+# Bulk catalogue import
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+# Idempotency keys for retried booking requests
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# Payments; the provider is "stripe", "stub" (local development) or empty to confirm bookings immediately
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_ENDPOINT_SECRET = os.getenv("STRIPE_ENDPOINT_SECRET")
+PAYMENT_PROVIDER = os.getenv("PAYMENT_PROVIDER", "stripe" if STRIPE_SECRET_KEY else "").lower()
+PAYMENT_CURRENCY = os.getenv("PAYMENT_CURRENCY", "inr")
+PAYMENT_QUEUE_POLL_SECONDS = float(os.getenv("PAYMENT_QUEUE_POLL_SECONDS", "5"))
+PAYMENT_QUEUE_BATCH_SIZE = int(os.getenv("PAYMENT_QUEUE_BATCH_SIZE", "200"))
+PAYMENT_PENDING_TTL_MINUTES = int(os.getenv("PAYMENT_PENDING_TTL_MINUTES", "15"))
+
+# Background jobs and notification email; without SMTP_HOST messages are kept in memory instead of sent
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@movietickets.local")
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "100"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "8"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "72"))
+REMINDER_LEAD_HOURS = float(os.getenv("REMINDER_LEAD_HOURS", "3"))
+
+# Dynamic pricing; off by default, so every seat costs the flat screening price until enabled
+PRICING_DYNAMIC_ENABLED = os.getenv("PRICING_DYNAMIC_ENABLED", "false").lower() == "true"
+PRICING_MIN_FACTOR = float(os.getenv("PRICING_MIN_FACTOR", "0.7"))
+PRICING_MAX_FACTOR = float(os.getenv("PRICING_MAX_FACTOR", "1.6"))
+PRICING_CACHE_SIZE = int(os.getenv("PRICING_CACHE_SIZE", "10000"))
+PRICING_TABLE_TTL_SECONDS = float(os.getenv("PRICING_TABLE_TTL_SECONDS", "60"))
+
+# Per-day showtime index behind GET /screenings
+SHOWTIME_INDEX_DAYS = int(os.getenv("SHOWTIME_INDEX_DAYS", "31"))
+SHOWTIME_INDEX_TTL_SECONDS = float(os.getenv("SHOWTIME_INDEX_TTL_SECONDS", "60"))
+SHOWTIME_DEFAULT_WINDOW_HOURS = float(os.getenv("SHOWTIME_DEFAULT_WINDOW_HOURS", "6"))
+SHOWTIME_MAX_WINDOW_DAYS = int(os.getenv("SHOWTIME_MAX_WINDOW_DAYS", "7"))
+SHOWTIME_MAX_RESULTS = int(os.getenv("SHOWTIME_MAX_RESULTS", "500"))
+
+# Rate limiting and admission control; the backend is "memory" or "redis" (shared across workers)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_BOOKING_PER_SECOND = float(os.getenv("RATE_LIMIT_BOOKING_PER_SECOND", "1"))
+RATE_LIMIT_BOOKING_BURST = float(os.getenv("RATE_LIMIT_BOOKING_BURST", "10"))
+RATE_LIMIT_AUTH_PER_SECOND = float(os.getenv("RATE_LIMIT_AUTH_PER_SECOND", "0.5"))
+RATE_LIMIT_AUTH_BURST = float(os.getenv("RATE_LIMIT_AUTH_BURST", "5"))
+RATE_LIMIT_BROWSE_PER_SECOND = float(os.getenv("RATE_LIMIT_BROWSE_PER_SECOND", "10"))
+RATE_LIMIT_BROWSE_BURST = float(os.getenv("RATE_LIMIT_BROWSE_BURST", "40"))
+# IP buckets are this many times a user's, since many users can share an address
+RATE_LIMIT_IP_MULTIPLIER = float(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "4"))
+# Addresses or CIDR ranges of the reverse proxies in front of the API. X-Forwarded-For is only
+# read from these, so clients are limited by their own address rather than the proxy's; leave
+# empty when clients connect directly, or when uvicorn runs with --proxy-headers and
+# --forwarded-allow-ips, which already puts the client's address on the request
+RATE_LIMIT_TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if proxy.strip()]
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "1000"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+ADMISSION_MAX_QUEUED_PER_CLIENT = int(os.getenv("ADMISSION_MAX_QUEUED_PER_CLIENT", "4"))
+
+# Waiting rooms for high-demand screenings; booking commits for them are paced to the target
+# write rate, lowered when commit latency says the pool would run above the target utilization
+WAITING_ROOM_TARGET_WRITES_PER_SECOND = float(os.getenv("WAITING_ROOM_TARGET_WRITES_PER_SECOND", "50"))
+WAITING_ROOM_DB_UTILIZATION = float(os.getenv("WAITING_ROOM_DB_UTILIZATION", "0.5"))
+WAITING_ROOM_HEADROOM = float(os.getenv("WAITING_ROOM_HEADROOM", "0.9"))
+WAITING_ROOM_MAX_ACTIVE = int(os.getenv("WAITING_ROOM_MAX_ACTIVE", "2000"))
+WAITING_ROOM_ADMISSION_SECONDS = float(os.getenv("WAITING_ROOM_ADMISSION_SECONDS", "600"))
+WAITING_ROOM_HEARTBEAT_SECONDS = float(os.getenv("WAITING_ROOM_HEARTBEAT_SECONDS", "60"))
+WAITING_ROOM_TICK_SECONDS = float(os.getenv("WAITING_ROOM_TICK_SECONDS", "0.5"))
+WAITING_ROOM_TICKET_HOURS = float(os.getenv("WAITING_ROOM_TICKET_HOURS", "6"))
+WAITING_ROOM_MAX_COMMIT_WAIT_SECONDS = float(os.getenv("WAITING_ROOM_MAX_COMMIT_WAIT_SECONDS", "5"))
+
+# Workers started by `python main.py`. Caches are per worker and kept consistent through the
+# invalidation bus: "db" polls a shared table, "redis" uses pub/sub, "local" is for one process.
+# Seat holds, idempotency keys and waiting rooms are shared through the database with
+# STATE_STORE=db, so any number of workers can serve one database; "memory" keeps them in the
+# process and is only correct with a single worker.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+STATE_STORE = os.getenv("STATE_STORE", "db").lower()
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "db").lower()
+INVALIDATION_REDIS_URL = os.getenv("INVALIDATION_REDIS_URL", "redis://localhost:6379/0")
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "0.5"))
+INVALIDATION_RETENTION_MINUTES = int(os.getenv("INVALIDATION_RETENTION_MINUTES", "60"))
+
+# Read replicas for catalogue and booking history reads, comma-separated in the same form as
+# DATABASE_URL; without any every read uses the primary
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_HEARTBEAT_SECONDS = float(os.getenv("REPLICA_HEARTBEAT_SECONDS", "1"))
+
+# Seat hold settings
+HOLD_TTL_MINUTES = int(os.getenv("HOLD_TTL_MINUTES", "10"))
+HOLD_SWEEP_INTERVAL_SECONDS = float(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "5"))
+HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "500"))
+
+# Real-time seat updates
+REALTIME_COALESCE_MS = int(os.getenv("REALTIME_COALESCE_MS", "100"))
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "32"))
+
+# Seat map layout
+SEATS_PER_ROW = int(os.getenv("SEATS_PER_ROW", "12"))
+
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def get_async_database_url(url: str) -> str:
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    return database_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def get_pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # SQLite's async dialect opens a connection per checkout and takes no sizing options
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+# Create SQLAlchemy engine (synchronous, used for schema creation and scripts)
 engine = create_engine(DATABASE_URL)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions used by the API
+ASYNC_DATABASE_URL = ASYNC_DATABASE_URL or get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Async sessions on each read replica, handed out by the replica router in main.py; the engines
+# are kept so shutdown can dispose of their pools
+replica_engines = []
+ReplicaSessionLocals = []
+for replica_url in REPLICA_DATABASE_URLS:
+    replica_async_url = get_async_database_url(replica_url)
+    replica_engines.append(create_async_engine(replica_async_url, **get_pool_options(replica_async_url)))
+    ReplicaSessionLocals.append(async_sessionmaker(
+        replica_engines[-1], class_=AsyncSession, autoflush=False, expire_on_commit=False
+    ))
+
 # Create Base class
 Base = declarative_base()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close() 
\ No newline at end of file
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
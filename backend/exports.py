@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+# Column order of export rows; matches BookingSummary so NDJSON lines and CSV rows carry the same fields
+BOOKING_EXPORT_FIELDS = (
+    "id", "user_id", "username", "screening_id", "movie_title", "screening_time",
+    "num_seats", "seats", "total_amount", "booking_time", "status",
+)
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def export_record(row, fields: Sequence[str]) -> dict:
+    return {field: export_value(getattr(row, field)) for field in fields}
+
+async def ndjson_lines(rows: AsyncIterator, fields: Sequence[str] = BOOKING_EXPORT_FIELDS) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield (json.dumps(export_record(row, fields), separators=(",", ":")) + "\n").encode()
+
+async def csv_lines(rows: AsyncIterator, fields: Sequence[str] = BOOKING_EXPORT_FIELDS) -> AsyncIterator[bytes]:
+    # One small buffer reused per row, so memory does not grow with the export
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for row in rows:
+        record = export_record(row, fields)
+        if isinstance(record.get("seats"), list):
+            record["seats"] = " ".join(str(seat) for seat in record["seats"])
+        writer.writerow(record[field] for field in fields)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+class HashingPoolSaturated(Exception):
+    pass
+
+class PasswordHasher:
+    # bcrypt releases the GIL, so a small thread pool hashes in parallel without blocking the event loop.
+    # Work beyond workers + max_queue is rejected instead of piling up behind a login storm.
+    def __init__(self, workers: int, max_queue: int, rounds: int):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HashingPoolSaturated()
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,275 @@
+import asyncio
+import heapq
+import inspect
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional
+import models
+
+@dataclass
+class Hold:
+    hold_id: str
+    screening_id: int
+    user_id: int
+    seats: List[int]
+    expires_at: datetime
+
+class SeatHeldError(Exception):
+    def __init__(self, seats: List[int]):
+        super().__init__(f"Seats already held: {seats}")
+        self.seats = seats
+
+class HoldStore(ABC):
+    # Interface for hold backends: the database store when STATE_STORE is db, so every worker sees
+    # the same holds, or the in-memory store for a single process
+
+    @abstractmethod
+    async def create(self, screening_id: int, user_id: int, seats: List[int], ttl: timedelta) -> Hold:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, hold_id: str) -> Optional[Hold]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, hold_id: str) -> Optional[Hold]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def held_seats(self, screening_id: int, exclude_user_id: Optional[int] = None) -> Dict[int, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def sweep(self, now: datetime, batch_size: int) -> List[Hold]:
+        raise NotImplementedError
+
+@dataclass
+class InMemoryHoldStore(HoldStore):
+    holds: Dict[str, Hold] = field(default_factory=dict)
+    # screening_id -> seat_number -> hold_id
+    seat_index: Dict[int, Dict[int, str]] = field(default_factory=dict)
+    # (expires_at, hold_id) min-heap, so a sweep only touches holds that have actually expired
+    expiry_heap: list = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    async def create(self, screening_id: int, user_id: int, seats: List[int], ttl: timedelta) -> Hold:
+        now = datetime.utcnow()
+        with self.lock:
+            seat_holds = self.seat_index.setdefault(screening_id, {})
+            taken = [
+                seat for seat in seats
+                if seat in seat_holds and self._is_live(seat_holds[seat], now)
+                and self.holds[seat_holds[seat]].user_id != user_id
+            ]
+            if taken:
+                raise SeatHeldError(taken)
+
+            hold = Hold(
+                hold_id=uuid.uuid4().hex,
+                screening_id=screening_id,
+                user_id=user_id,
+                seats=sorted(seats),
+                expires_at=now + ttl
+            )
+            # A user re-holding a seat moves it out of their previous hold; the previous hold keeps
+            # its other seats, so nothing is released without being announced
+            for previous_id in {seat_holds[seat] for seat in seats if seat in seat_holds}:
+                previous = self.holds.get(previous_id)
+                if previous is None:
+                    continue
+                remaining = [seat for seat in previous.seats if seat not in hold.seats]
+                if remaining:
+                    previous.seats = remaining
+                else:
+                    self._remove(previous)
+            self.holds[hold.hold_id] = hold
+            for seat in hold.seats:
+                seat_holds[seat] = hold.hold_id
+            heapq.heappush(self.expiry_heap, (hold.expires_at, hold.hold_id))
+            return hold
+
+    async def get(self, hold_id: str) -> Optional[Hold]:
+        with self.lock:
+            hold = self.holds.get(hold_id)
+            if hold and hold.expires_at <= datetime.utcnow():
+                return None
+            return hold
+
+    async def release(self, hold_id: str) -> Optional[Hold]:
+        with self.lock:
+            hold = self.holds.get(hold_id)
+            if hold:
+                self._remove(hold)
+            return hold
+
+    async def held_seats(self, screening_id: int, exclude_user_id: Optional[int] = None) -> Dict[int, str]:
+        now = datetime.utcnow()
+        with self.lock:
+            return {
+                seat: hold_id
+                for seat, hold_id in self.seat_index.get(screening_id, {}).items()
+                if self._is_live(hold_id, now) and self.holds[hold_id].user_id != exclude_user_id
+            }
+
+    async def sweep(self, now: datetime, batch_size: int) -> List[Hold]:
+        expired = []
+        with self.lock:
+            while self.expiry_heap and len(expired) < batch_size:
+                expires_at, hold_id = self.expiry_heap[0]
+                if expires_at > now:
+                    break
+                heapq.heappop(self.expiry_heap)
+                hold = self.holds.get(hold_id)
+                # Released or replaced holds leave stale heap entries behind
+                if hold and hold.expires_at == expires_at:
+                    self._remove(hold)
+                    expired.append(hold)
+        return expired
+
+    def _is_live(self, hold_id: str, now: datetime) -> bool:
+        hold = self.holds.get(hold_id)
+        return hold is not None and hold.expires_at > now
+
+    def _remove(self, hold: Hold):
+        self.holds.pop(hold.hold_id, None)
+        seat_holds = self.seat_index.get(hold.screening_id, {})
+        for seat in hold.seats:
+            if seat_holds.get(seat) == hold.hold_id:
+                del seat_holds[seat]
+        if not seat_holds:
+            self.seat_index.pop(hold.screening_id, None)
+
+class DatabaseHoldStore(HoldStore):
+    # Holds in the seat_holds table with one held_seats row per seat. The seat rows' primary key
+    # is what stops two workers holding the same seat: a concurrent hold on it fails its insert.
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def create(self, screening_id: int, user_id: int, seats: List[int], ttl: timedelta) -> Hold:
+        now = datetime.utcnow()
+        hold = Hold(
+            hold_id=uuid.uuid4().hex,
+            screening_id=screening_id,
+            user_id=user_id,
+            seats=sorted(seats),
+            expires_at=now + ttl
+        )
+        async with self.session_factory() as db:
+            rows = (await db.scalars(
+                select(models.HeldSeat)
+                .filter(models.HeldSeat.screening_id == screening_id, models.HeldSeat.seat_number.in_(seats))
+                .with_for_update()
+            )).all()
+            taken = sorted(row.seat_number for row in rows if row.expires_at > now and row.user_id != user_id)
+            if taken:
+                raise SeatHeldError(taken)
+
+            # As in memory, the user's previous holds and lapsed ones give up only these seats
+            previous_ids = {row.hold_id for row in rows}
+            if previous_ids:
+                await db.execute(delete(models.HeldSeat).where(
+                    models.HeldSeat.screening_id == screening_id,
+                    models.HeldSeat.seat_number.in_(seats),
+                    models.HeldSeat.hold_id.in_(previous_ids)
+                ))
+                for previous in (await db.scalars(
+                    select(models.SeatHold).filter(models.SeatHold.hold_id.in_(previous_ids)).with_for_update()
+                )).all():
+                    remaining = [seat for seat in previous.seats if seat not in hold.seats]
+                    if remaining:
+                        previous.seats = remaining
+                    else:
+                        await db.delete(previous)
+            db.add(models.SeatHold(
+                hold_id=hold.hold_id, screening_id=screening_id, user_id=user_id, seats=hold.seats,
+                expires_at=hold.expires_at
+            ))
+            db.add_all([
+                models.HeldSeat(
+                    screening_id=screening_id, seat_number=seat, hold_id=hold.hold_id, user_id=user_id,
+                    expires_at=hold.expires_at
+                )
+                for seat in hold.seats
+            ])
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker held one of the seats since they were read
+                await db.rollback()
+                raise SeatHeldError(hold.seats)
+        return hold
+
+    async def get(self, hold_id: str) -> Optional[Hold]:
+        async with self.session_factory() as db:
+            row = await db.get(models.SeatHold, hold_id)
+            if row is None or row.expires_at <= datetime.utcnow():
+                return None
+            return self._hold(row)
+
+    async def release(self, hold_id: str) -> Optional[Hold]:
+        async with self.session_factory() as db:
+            row = await db.get(models.SeatHold, hold_id)
+            if row is None:
+                return None
+            await db.execute(delete(models.HeldSeat).where(models.HeldSeat.hold_id == hold_id))
+            await db.execute(delete(models.SeatHold).where(models.SeatHold.hold_id == hold_id))
+            await db.commit()
+            return self._hold(row)
+
+    async def held_seats(self, screening_id: int, exclude_user_id: Optional[int] = None) -> Dict[int, str]:
+        query = select(models.HeldSeat.seat_number, models.HeldSeat.hold_id).filter(
+            models.HeldSeat.screening_id == screening_id, models.HeldSeat.expires_at > datetime.utcnow()
+        )
+        if exclude_user_id is not None:
+            query = query.filter(models.HeldSeat.user_id != exclude_user_id)
+        async with self.session_factory() as db:
+            return dict((await db.execute(query)).all())
+
+    async def sweep(self, now: datetime, batch_size: int) -> List[Hold]:
+        # Workers sweeping at once skip each other's locked rows where the database supports it;
+        # elsewhere a hold may be reported twice, which only repeats its release announcement
+        async with self.session_factory() as db:
+            rows = (await db.scalars(
+                select(models.SeatHold)
+                .filter(models.SeatHold.expires_at <= now)
+                .order_by(models.SeatHold.expires_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return []
+            hold_ids = [row.hold_id for row in rows]
+            await db.execute(delete(models.HeldSeat).where(models.HeldSeat.hold_id.in_(hold_ids)))
+            await db.execute(delete(models.SeatHold).where(models.SeatHold.hold_id.in_(hold_ids)))
+            await db.commit()
+            return [self._hold(row) for row in rows]
+
+    def _hold(self, row: models.SeatHold) -> Hold:
+        return Hold(
+            hold_id=row.hold_id,
+            screening_id=row.screening_id,
+            user_id=row.user_id,
+            seats=list(row.seats or []),
+            expires_at=row.expires_at
+        )
+
+async def run_sweeper(store: HoldStore, interval_seconds: float, batch_size: int, on_expired=None):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        # Drain in batches, yielding to the event loop between them
+        while True:
+            expired = store.sweep(datetime.utcnow(), batch_size)
+            if inspect.isawaitable(expired):
+                expired = await expired
+            if expired and on_expired:
+                result = on_expired(expired)
+                if inspect.isawaitable(result):
+                    await result
+            if len(expired) < batch_size:
+                break
+            await asyncio.sleep(0)
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import heapq
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional
+import models
+
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    expires_at: datetime
+    # Filled in once the first request finishes successfully
+    status_code: Optional[int] = None
+    body: Optional[bytes] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+class IdempotencyKeyReused(Exception):
+    # The key was already used for a request with a different body
+    pass
+
+class IdempotencyInProgress(Exception):
+    # The original request is still running after the wait timed out
+    pass
+
+def fingerprint(method: str, path: str, payload: dict) -> str:
+    canonical = json.dumps({"method": method, "path": path, "body": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class IdempotencyStore(ABC):
+    # Interface for idempotency backends: the database store when STATE_STORE is db, so a retry
+    # landing on another worker still replays, or the in-memory store for a single process
+
+    @abstractmethod
+    async def begin(self, key: str, fingerprint: str, ttl: timedelta, wait_seconds: float) -> Optional[IdempotencyRecord]:
+        # None means the caller owns the key and must complete or release it;
+        # otherwise the stored result of the original request is returned for replay
+        raise NotImplementedError
+
+    @abstractmethod
+    async def complete(self, key: str, status_code: int, body: bytes, ttl: timedelta):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def sweep(self, now: datetime, batch_size: int) -> List[IdempotencyRecord]:
+        raise NotImplementedError
+
+@dataclass
+class InMemoryIdempotencyStore(IdempotencyStore):
+    records: Dict[str, IdempotencyRecord] = field(default_factory=dict)
+    # (expires_at, key) min-heap, so a sweep only touches records that have actually expired
+    expiry_heap: list = field(default_factory=list)
+
+    async def begin(self, key: str, fingerprint: str, ttl: timedelta, wait_seconds: float) -> Optional[IdempotencyRecord]:
+        while True:
+            now = datetime.utcnow()
+            record = self.records.get(key)
+            if record is None or record.expires_at <= now:
+                record = IdempotencyRecord(key=key, fingerprint=fingerprint, expires_at=now + ttl)
+                self.records[key] = record
+                heapq.heappush(self.expiry_heap, (record.expires_at, key))
+                return None
+
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if record.status_code is not None:
+                return record
+
+            # A concurrent duplicate waits for the original instead of running the transaction again
+            try:
+                await asyncio.wait_for(record.done.wait(), wait_seconds)
+            except asyncio.TimeoutError:
+                raise IdempotencyInProgress()
+            # Either completed (replay) or released (this request may now take the key)
+
+    async def complete(self, key: str, status_code: int, body: bytes, ttl: timedelta):
+        record = self.records.get(key)
+        if record is None:
+            return
+        record.status_code = status_code
+        record.body = body
+        record.expires_at = datetime.utcnow() + ttl
+        heapq.heappush(self.expiry_heap, (record.expires_at, key))
+        record.done.set()
+
+    async def release(self, key: str):
+        record = self.records.pop(key, None)
+        if record:
+            record.done.set()
+
+    async def sweep(self, now: datetime, batch_size: int) -> List[IdempotencyRecord]:
+        expired = []
+        while self.expiry_heap and len(expired) < batch_size:
+            expires_at, key = self.expiry_heap[0]
+            if expires_at > now:
+                break
+            heapq.heappop(self.expiry_heap)
+            record = self.records.get(key)
+            # Completed or replaced records leave stale heap entries behind
+            if record and record.expires_at == expires_at:
+                del self.records[key]
+                expired.append(record)
+        return expired
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    # Keys are rows in idempotency_keys; inserting the row is what takes a key, so only one worker
+    # runs the request and the others wait for its result by polling the row. A key whose request
+    # died without completing or releasing it is free again after pending_seconds.
+    def __init__(self, session_factory, pending_seconds: float = 60, poll_seconds: float = 0.05):
+        self.session_factory = session_factory
+        self.pending_seconds = pending_seconds
+        self.poll_seconds = poll_seconds
+
+    async def begin(self, key: str, fingerprint: str, ttl: timedelta, wait_seconds: float) -> Optional[IdempotencyRecord]:
+        deadline = asyncio.get_running_loop().time() + wait_seconds
+        async with self.session_factory() as db:
+            while True:
+                now = datetime.utcnow()
+                try:
+                    await db.execute(insert(models.IdempotencyKey).values(
+                        key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=self.pending_seconds)
+                    ))
+                    await db.commit()
+                    return None
+                except IntegrityError:
+                    await db.rollback()
+
+                row = (await db.execute(select(
+                    models.IdempotencyKey.fingerprint, models.IdempotencyKey.status_code,
+                    models.IdempotencyKey.body, models.IdempotencyKey.expires_at
+                ).filter(models.IdempotencyKey.key == key))).first()
+                await db.commit()
+                if row is None:
+                    continue
+                if row.expires_at <= now:
+                    await db.execute(delete(models.IdempotencyKey).where(
+                        models.IdempotencyKey.key == key, models.IdempotencyKey.expires_at == row.expires_at
+                    ))
+                    await db.commit()
+                    continue
+
+                if row.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused()
+                if row.status_code is not None:
+                    return IdempotencyRecord(
+                        key=key, fingerprint=row.fingerprint, expires_at=row.expires_at,
+                        status_code=row.status_code, body=row.body.encode() if row.body is not None else None
+                    )
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise IdempotencyInProgress()
+                await asyncio.sleep(self.poll_seconds)
+
+    async def complete(self, key: str, status_code: int, body: bytes, ttl: timedelta):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(models.IdempotencyKey)
+                .where(models.IdempotencyKey.key == key)
+                .values(status_code=status_code, body=body.decode(), expires_at=datetime.utcnow() + ttl)
+            )
+            await db.commit()
+
+    async def release(self, key: str):
+        async with self.session_factory() as db:
+            await db.execute(delete(models.IdempotencyKey).where(
+                models.IdempotencyKey.key == key, models.IdempotencyKey.status_code.is_(None)
+            ))
+            await db.commit()
+
+    async def sweep(self, now: datetime, batch_size: int) -> List[IdempotencyRecord]:
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(models.IdempotencyKey.key, models.IdempotencyKey.fingerprint, models.IdempotencyKey.expires_at)
+                .filter(models.IdempotencyKey.expires_at <= now)
+                .limit(batch_size)
+            )).all()
+            if rows:
+                await db.execute(delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.key.in_([row.key for row in rows]), models.IdempotencyKey.expires_at <= now
+                ))
+                await db.commit()
+            return [IdempotencyRecord(key=row.key, fingerprint=row.fingerprint, expires_at=row.expires_at) for row in rows]
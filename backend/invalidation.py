@@ -0,0 +1,206 @@
+import asyncio
+import inspect
+import json
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import models
+
+# Handlers get the message payload and may be sync or async
+Handler = Callable[[dict], Any]
+
+class InvalidationBus(ABC):
+    # Interface for fanning cache invalidations out to the other workers. publish only queues the
+    # message; run sends the queue every poll and hands other workers' messages to the handler
+    # subscribed to their topic. A worker never receives its own messages, since it has already
+    # applied the change locally.
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.origin = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Handler] = {}
+        # (topic, payload as JSON); identical messages queued within one poll are sent once
+        self.outbox: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+
+    def subscribe(self, topic: str, handler: Handler):
+        self.handlers[topic] = handler
+
+    def publish(self, topic: str, payload: dict):
+        self.outbox[(topic, json.dumps(payload, sort_keys=True, separators=(",", ":")))] = None
+
+    def take_outbox(self) -> List[Tuple[str, str]]:
+        messages = list(self.outbox)
+        self.outbox.clear()
+        return messages
+
+    async def dispatch(self, topic: str, payload: dict):
+        handler = self.handlers.get(topic)
+        if handler is None:
+            return
+        self.received += 1
+        try:
+            result = handler(payload)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            # One bad message must not stop the others; the caches' TTLs bound the damage
+            self.errors += 1
+            print(f"Invalidation handler error ({topic}): {e}")
+
+    @abstractmethod
+    async def run(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "origin": self.origin,
+            "queued": len(self.outbox),
+            "sent": self.sent,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+class LocalBus(InvalidationBus):
+    # A single process has nobody to tell
+    def publish(self, topic: str, payload: dict):
+        pass
+
+    async def run(self):
+        return
+
+class DatabaseBus(InvalidationBus):
+    # Messages are rows in the invalidations table, so every worker and node sharing the database
+    # sees them without extra infrastructure. Ids can commit out of order, so an id skipped over
+    # is waited for for gap_seconds before the cursor moves past it.
+    def __init__(self, session_factory, poll_seconds: float, retention: timedelta, gap_seconds: float = 5.0,
+                 batch_size: int = 1000):
+        super().__init__(poll_seconds)
+        self.session_factory = session_factory
+        self.retention = retention
+        self.gap_seconds = gap_seconds
+        self.batch_size = batch_size
+        # Every id up to the cursor has been handled; ids above it already handled are in seen
+        self.cursor: Optional[int] = None
+        self.seen: Set[int] = set()
+        self.gaps: Dict[int, float] = {}
+
+    async def flush(self, db):
+        messages = self.take_outbox()
+        if not messages:
+            return
+        try:
+            now = datetime.utcnow()
+            await db.execute(insert(models.Invalidation), [
+                {"origin": self.origin, "topic": topic, "payload": json.loads(payload), "created_at": now}
+                for topic, payload in messages
+            ])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Put them back, ahead of anything published since
+            for message in messages:
+                self.outbox[message] = None
+                self.outbox.move_to_end(message, last=False)
+            raise
+        self.sent += len(messages)
+
+    async def poll(self, db, now: float):
+        rows = (await db.execute(
+            select(models.Invalidation.id, models.Invalidation.origin, models.Invalidation.topic,
+                   models.Invalidation.payload)
+            .filter(models.Invalidation.id > self.cursor)
+            .order_by(models.Invalidation.id)
+            .limit(self.batch_size)
+        )).all()
+        for row in rows:
+            if row.id in self.seen:
+                continue
+            self.seen.add(row.id)
+            self.gaps.pop(row.id, None)
+            if row.origin != self.origin:
+                await self.dispatch(row.topic, row.payload)
+        self.advance(now)
+
+    def advance(self, now: float):
+        top = max(self.seen, default=self.cursor)
+        for missing in range(self.cursor + 1, top):
+            if missing not in self.seen:
+                self.gaps.setdefault(missing, now)
+        while True:
+            following = self.cursor + 1
+            if following in self.seen:
+                self.seen.remove(following)
+            elif following in self.gaps and now - self.gaps[following] >= self.gap_seconds:
+                # Rolled back, or committed too late to matter
+                del self.gaps[following]
+            else:
+                break
+            self.cursor = following
+
+    async def run(self):
+        polls = 0
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    if self.cursor is None:
+                        # Only messages from now on matter; this worker's caches start empty
+                        self.cursor = await db.scalar(select(func.max(models.Invalidation.id))) or 0
+                    await self.flush(db)
+                    await self.poll(db, asyncio.get_running_loop().time())
+                    polls += 1
+                    if polls % 600 == 0:
+                        await db.execute(delete(models.Invalidation).filter(
+                            models.Invalidation.created_at < datetime.utcnow() - self.retention
+                        ))
+                        await db.commit()
+            except Exception as e:
+                print(f"Invalidation bus error: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+class RedisBus(InvalidationBus):
+    # Pub/sub on one channel; lower latency than polling, but a worker that is disconnected
+    # misses what was published meanwhile
+    def __init__(self, url: str, poll_seconds: float, channel: str = "invalidations"):
+        super().__init__(poll_seconds)
+        import redis.asyncio
+        self.client = redis.asyncio.from_url(url)
+        self.channel = channel
+
+    async def send(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            messages = self.take_outbox()
+            try:
+                for topic, payload in messages:
+                    await self.client.publish(self.channel, json.dumps(
+                        {"origin": self.origin, "topic": topic, "payload": json.loads(payload)}
+                    ))
+                    self.sent += 1
+            except Exception as e:
+                print(f"Invalidation bus error: {e}")
+
+    async def receive(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data["origin"] != self.origin:
+                        await self.dispatch(data["topic"], data["payload"])
+            except Exception as e:
+                print(f"Invalidation bus error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def run(self):
+        await asyncio.gather(self.send(), self.receive())
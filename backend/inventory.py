@@ -0,0 +1,103 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+import models
+import stats
+
+SEAT_AVAILABLE = "available"
+SEAT_BOOKED = "booked"
+
+class SeatUnavailableError(Exception):
+    def __init__(self, seats: List[int]):
+        super().__init__(f"Seats not available: {seats}")
+        self.seats = seats
+
+def seat_rows(screening_id: int, total_seats: int) -> List[dict]:
+    return [
+        {"screening_id": screening_id, "seat_number": seat, "status": SEAT_AVAILABLE}
+        for seat in range(1, total_seats + 1)
+    ]
+
+async def ensure_inventory(db: AsyncSession, screening: models.Screening):
+    # Seat rows are created lazily so screenings inserted before the inventory existed still work
+    has_seats = await db.scalar(select(models.ScreeningSeat.seat_number).filter(
+        models.ScreeningSeat.screening_id == screening.id
+    ).limit(1))
+    if has_seats:
+        return
+
+    theater = await db.get(models.Theater, screening.theater_id)
+    total_seats = theater.total_seats if theater else screening.available_seats
+    if not total_seats:
+        return
+
+    # Seats of bookings made before the inventory existed start out booked, or they could be sold
+    # again; available_seats already counts them
+    booked = {}
+    for booking_id, seats in (await db.execute(
+        select(models.Booking.id, models.Booking.seats)
+        .filter(models.Booking.screening_id == screening.id, stats.sold_bookings())
+        .order_by(models.Booking.id)
+    )).all():
+        for seat in seats or ():
+            booked.setdefault(int(seat), booking_id)
+    rows = seat_rows(screening.id, total_seats)
+    for row in rows:
+        if row["seat_number"] in booked:
+            row.update(status=SEAT_BOOKED, booking_id=booked[row["seat_number"]])
+
+    try:
+        await db.execute(insert(models.ScreeningSeat), rows)
+        await db.commit()
+    except IntegrityError:
+        # Another request initialised the same screening first
+        await db.rollback()
+
+async def claim_seats(db: AsyncSession, screening_id: int, seats: List[int], booking_id: int):
+    # Sorted order keeps row locks acquired in the same sequence across concurrent claims
+    seats = sorted(seats)
+
+    # Conditional update: only rows that are still available flip to booked
+    result = await db.execute(
+        update(models.ScreeningSeat)
+        .where(
+            models.ScreeningSeat.screening_id == screening_id,
+            models.ScreeningSeat.seat_number.in_(seats),
+            models.ScreeningSeat.status == SEAT_AVAILABLE
+        )
+        .values(status=SEAT_BOOKED, booking_id=booking_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(seats):
+        raise SeatUnavailableError(seats)
+
+    # Keep the aggregate counter in step, guarded so it can never go negative
+    result = await db.execute(
+        update(models.Screening)
+        .where(
+            models.Screening.id == screening_id,
+            models.Screening.available_seats >= len(seats)
+        )
+        .values(available_seats=models.Screening.available_seats - len(seats))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise SeatUnavailableError(seats)
+
+async def release_seats(db: AsyncSession, booking: models.Booking) -> int:
+    result = await db.execute(
+        update(models.ScreeningSeat)
+        .where(models.ScreeningSeat.booking_id == booking.id)
+        .values(status=SEAT_AVAILABLE, booking_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    # Bookings made before per-seat tracking only have a seat count
+    released = result.rowcount or booking.num_seats or len(booking.seats or [])
+    await db.execute(
+        update(models.Screening)
+        .where(models.Screening.id == booking.screening_id)
+        .values(available_seats=models.Screening.available_seats + released)
+        .execution_options(synchronize_session=False)
+    )
+    return released
@@ -0,0 +1,137 @@
+import asyncio
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Awaitable, Callable, Dict, List, Optional
+import models
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# A handler gets every claimed job of its kind at once and returns {job_id: error} for the ones that failed
+JobHandler = Callable[[AsyncSession, List[models.Job]], Awaitable[Dict[int, str]]]
+
+def enqueue(db: AsyncSession, kind: str, payload: dict, run_at: Optional[datetime] = None) -> models.Job:
+    # Only adds the row; it commits with the caller's transaction, so a job exists exactly when
+    # the change it reports does, and the request pays for one INSERT rather than the work itself
+    job = models.Job(kind=kind, payload=payload, status=JOB_QUEUED, attempts=0, run_at=run_at or datetime.utcnow())
+    db.add(job)
+    return job
+
+def retry_delay(attempts: int, base_seconds: float, max_seconds: float) -> timedelta:
+    # Exponential backoff with jitter so a recovering mail server isn't hit by every retry at once
+    delay = min(base_seconds * 2 ** (attempts - 1), max_seconds)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+async def claim(db: AsyncSession, batch_size: int, lease: timedelta) -> List[models.Job]:
+    # Due queued jobs, plus running jobs whose worker died before finishing, are tagged with a
+    # fresh claim token in one conditional UPDATE; only rows carrying the token belong to this worker
+    now = datetime.utcnow()
+    due = and_(models.Job.status.in_([JOB_QUEUED, JOB_RUNNING]), models.Job.run_at <= now)
+    job_ids = (await db.scalars(
+        select(models.Job.id).filter(due).order_by(models.Job.run_at, models.Job.id).limit(batch_size)
+    )).all()
+    if not job_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    await db.execute(
+        update(models.Job)
+        .where(models.Job.id.in_(job_ids), due)
+        .values(status=JOB_RUNNING, claimed_by=token, run_at=now + lease, attempts=models.Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return (await db.scalars(
+        select(models.Job).filter(models.Job.claimed_by == token).order_by(models.Job.id)
+    )).all()
+
+async def run_batch(
+    db: AsyncSession,
+    handlers: Dict[str, JobHandler],
+    batch_size: int,
+    lease: timedelta,
+    max_attempts: int,
+    retry_base_seconds: float,
+    retry_max_seconds: float
+) -> int:
+    jobs = await claim(db, batch_size, lease)
+    by_kind: Dict[str, List[models.Job]] = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+
+    failures: Dict[int, str] = {}
+    for kind, group in by_kind.items():
+        handler = handlers.get(kind)
+        if handler is None:
+            failures.update((job.id, f"No handler for job kind '{kind}'") for job in group)
+            continue
+        try:
+            failures.update(await handler(db, group))
+        except Exception as e:
+            failures.update((job.id, f"{type(e).__name__}: {e}") for job in group)
+
+    now = datetime.utcnow()
+    for job in jobs:
+        error = failures.get(job.id)
+        job.claimed_by = None
+        if error is None:
+            job.status, job.finished_at, job.last_error = JOB_DONE, now, None
+        elif job.attempts >= max_attempts:
+            job.status, job.finished_at, job.last_error = JOB_FAILED, now, error
+        else:
+            job.status, job.last_error = JOB_QUEUED, error
+            job.run_at = now + retry_delay(job.attempts, retry_base_seconds, retry_max_seconds)
+    await db.commit()
+    return len(jobs)
+
+async def purge(db: AsyncSession, before: datetime, batch_size: int) -> int:
+    # Finished jobs are kept for a while for inspection, then deleted a batch at a time
+    job_ids = (await db.scalars(
+        select(models.Job.id)
+        .filter(models.Job.status.in_([JOB_DONE, JOB_FAILED]), models.Job.finished_at < before)
+        .limit(batch_size)
+    )).all()
+    if job_ids:
+        await db.execute(delete(models.Job).where(models.Job.id.in_(job_ids)))
+        await db.commit()
+    return len(job_ids)
+
+async def run_worker(
+    session_factory,
+    handlers: Dict[str, JobHandler],
+    wakeup: asyncio.Event,
+    interval_seconds: float,
+    batch_size: int,
+    lease: timedelta,
+    max_attempts: int,
+    retry_base_seconds: float,
+    retry_max_seconds: float,
+    retention: timedelta
+):
+    # Woken right after a request commits new jobs; the poll picks up retries and scheduled jobs
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        try:
+            while True:
+                async with session_factory() as db:
+                    processed = await run_batch(
+                        db, handlers, batch_size, lease, max_attempts, retry_base_seconds, retry_max_seconds
+                    )
+                if processed < batch_size:
+                    break
+                await asyncio.sleep(0)
+            async with session_factory() as db:
+                await purge(db, datetime.utcnow() - retention, batch_size)
+        except Exception as e:
+            # Claimed jobs fall back to the queue once their lease runs out
+            print(f"Job worker error: {e}")
@@ -0,0 +1,166 @@
+import os
+import time
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from config import SessionLocal, async_engine, engine, get_db
+import models
+import projections
+
+# Time each request spends waiting on the database server; SQLite has no server, so wait(ms)
+# sleeps inside the driver instead: on the event loop for the blocking Session, on aiosqlite's
+# thread for AsyncSession, which is where a MySQL driver would wait on its socket
+QUERY_WAIT_MS = float(os.getenv("LOADTEST_QUERY_WAIT_MS", "0"))
+
+def add_wait_function(dbapi_connection, connection_record):
+    dbapi_connection.create_function("wait", 1, lambda ms: time.sleep(ms / 1000) or 1)
+
+event.listen(engine, "connect", add_wait_function)
+event.listen(async_engine.sync_engine, "connect", add_wait_function)
+
+# The same catalogue page served two ways: on the blocking Session every route used before the
+# async layer, which stalls the event loop for the length of each query, and on AsyncSession
+# through get_db like the API does now. Started by the CLI below in its own uvicorn process.
+app = FastAPI(title="Session load test")
+
+def listing_queries(genre: Optional[str]):
+    query = select(*projections.MOVIE_COLUMNS)
+    if genre:
+        query = query.filter(models.Movie.genre == genre)
+    count = select(func.count()).select_from(query.subquery())
+    page = query.order_by(models.Movie.rating.desc(), models.Movie.id).limit(20)
+    return count, page
+
+@app.get("/sync/movies")
+async def read_movies_sync(genre: Optional[str] = None):
+    count, page = listing_queries(genre)
+    db = SessionLocal()
+    try:
+        if QUERY_WAIT_MS:
+            db.scalar(select(func.wait(QUERY_WAIT_MS)))
+        return {"total": db.scalar(count), "movies": len(db.execute(page).all())}
+    finally:
+        db.close()
+
+@app.get("/async/movies")
+async def read_movies_async(genre: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    count, page = listing_queries(genre)
+    if QUERY_WAIT_MS:
+        await db.scalar(select(func.wait(QUERY_WAIT_MS)))
+    return {"total": await db.scalar(count), "movies": len((await db.execute(page)).all())}
+
+@app.get("/ping")
+async def ping():
+    return {}
+
+if __name__ == "__main__":
+    # python loadtest.py sessions --clients 200 --requests 4000 --query-wait-ms 10
+    import argparse
+    import json
+    import random
+    import statistics
+    import subprocess
+    import sys
+    import tempfile
+    import threading
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, insert
+
+    parser = argparse.ArgumentParser(description="Throughput of blocking Session versus AsyncSession routes under concurrent load")
+    parser.add_argument("command", choices=["sessions"])
+    parser.add_argument("--clients", type=int, default=200, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per mode")
+    parser.add_argument("--movies", type=int, default=20000, help="movies in the temporary SQLite catalogue")
+    parser.add_argument("--query-wait-ms", type=float, default=10,
+                        help="server-side wait per request, standing in for a networked database; 0 measures SQLite alone")
+    parser.add_argument("--port", type=int, default=8300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = f"sqlite:///{workdir}/loadtest.db"
+    genres = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Romance", "Documentary", "Animation"]
+
+    setup_engine = create_engine(database_url)
+    models.Base.metadata.create_all(bind=setup_engine)
+    with setup_engine.begin() as connection:
+        released = datetime(2000, 1, 1)
+        connection.execute(insert(models.Movie), [
+            {
+                "title": f"Movie {number}", "description": "Load test", "duration": 90 + number % 60,
+                "release_date": released + timedelta(days=number % 8000), "genre": genres[number % len(genres)],
+                "rating": round(random.uniform(1, 10), 1), "image_url": "x",
+            }
+            for number in range(args.movies)
+        ])
+    setup_engine.dispose()
+
+    url = f"http://127.0.0.1:{args.port}"
+
+    def call(path: str) -> float:
+        started = time.perf_counter()
+        with urllib.request.urlopen(url + path, timeout=120) as response:
+            json.loads(response.read())
+        return time.perf_counter() - started
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "loadtest:app", "--port", str(args.port), "--log-level", "warning",
+         "--backlog", str(max(2048, args.clients * 2))],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "DATABASE_URL": database_url, "LOADTEST_QUERY_WAIT_MS": str(args.query_wait_ms)}
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                call("/ping")
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise SystemExit("The load test server did not start")
+                time.sleep(0.1)
+
+        def run(mode: str) -> dict:
+            paths = [f"/{mode}/movies?genre={genres[number % len(genres)]}" for number in range(args.requests)]
+            # Latency of a trivial route measured while the load runs: how long the event loop is blocked
+            probes, stop = [], threading.Event()
+
+            def probe():
+                while not stop.is_set():
+                    probes.append(call("/ping"))
+                    time.sleep(0.05)
+
+            for path in paths[:args.clients]:
+                call(path)
+            prober = threading.Thread(target=probe)
+            started = time.perf_counter()
+            prober.start()
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                latencies = sorted(pool.map(call, paths))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            prober.join()
+            return {
+                "throughput": len(paths) / elapsed,
+                "p50": statistics.median(latencies),
+                "p99": latencies[int(len(latencies) * 0.99) - 1],
+                "ping": statistics.median(probes) if probes else float("nan"),
+            }
+
+        print(f"{args.requests} catalogue requests per mode from {args.clients} clients over {args.movies} movies, "
+              f"{args.query_wait_ms:g}ms database wait per request")
+        print(f"  {'mode':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'ping p50 ms':>12}")
+        results = {}
+        for mode in ("sync", "async"):
+            results[mode] = result = run(mode)
+            print(f"  {mode:<8} {result['throughput']:>8.1f} {result['p50'] * 1000:>8.1f} "
+                  f"{result['p99'] * 1000:>8.1f} {result['ping'] * 1000:>12.1f}")
+        print(f"AsyncSession throughput: {results['async']['throughput'] / results['sync']['throughput']:.2f}x the blocking Session's")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
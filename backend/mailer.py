@@ -0,0 +1,141 @@
+import asyncio
+import smtplib
+from abc import ABC, abstractmethod
+from collections import deque
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import List, Optional
+
+class Mailer(ABC):
+    # Interface for outgoing mail; send_batch returns one error (or None) per message, in order.
+    # A message is None only once the server accepted it, so the jobs behind the others are the
+    # only ones retried. It raises if nothing could be sent at all so the whole batch is retried.
+
+    @abstractmethod
+    async def send_batch(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+class SMTPMailer(Mailer):
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def _send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        # One connection, handshake and login for the whole batch instead of one per email
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            errors: List[Optional[str]] = []
+            for message in messages:
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    errors.append(str(e))
+                except (smtplib.SMTPException, OSError) as e:
+                    # The connection is gone; what was accepted before it stays sent, the rest is retried
+                    error = f"{type(e).__name__}: {e}"
+                    errors.extend([error] * (len(messages) - len(errors)))
+                    break
+            return errors
+
+    async def send_batch(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        # smtplib blocks, so it runs on a worker thread and the event loop keeps serving requests
+        return await asyncio.to_thread(self._send, messages)
+
+class MemoryMailer(Mailer):
+    # Keeps the most recent messages instead of sending them; the default when no SMTP host is configured
+    def __init__(self, limit: int = 1000):
+        self.outbox: deque = deque(maxlen=limit)
+
+    async def send_batch(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        self.outbox.extend(messages)
+        return [None] * len(messages)
+
+class SMTPSink:
+    # Minimal local SMTP server that accepts every message and keeps it, so SMTPMailer can be
+    # exercised end to end without a real mail server. With disconnect_after set it hangs up once
+    # it holds that many messages, the way a server restarting mid-batch would.
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, disconnect_after: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.disconnect_after = disconnect_after
+        self.messages: List[EmailMessage] = []
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 sink ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+                if command in ("HELO", "EHLO"):
+                    await reply("250 sink")
+                elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data = await reader.readline()
+                        if not data or data in (b".\r\n", b".\n"):
+                            break
+                        # Clients double a leading dot on data lines
+                        lines.append(data[1:] if data.startswith(b".") else data)
+                    self.messages.append(message_from_bytes(b"".join(lines), policy=policy.default))
+                    await reply("250 OK queued")
+                    if self.disconnect_after is not None and len(self.messages) >= self.disconnect_after:
+                        break
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+if __name__ == "__main__":
+    # python mailer.py --port 1025
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink that prints every message it receives")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    async def serve():
+        sink = SMTPSink(args.host, args.port)
+        await sink.start()
+        print(f"SMTP sink listening on {sink.host}:{sink.port}")
+        seen = 0
+        while True:
+            await asyncio.sleep(0.5)
+            for message in sink.messages[seen:]:
+                print(f"--- To: {message['To']} | Subject: {message['Subject']}")
+                print(message.get_body(("plain",)).get_content())
+            seen = len(sink.messages)
+
+    asyncio.run(serve())
@@ -1,21 +1,118 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, Header, HTTPException, Request, Response, UploadFile, status, WebSocket, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, joinedload
-from datetime import datetime, timedelta
-from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import date, datetime, timedelta
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Set, Union
+import base64
+import csv
+import io
+import json
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 import models
 import schemas
-from config import engine, get_db, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, SessionLocal
+import projections
+import inventory
+import holds
+import realtime
+import hashing
+import exports
+import stats
+import analytics
+import scheduler
+import catalogue_import
+import idempotency
+import payments
+import stripe_integration
+import jobs
+import notifications
+import mailer
+import pricing
+import showtimes
+import ratelimit
+import waitingroom
+import invalidation
+import replicas
+from cache import TTLCache, ResponseCache, invalidate_where
+from projections import get_type_adapter, parse_expand, dump_rows
+from search import SearchIndex
+from seatmap import SeatBitmap, seat_layout
+from config import (
+    engine, async_engine, get_db, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, AsyncSessionLocal,
+    HOLD_TTL_MINUTES, HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE, SEATS_PER_ROW,
+    REALTIME_COALESCE_MS, REALTIME_QUEUE_SIZE,
+    BCRYPT_ROUNDS, HASH_WORKERS, HASH_QUEUE_SIZE, HASH_RETRY_AFTER_SECONDS,
+    PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS, MOVIE_CACHE_SIZE, MOVIE_CACHE_TTL_SECONDS,
+    MOVIE_COUNT_CACHE_TTL_SECONDS, SEARCH_MAX_RESULTS, SEARCH_PREFIX_EXPANSIONS,
+    MOVIE_PAGE_MAX_LIMIT, BOOKING_PAGE_MAX_LIMIT, BOOKING_EXPORT_BATCH_SIZE, ANALYTICS_CHUNK_SIZE, ANALYTICS_SNAPSHOT_TTL_SECONDS,
+    SCHEDULE_MAX_SLOTS, SCHEDULE_TURNAROUND_MINUTES, SCHEDULE_SEAT_BATCH_SIZE, IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS,
+    IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS,
+    STRIPE_SECRET_KEY, STRIPE_ENDPOINT_SECRET, PAYMENT_PROVIDER, PAYMENT_CURRENCY,
+    PAYMENT_QUEUE_POLL_SECONDS, PAYMENT_QUEUE_BATCH_SIZE, PAYMENT_PENDING_TTL_MINUTES,
+    SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS, MAIL_FROM,
+    JOB_POLL_SECONDS, JOB_BATCH_SIZE, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS,
+    JOB_RETRY_MAX_SECONDS, JOB_RETENTION_HOURS, REMINDER_LEAD_HOURS,
+    PRICING_DYNAMIC_ENABLED, PRICING_MIN_FACTOR, PRICING_MAX_FACTOR, PRICING_CACHE_SIZE, PRICING_TABLE_TTL_SECONDS,
+    SHOWTIME_INDEX_DAYS, SHOWTIME_INDEX_TTL_SECONDS, SHOWTIME_DEFAULT_WINDOW_HOURS, SHOWTIME_MAX_WINDOW_DAYS,
+    SHOWTIME_MAX_RESULTS, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL,
+    RATE_LIMIT_BOOKING_PER_SECOND, RATE_LIMIT_BOOKING_BURST, RATE_LIMIT_AUTH_PER_SECOND, RATE_LIMIT_AUTH_BURST,
+    RATE_LIMIT_BROWSE_PER_SECOND, RATE_LIMIT_BROWSE_BURST, RATE_LIMIT_IP_MULTIPLIER, RATE_LIMIT_TRUSTED_PROXIES,
+    ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE, ADMISSION_MAX_WAIT_SECONDS, ADMISSION_MAX_QUEUED_PER_CLIENT,
+    DB_POOL_SIZE, WAITING_ROOM_TARGET_WRITES_PER_SECOND, WAITING_ROOM_DB_UTILIZATION, WAITING_ROOM_HEADROOM,
+    WAITING_ROOM_MAX_ACTIVE, WAITING_ROOM_ADMISSION_SECONDS, WAITING_ROOM_HEARTBEAT_SECONDS, WAITING_ROOM_TICK_SECONDS,
+    WAITING_ROOM_TICKET_HOURS, WAITING_ROOM_MAX_COMMIT_WAIT_SECONDS, STATE_STORE,
+    WEB_CONCURRENCY, INVALIDATION_BUS, INVALIDATION_REDIS_URL, INVALIDATION_POLL_SECONDS, INVALIDATION_RETENTION_MINUTES,
+    ReplicaSessionLocals, replica_engines, REPLICA_MAX_LAG_SECONDS, REPLICA_HEARTBEAT_SECONDS
+)
 
 # Create database tables if they don't exist
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Movie Booking API")
 
+def token_claims(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+def token_subject(token: str) -> Optional[str]:
+    # Only access tokens sign a user in; other tokens (queue tickets) carry a type
+    claims = token_claims(token)
+    if claims is None or "typ" in claims:
+        return None
+    return claims.get("sub")
+
+# Rate limits per IP and per signed-in user, by route class, then a global concurrency cap whose
+# waiting room admits bookings before logins and logins before browsing. Registered before CORS
+# so CORS stays the outermost layer and rejections still carry its headers.
+if RATE_LIMIT_BACKEND == "redis":
+    rate_limit_backend: ratelimit.RateLimitBackend = ratelimit.RedisRateLimitBackend(RATE_LIMIT_REDIS_URL)
+else:
+    rate_limit_backend = ratelimit.InMemoryRateLimitBackend()
+rate_limiter = ratelimit.RateLimiter({
+    "booking": ratelimit.RouteClass("booking", 0, RATE_LIMIT_BOOKING_PER_SECOND, RATE_LIMIT_BOOKING_BURST),
+    "auth": ratelimit.RouteClass("auth", 1, RATE_LIMIT_AUTH_PER_SECOND, RATE_LIMIT_AUTH_BURST, per_user=False),
+    "browse": ratelimit.RouteClass("browse", 2, RATE_LIMIT_BROWSE_PER_SECOND, RATE_LIMIT_BROWSE_BURST),
+}, rate_limit_backend, RATE_LIMIT_IP_MULTIPLIER)
+admission = ratelimit.AdmissionController(
+    ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE, ADMISSION_MAX_WAIT_SECONDS, ADMISSION_MAX_QUEUED_PER_CLIENT
+)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        ratelimit.RateLimitMiddleware,
+        limiter=rate_limiter, admission=admission, identify=token_subject,
+        trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,20 +120,236 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+
+# Seat holds, swept by a background task; in the database so every worker sees them
+if STATE_STORE == "db":
+    hold_store: holds.HoldStore = holds.DatabaseHoldStore(AsyncSessionLocal)
+else:
+    hold_store = holds.InMemoryHoldStore()
+background_tasks = []
+
+# Columnar booking snapshot shared by analytics reports until it goes stale
+analytics_snapshots = TTLCache(1, ANALYTICS_SNAPSHOT_TTL_SECONDS)
+analytics_lock = asyncio.Lock()
+
+# Results of POST /bookings by Idempotency-Key, so retries replay instead of booking twice
+if STATE_STORE == "db":
+    idempotency_store: idempotency.IdempotencyStore = idempotency.DatabaseIdempotencyStore(AsyncSessionLocal)
+else:
+    idempotency_store = idempotency.InMemoryIdempotencyStore()
+
+# Fan-out hub for live seat updates, one channel per screening
+seat_hub = realtime.ScreeningHub(REALTIME_COALESCE_MS / 1000, REALTIME_QUEUE_SIZE)
+
+def publish_seats(screening_id: int, seats: List[int], state: str, sold: bool = False, movie_id: Optional[int] = None):
+    # Watchers connected to this worker are told now, the other workers' through the invalidation bus.
+    # sold marks a change in seats sold, which other workers' prices and seat counts depend on.
+    seat_hub.publish(screening_id, seats, state)
+    invalidation_bus.publish("seats", {
+        "screening_id": screening_id, "seats": list(seats), "state": state, "sold": sold, "movie_id": movie_id
+    })
+
+async def publish_expired_holds(expired: List[holds.Hold]):
+    # Only seats still for sale are announced: an expired hold's seats may have been booked, or
+    # held again by someone else, before the sweep reached it
+    seats: Dict[int, Set[int]] = {}
+    for hold in expired:
+        seats.setdefault(hold.screening_id, set()).update(hold.seats)
+    async with AsyncSessionLocal() as db:
+        available = set((await db.execute(
+            select(models.ScreeningSeat.screening_id, models.ScreeningSeat.seat_number).filter(
+                models.ScreeningSeat.screening_id.in_(list(seats)),
+                models.ScreeningSeat.seat_number.in_({seat for held in seats.values() for seat in held}),
+                models.ScreeningSeat.status == inventory.SEAT_AVAILABLE
+            )
+        )).all())
+    for screening_id, held in seats.items():
+        held_again = await hold_store.held_seats(screening_id)
+        released = sorted(
+            seat for seat in held if (screening_id, seat) in available and seat not in held_again
+        )
+        if released:
+            publish_seats(screening_id, released, realtime.SEAT_RELEASED)
+
+# Payment provider; without one, bookings are confirmed as soon as their seats are claimed.
+# Verified webhooks are queued in payment_events and applied in batches by a background worker.
+if PAYMENT_PROVIDER == "stripe":
+    payment_provider: Optional[stripe_integration.PaymentProvider] = stripe_integration.StripeProvider(
+        STRIPE_SECRET_KEY, STRIPE_ENDPOINT_SECRET
+    )
+elif PAYMENT_PROVIDER == "stub":
+    payment_provider = stripe_integration.StubProvider(STRIPE_ENDPOINT_SECRET or "whsec_stub")
+else:
+    payment_provider = None
+payment_wakeup = asyncio.Event()
+
+# Notification emails go through the jobs table: requests only insert a row, a background worker sends them
+if SMTP_HOST:
+    mail_sender: mailer.Mailer = mailer.SMTPMailer(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS)
+else:
+    mail_sender = mailer.MemoryMailer()
+notifier = notifications.Notifier(mail_sender, MAIL_FROM)
+job_wakeup = asyncio.Event()
+reminder_lead = timedelta(hours=REMINDER_LEAD_HOURS)
+
+# Precomputed price tables per screening, adjusted in place as seats sell and return
+pricing_engine = pricing.PricingEngine(
+    SEATS_PER_ROW, PRICING_MIN_FACTOR, PRICING_MAX_FACTOR, TTLCache(PRICING_CACHE_SIZE, PRICING_TABLE_TTL_SECONDS),
+    PRICING_DYNAMIC_ENABLED
 )
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+async def get_price_table(db: AsyncSession, screening: models.Screening) -> pricing.PriceTable:
+    # Only a cache miss needs the theater's capacity
+    table = pricing_engine.lookup(screening)
+    if table is None:
+        theater = await db.get(models.Theater, screening.theater_id)
+        table = pricing_engine.build(screening, theater.total_seats if theater else None)
+    return table
+
+def publish_payment_batch(result: payments.BatchResult):
+    for screening_id, movie_id, seats in result.cancelled:
+        publish_seats(screening_id, seats, realtime.SEAT_RELEASED, sold=True, movie_id=movie_id)
+        mark_written(f"screening:{screening_id}", f"movie:{movie_id}")
+        pricing_engine.adjust(screening_id, -len(seats))
+        if movie_id is not None:
+            invalidate_seat_counts(movie_id)
+    for screening_id, movie_id, seats in result.reconfirmed:
+        publish_seats(screening_id, seats, realtime.SEAT_BOOKED, sold=True, movie_id=movie_id)
+        mark_written(f"screening:{screening_id}", f"movie:{movie_id}")
+        pricing_engine.adjust(screening_id, len(seats))
+        invalidate_seat_counts(movie_id)
+    # Confirmations and cancellations queued notifications
+    job_wakeup.set()
+
+# Relationships walked by the single-object response models; AsyncSession cannot lazy load while serialising.
+# Nested models only embed summaries, so one level of loading is enough.
+MOVIE_LOADERS = (selectinload(models.Movie.screenings),)
+SCREENING_LOADERS = (
+    joinedload(models.Screening.movie),
+    joinedload(models.Screening.theater),
+    selectinload(models.Screening.bookings),
+)
+BOOKING_LOADERS = (
+    joinedload(models.Booking.screening).joinedload(models.Screening.movie),
+    joinedload(models.Booking.screening).joinedload(models.Screening.theater),
+    joinedload(models.Booking.screening).selectinload(models.Screening.bookings),
+)
+
+# Password hashing runs on a bounded worker pool off the event loop
+password_hasher = hashing.PasswordHasher(HASH_WORKERS, HASH_QUEUE_SIZE, BCRYPT_ROUNDS)
+
+@app.exception_handler(hashing.HashingPoolSaturated)
+async def hashing_saturated_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+    )
+
+# Authenticated users keyed by token subject, so most requests skip the user lookup
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Serialised catalogue responses, invalidated by add_movie and seat changes
+movie_cache = ResponseCache(TTLCache(MOVIE_CACHE_SIZE, MOVIE_CACHE_TTL_SECONDS))
+# Listing totals per (genre, search), so paging through results doesn't recount every time
+movie_count_cache = TTLCache(MOVIE_CACHE_SIZE, MOVIE_COUNT_CACHE_TTL_SECONDS)
+
+# Inverted index over title, description and genre; loaded at startup and updated by add_movie
+search_index = SearchIndex(SEARCH_PREFIX_EXPANSIONS)
+
+# Screenings per day sorted by start time, for time-window listings across movies
+showtime_index = showtimes.ShowtimeIndex(SHOWTIME_INDEX_DAYS, SHOWTIME_INDEX_TTL_SECONDS)
+
+# Every cache above is per worker. A change applies to this worker's caches directly and is
+# published for the others, which apply it when it arrives through the bus.
+if INVALIDATION_BUS == "redis":
+    invalidation_bus: invalidation.InvalidationBus = invalidation.RedisBus(INVALIDATION_REDIS_URL, INVALIDATION_POLL_SECONDS)
+elif INVALIDATION_BUS == "db":
+    invalidation_bus = invalidation.DatabaseBus(
+        AsyncSessionLocal, INVALIDATION_POLL_SECONDS, timedelta(minutes=INVALIDATION_RETENTION_MINUTES)
+    )
+else:
+    invalidation_bus = invalidation.LocalBus(INVALIDATION_POLL_SECONDS)
+
+def apply_seat_change(payload: dict):
+    seat_hub.publish(payload["screening_id"], payload["seats"], payload["state"])
+    if payload["sold"]:
+        # The price table is rebuilt from the database on next use instead of adjusted blind
+        pricing_engine.invalidate(payload["screening_id"])
+        if payload["movie_id"] is not None:
+            invalidate_seat_counts(payload["movie_id"])
+
+def apply_principal_change(payload: dict):
+    for username in payload["usernames"]:
+        principal_cache.invalidate(username)
+
+def apply_screenings_scheduled(payload: dict):
+    for movie_id in payload["movie_ids"]:
+        invalidate_seat_counts(movie_id)
+    for day in payload["days"]:
+        showtime_index.invalidate(date.fromisoformat(day))
+
+async def apply_catalogue_import(payload: dict):
+    clear_catalogue_caches()
+    await load_search_index()
+
+invalidation_bus.subscribe("seats", apply_seat_change)
+invalidation_bus.subscribe("principals", apply_principal_change)
+invalidation_bus.subscribe("movie_added", lambda payload: apply_movie_added(**payload))
+invalidation_bus.subscribe("screenings_scheduled", apply_screenings_scheduled)
+invalidation_bus.subscribe("catalogue_imported", apply_catalogue_import)
+
+# Catalogue and booking history reads go to a replica within REPLICA_MAX_LAG_SECONDS that has
+# caught up with the writes they depend on. Write marks reach other workers through the bus,
+# so stickiness across workers needs the bus to be quicker than the replicas.
+replica_router = replicas.ReplicaRouter(
+    AsyncSessionLocal,
+    [replicas.Replica(f"replica{number}", factory) for number, factory in enumerate(ReplicaSessionLocals, 1)],
+    REPLICA_MAX_LAG_SECONDS
+)
+
+def mark_written(*keys: str):
+    if replica_router.replicas:
+        at = time.time()
+        replica_router.mark(keys, at)
+        invalidation_bus.publish("writes", {"keys": list(keys), "at": at})
+
+invalidation_bus.subscribe("writes", lambda payload: replica_router.mark(payload["keys"], payload["at"]))
+
+async def get_catalogue_db():
+    # Only catalogue edits (movies, imports, schedules) mark "catalogue". Seat counts change with
+    # every booking, which marks its movie and screening instead, so listings that expand
+    # screenings check those keys through dump_movie_rows.
+    async with replica_router.session(("catalogue",)) as db:
+        yield db
+
+async def dump_movie_rows(db: AsyncSession, movies, expand: List[str]) -> list:
+    # Expanded screenings carry seat counts; if this replica is behind a booking for one of the
+    # movies on the page, the expansion is read from the primary instead
+    if "screenings" in expand and not replica_router.caught_up(db, [f"movie:{movie.id}" for movie in movies]):
+        async with AsyncSessionLocal() as primary:
+            return await dump_rows(primary, movies, schemas.MovieSummary, expand, projections.MOVIE_EXPANSIONS)
+    return await dump_rows(db, movies, schemas.MovieSummary, expand, projections.MOVIE_EXPANSIONS)
+
+async def get_movie_read_db(movie_id: int):
+    async with replica_router.session(("catalogue", f"movie:{movie_id}")) as db:
+        yield db
+
+async def get_screening_read_db(screening_id: int):
+    async with replica_router.session(("catalogue", f"screening:{screening_id}")) as db:
+        yield db
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -48,53 +361,119 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Waiting rooms admit a paced number of users at a time to book high-demand screenings; queue
+# tickets are signed like access tokens. Rooms are kept with the seat holds, and every worker
+# paces its share of the commit rate.
+commit_latency = waitingroom.CommitLatency()
+waiting_room_settings = (
+    waitingroom.WritePacer(
+        WAITING_ROOM_TARGET_WRITES_PER_SECOND / WEB_CONCURRENCY, DB_POOL_SIZE, WAITING_ROOM_DB_UTILIZATION, commit_latency
+    ),
+    create_access_token, token_claims, WAITING_ROOM_MAX_ACTIVE, WAITING_ROOM_ADMISSION_SECONDS,
+    WAITING_ROOM_HEARTBEAT_SECONDS, timedelta(hours=WAITING_ROOM_TICKET_HOURS), WAITING_ROOM_HEADROOM
+)
+if STATE_STORE == "db":
+    waiting_rooms: waitingroom.WaitingRoomManager = waitingroom.DatabaseWaitingRoomManager(
+        AsyncSessionLocal, *waiting_room_settings, tick_seconds=WAITING_ROOM_TICK_SECONDS, workers=WEB_CONCURRENCY
+    )
+else:
+    waiting_rooms = waitingroom.InMemoryWaitingRoomManager(*waiting_room_settings, workers=WEB_CONCURRENCY)
+
 # Create admin user
-def create_admin_user():
-    db = SessionLocal()
-    try:
-        # Check if admin exists using optimized query
-        admin = db.query(models.User.id).filter(models.User.username == "admin").first()
-        if not admin:
-            admin = models.User(
-                username="admin",
-                email="admin@example.com",
-                hashed_password=get_password_hash("admin123"),
-                is_active=True,
-                is_admin=True,
-                created_at=datetime.utcnow()
-            )
-            db.add(admin)
-            db.commit()
-            print("Admin user created successfully!")
-        else:
-            print("Admin user already exists!")
-    except Exception as e:
-        print(f"Error creating admin user: {e}")
-        db.rollback()
-    finally:
-        db.close()
+async def create_admin_user():
+    async with AsyncSessionLocal() as db:
+        try:
+            # Check if admin exists using optimized query
+            admin = await db.scalar(select(models.User.id).filter(models.User.username == "admin"))
+            if not admin:
+                admin = models.User(
+                    username="admin",
+                    email="admin@example.com",
+                    hashed_password=await get_password_hash("admin123"),
+                    is_active=True,
+                    is_admin=True,
+                    created_at=datetime.utcnow()
+                )
+                db.add(admin)
+                await db.commit()
+                print("Admin user created successfully!")
+            else:
+                print("Admin user already exists!")
+        except Exception as e:
+            print(f"Error creating admin user: {e}")
+            await db.rollback()
+
+async def load_search_index():
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(
+            select(models.Movie.id, models.Movie.title, models.Movie.description, models.Movie.genre)
+        )
+        async for movie_id, title, description, genre in rows:
+            search_index.add(movie_id, title, description, genre)
 
 # Create admin user on startup
 @app.on_event("startup")
 async def startup_event():
-    create_admin_user()
+    await create_admin_user()
+    await load_search_index()
+    background_tasks.append(asyncio.create_task(
+        holds.run_sweeper(
+            hold_store, HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE,
+            on_expired=publish_expired_holds
+        )
+    ))
+    background_tasks.append(asyncio.create_task(
+        holds.run_sweeper(idempotency_store, HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE)
+    ))
+    background_tasks.append(asyncio.create_task(
+        holds.run_sweeper(rate_limit_backend, HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE)
+    ))
+    background_tasks.append(asyncio.create_task(waitingroom.run_admitter(waiting_rooms, WAITING_ROOM_TICK_SECONDS)))
+    background_tasks.append(asyncio.create_task(invalidation_bus.run()))
+    if replica_router.replicas:
+        background_tasks.append(asyncio.create_task(replicas.run_monitor(replica_router, REPLICA_HEARTBEAT_SECONDS)))
+    if payment_provider:
+        background_tasks.append(asyncio.create_task(
+            payments.run_worker(
+                AsyncSessionLocal, payment_wakeup, PAYMENT_QUEUE_POLL_SECONDS, PAYMENT_QUEUE_BATCH_SIZE,
+                timedelta(minutes=PAYMENT_PENDING_TTL_MINUTES), reminder_lead, on_batch=publish_payment_batch
+            )
+        ))
+    background_tasks.append(asyncio.create_task(
+        jobs.run_worker(
+            AsyncSessionLocal, notifier.handlers(), job_wakeup, JOB_POLL_SECONDS, JOB_BATCH_SIZE,
+            timedelta(seconds=JOB_LEASE_SECONDS), JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS,
+            JOB_RETRY_MAX_SECONDS, timedelta(hours=JOB_RETENTION_HOURS)
+        )
+    ))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    password_hasher.shutdown()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = token_subject(token)
+    if username is None:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = principal_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await db.scalar(select(models.User).filter(models.User.username == username))
+        if user is None:
+            raise credentials_exception
+        # Detached so the cached instance can be shared across requests and sessions
+        db.expunge(user)
+        principal_cache.set(username, user)
     return user
 
 class LoginRequest(BaseModel):
@@ -103,13 +482,13 @@ class LoginRequest(BaseModel):
 
 # Authentication routes
 @app.post("/login")
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     # Optimize query to only select necessary fields
-    user = db.query(models.User).filter(
+    user = await db.scalar(select(models.User).filter(
         models.User.username == login_data.username
-    ).first()
+    ))
     
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await verify_password(login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -134,19 +513,19 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     }
 
 @app.post("/register", response_model=schemas.Token)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if username already exists
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # Check if email already exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash the password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     
     # Create new user
     db_user = models.User(
@@ -160,8 +539,8 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
     
     # Add user to database
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -176,14 +555,87 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
 async def read_users_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
+@app.get("/admin/metrics/hashing")
+async def read_hashing_metrics(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view metrics")
+    return password_hasher.metrics()
+
+@app.get("/admin/metrics/caches")
+async def read_cache_metrics(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view metrics")
+    return {
+        "principals": principal_cache.stats(),
+        "movies": movie_cache.stats(),
+        "showtimes": showtime_index.stats(),
+        "invalidation": invalidation_bus.stats(),
+    }
+
+@app.get("/admin/metrics/traffic")
+async def read_traffic_metrics(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view metrics")
+    return {
+        "rate_limited": rate_limiter.limited, "admission": admission.stats(), "waiting_rooms": await waiting_rooms.stats()
+    }
+
+@app.get("/admin/metrics/replicas")
+async def read_replica_metrics(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view metrics")
+    return replica_router.stats()
+
+@app.get("/admin/metrics/payments")
+async def read_payment_metrics(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view metrics")
+    return await payments.read_metrics(db)
+
+@app.get("/admin/stats", response_model=schemas.AdminStats, response_model_exclude_none=True)
+async def read_admin_stats(
+    movie_id: Optional[int] = None,
+    screening_id: Optional[int] = None,
+    day: Optional[date] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view stats")
+    return await stats.read_stats(db, movie_id=movie_id, screening_id=screening_id, day=day)
+
+@app.get("/admin/analytics")
+async def read_admin_analytics(
+    report: str = "group_by",
+    by: str = "genre,hour",
+    refresh: bool = False,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view analytics")
+
+    async with analytics_lock:
+        snapshot = None if refresh else analytics_snapshots.get("bookings")
+        if snapshot is None:
+            snapshot = await analytics.load_snapshot(db, ANALYTICS_CHUNK_SIZE)
+            analytics_snapshots.set("bookings", snapshot)
+
+    # Aggregations are CPU bound; numpy releases the GIL for most of the work
+    try:
+        rows = await asyncio.to_thread(analytics.run_report, snapshot, report, analytics.parse_dimensions(by))
+    except analytics.AnalyticsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"report": report, "bookings": len(snapshot), "rows": rows}
+
 @app.get("/users", response_model=List[schemas.User])
 async def read_all_users(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to view all users")
-    users = db.query(models.User).all()
+    users = (await db.scalars(select(models.User))).all()
     return users
 
 @app.put("/users/{user_id}", response_model=schemas.User)
@@ -191,17 +643,19 @@ async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if user is admin
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to update users")
     
     # Find the user to update
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    original_username = db_user.username
+
     # Prevent updating admin username if it's the admin account
     if db_user.username == "admin" and user_update.username and user_update.username != "admin":
         raise HTTPException(status_code=400, detail="Cannot change admin username")
@@ -209,26 +663,26 @@ async def update_user(
     # Update user fields
     if user_update.username is not None:
         # Check if username is taken by another user
-        existing_user = db.query(models.User).filter(
+        existing_user = await db.scalar(select(models.User.id).filter(
             models.User.username == user_update.username,
             models.User.id != user_id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(status_code=400, detail="Username already taken")
         db_user.username = user_update.username
     
     if user_update.email is not None:
         # Check if email is taken by another user
-        existing_user = db.query(models.User).filter(
+        existing_user = await db.scalar(select(models.User.id).filter(
             models.User.email == user_update.email,
             models.User.id != user_id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already taken")
         db_user.email = user_update.email
     
     if user_update.password:
-        db_user.hashed_password = get_password_hash(user_update.password)
+        db_user.hashed_password = await get_password_hash(user_update.password)
     
     if user_update.is_admin is not None:
         # Prevent removing admin status from the main admin account
@@ -237,18 +691,21 @@ async def update_user(
         db_user.is_admin = user_update.is_admin
     
     try:
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        principal_cache.invalidate(original_username)
+        principal_cache.invalidate(db_user.username)
+        invalidation_bus.publish("principals", {"usernames": [original_username, db_user.username]})
         return db_user
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/users/{user_id}", status_code=204)
 async def delete_user(
     user_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if user is admin
     if current_user.username != "admin":
@@ -259,183 +716,1018 @@ async def delete_user(
         raise HTTPException(status_code=400, detail="Cannot delete admin user")
     
     # Find the user
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Delete the user
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
+    principal_cache.invalidate(db_user.username)
+    invalidation_bus.publish("principals", {"usernames": [db_user.username]})
     
     return None
 
-@app.get("/users/me/bookings", response_model=List[schemas.Booking])
+async def get_history_db(current_user: models.User = Depends(get_current_user)):
+    # A user's own bookings are read back from the primary until a replica has them
+    async with replica_router.session((f"user:{current_user.id}",)) as db:
+        yield db
+
+@app.get("/users/me/bookings", response_model=List[schemas.BookingSummary])
 async def read_user_bookings(
+    expand: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_history_db)
 ):
-    return (
-        db.query(models.Booking)
+    expand = parse_expand(expand, projections.BOOKING_EXPANSIONS)
+    rows = (await db.execute(
+        select(*projections.BOOKING_COLUMNS, models.Movie.title.label("movie_title"), models.Screening.screening_time)
+        .join(models.Screening, models.Booking.screening_id == models.Screening.id)
+        .join(models.Movie, models.Screening.movie_id == models.Movie.id)
         .filter(models.Booking.user_id == current_user.id)
-        .join(models.Screening)
-        .join(models.Movie)
-        .options(
-            joinedload(models.Booking.screening)
-            .joinedload(models.Screening.movie)
-        )
-        .all()
-    )
+        .order_by(models.Booking.booking_time.desc())
+    )).all()
+    # Returned as a plain response so expanded relations are not stripped by the response model
+    return JSONResponse(await dump_rows(db, rows, schemas.BookingSummary, expand, projections.BOOKING_EXPANSIONS))
 
 # Movie routes
-@app.get("/movies", response_model=schemas.MovieList)
+def render_json(response_type, value) -> bytes:
+    adapter = get_type_adapter(response_type)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+def render_page(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+def cached_json_response(request: Request, entry: dict) -> Response:
+    # no-cache makes browsers revalidate with If-None-Match and get a 304 while the ETag holds
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if entry["etag"] in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+def movie_matches_listing(movie_id: int, genre: Optional[str], params: dict) -> bool:
+    if params.get("genre") and params["genre"] != genre:
+        return False
+    if params.get("search") and not search_index.matches(movie_id, params["search"]):
+        return False
+    return True
+
+def apply_movie_added(movie_id: int, title: str, description: Optional[str], genre: Optional[str]):
+    search_index.add(movie_id, title, description, genre)
+    # Only listings the new movie can appear in are dropped; cached detail pages stay valid
+    movie_cache.invalidate_where("movies", lambda params: movie_matches_listing(movie_id, genre, params))
+    invalidate_where(movie_count_cache, "count", lambda params: movie_matches_listing(movie_id, genre, params))
+    movie_cache.invalidate_where("featured", lambda params: True)
+
+def clear_catalogue_caches():
+    # A bulk change can touch any listing or detail page
+    movie_cache.clear()
+    movie_count_cache.clear()
+    # Showtimes carry their movie's genre
+    showtime_index.clear()
+
+def invalidate_seat_counts(movie_id: int):
+    # Seat counts appear in the movie detail and in any listing that expanded screenings
+    movie_cache.invalidate(movie_cache.make_key("movie", id=movie_id))
+    movie_cache.invalidate_where("movies", lambda params: "expand" in params)
+    movie_cache.invalidate_where("featured", lambda params: "expand" in params)
+
+# Sort key column and whether it is descending; id breaks ties so every ordering is total
+MOVIE_SORTS = {
+    "title": (models.Movie.title, False),
+    "rating": (models.Movie.rating, True),
+    "release_date": (models.Movie.release_date, True),
+}
+
+def keyset_order(column, id_column, descending: bool) -> tuple:
+    # Rows with no sort value go last in either direction, spelled out since databases disagree
+    # on where NULLs sort
+    if descending:
+        return (column.is_(None), column.desc(), id_column.desc())
+    return (column.is_(None), column, id_column)
+
+def keyset_after(column, id_column, descending: bool, value, last_id: int):
+    # Rows that follow (value, last_id) in keyset_order; only NULLs follow a NULL
+    if value is None:
+        return and_(column.is_(None), id_column < last_id if descending else id_column > last_id)
+    if descending:
+        after = or_(column < value, and_(column == value, id_column < last_id))
+    else:
+        after = or_(column > value, and_(column == value, id_column > last_id))
+    return or_(after, column.is_(None))
+
+def encode_movie_cursor(movie: models.Movie, sort: str) -> str:
+    value = getattr(movie, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, movie.id]).encode()).decode()
+
+def decode_movie_cursor(cursor: str, sort: str):
+    try:
+        value, movie_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "release_date" and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(movie_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def count_movies(db: AsyncSession, query, genre: Optional[str], search: Optional[str]) -> int:
+    cache_key = ResponseCache.make_key("count", genre=genre, search=search)
+    total = movie_count_cache.get(cache_key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        movie_count_cache.set(cache_key, total)
+    return total
+
+@app.get("/movies", response_model=Union[schemas.MovieList, schemas.MovieCursorPage])
 async def read_movies(
+    request: Request,
     skip: int = 0,
     limit: int = 10,
     genre: Optional[str] = None,
     search: Optional[str] = None,
     sort: Optional[str] = "title",
-    db: Session = Depends(get_db)
+    pagination: str = "offset",
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_catalogue_db)
 ):
-    query = db.query(models.Movie)
-    
-    if genre:
-        query = query.filter(models.Movie.genre == genre)
-    if search:
-        query = query.filter(models.Movie.title.ilike(f"%{search}%"))
-    
-    if sort == "rating":
-        query = query.order_by(models.Movie.rating.desc())
-    elif sort == "release_date":
-        query = query.order_by(models.Movie.release_date.desc())
-    else:
-        query = query.order_by(models.Movie.title)
-    
-    total = query.count()
-    movies = query.offset(skip).limit(limit).all()
-    
-    return {
-        "movies": movies,
-        "total": total,
-        "total_pages": (total + limit - 1) // limit
-    }
+    if pagination not in ("offset", "cursor"):
+        raise HTTPException(status_code=400, detail="pagination must be 'offset' or 'cursor'")
+    if not 1 <= limit <= MOVIE_PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MOVIE_PAGE_MAX_LIMIT}")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must not be negative")
+
+    # Normalise parameters so equivalent queries share a cache entry
+    genre = genre or None
+    search = search.strip().lower() if search and search.strip() else None
+    if sort == "relevance" and search:
+        if pagination == "cursor":
+            raise HTTPException(status_code=400, detail="Relevance ordering only supports offset pagination")
+    elif sort not in MOVIE_SORTS:
+        sort = "title"
+    if pagination == "cursor":
+        skip = None
+    expand = parse_expand(expand, projections.MOVIE_EXPANSIONS)
+    cache_key = movie_cache.make_key(
+        "movies", genre=genre, search=search, sort=sort, skip=skip, limit=limit,
+        pagination=pagination, cursor=cursor, expand=",".join(expand) or None
+    )
+
+    entry = movie_cache.get(cache_key)
+    if entry is None:
+        # Column-only rows: list pages never load ORM objects or their relationships
+        query = select(*projections.MOVIE_COLUMNS)
+
+        if genre:
+            query = query.filter(models.Movie.genre == genre)
+        if search:
+            # The index yields every match; the database applies the remaining filters, sort and count
+            ranked_ids = [movie_id for movie_id, _ in search_index.search(search)]
+            query = query.filter(models.Movie.id.in_(ranked_ids))
+
+        if sort == "relevance":
+            # Only the first SEARCH_MAX_RESULTS matches are ranked; total still counts every match
+            if skip + limit > SEARCH_MAX_RESULTS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Relevance ordering covers the first {SEARCH_MAX_RESULTS} matches; sort by title to page further"
+                )
+            matching_ids = set((await db.scalars(query.with_only_columns(models.Movie.id))).all())
+            ranked_ids = [movie_id for movie_id in ranked_ids if movie_id in matching_ids]
+            page_ids = ranked_ids[skip:skip + limit]
+            page = {
+                movie.id: movie
+                for movie in (await db.execute(
+                    select(*projections.MOVIE_COLUMNS).filter(models.Movie.id.in_(page_ids))
+                )).all()
+            }
+            total = len(ranked_ids)
+            movies = [page[movie_id] for movie_id in page_ids if movie_id in page]
+            entry = movie_cache.put(cache_key, render_page({
+                "movies": await dump_movie_rows(db, movies, expand),
+                "total": total,
+                "total_pages": (total + limit - 1) // limit
+            }))
+            return cached_json_response(request, entry)
 
-@app.get("/movies/featured", response_model=List[schemas.Movie])
-async def read_featured_movies(db: Session = Depends(get_db)):
-    return db.query(models.Movie).order_by(models.Movie.rating.desc()).limit(6).all()
+        total = await count_movies(db, query, genre, search)
+
+        column, descending = MOVIE_SORTS[sort]
+        query = query.order_by(*keyset_order(column, models.Movie.id, descending))
+
+        if pagination == "offset":
+            movies = (await db.execute(query.offset(skip).limit(limit))).all()
+            body = render_page({
+                "movies": await dump_movie_rows(db, movies, expand),
+                "total": total,
+                "total_pages": (total + limit - 1) // limit
+            })
+        else:
+            # Keyset pagination: seek past the last row of the previous page instead of scanning an OFFSET
+            if cursor:
+                value, last_id = decode_movie_cursor(cursor, sort)
+                query = query.filter(keyset_after(column, models.Movie.id, descending, value, last_id))
+            movies = (await db.execute(query.limit(limit + 1))).all()
+            next_cursor = encode_movie_cursor(movies[limit - 1], sort) if len(movies) > limit else None
+            body = render_page({
+                "movies": await dump_movie_rows(db, movies[:limit], expand),
+                "total": total,
+                "next_cursor": next_cursor
+            })
+
+        entry = movie_cache.put(cache_key, body)
+
+    return cached_json_response(request, entry)
+
+@app.get("/movies/featured", response_model=List[schemas.MovieSummary])
+async def read_featured_movies(request: Request, expand: Optional[str] = None, db: AsyncSession = Depends(get_catalogue_db)):
+    expand = parse_expand(expand, projections.MOVIE_EXPANSIONS)
+    cache_key = movie_cache.make_key("featured", expand=",".join(expand) or None)
+    entry = movie_cache.get(cache_key)
+    if entry is None:
+        movies = (await db.execute(
+            select(*projections.MOVIE_COLUMNS).order_by(models.Movie.rating.desc(), models.Movie.id).limit(6)
+        )).all()
+        entry = movie_cache.put(cache_key, render_page(
+            await dump_movie_rows(db, movies, expand)
+        ))
+    return cached_json_response(request, entry)
 
 @app.get("/movies/{movie_id}", response_model=schemas.Movie)
-async def read_movie(movie_id: int, db: Session = Depends(get_db)):
-    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
-    if movie is None:
-        raise HTTPException(status_code=404, detail="Movie not found")
-    return movie
+async def read_movie(movie_id: int, request: Request, db: AsyncSession = Depends(get_movie_read_db)):
+    cache_key = movie_cache.make_key("movie", id=movie_id)
+    entry = movie_cache.get(cache_key)
+    if entry is None:
+        movie = await db.scalar(select(models.Movie).options(*MOVIE_LOADERS).filter(models.Movie.id == movie_id))
+        if movie is None:
+            raise HTTPException(status_code=404, detail="Movie not found")
+        entry = movie_cache.put(cache_key, render_json(schemas.Movie, movie))
+    return cached_json_response(request, entry)
 
-@app.get("/movies/{movie_id}/screenings", response_model=List[schemas.Screening])
-async def read_movie_screenings(movie_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Screening).filter(models.Screening.movie_id == movie_id).all()
+@app.get("/movies/{movie_id}/screenings", response_model=List[schemas.ScreeningSummary])
+async def read_movie_screenings(movie_id: int, expand: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    expand = parse_expand(expand, projections.SCREENING_EXPANSIONS)
+    rows = (await db.execute(
+        select(*projections.SCREENING_COLUMNS)
+        .filter(models.Screening.movie_id == movie_id)
+        .order_by(models.Screening.screening_time, models.Screening.id)
+    )).all()
+    return JSONResponse(await dump_rows(db, rows, schemas.ScreeningSummary, expand, projections.SCREENING_EXPANSIONS))
 
 # Screening routes
+# The overlap check and the inserts of one schedule must not interleave with another's for the same theater
+theater_locks = scheduler.TheaterLocks()
+
+@app.post("/screenings/schedule", response_model=schemas.ScheduleResult, status_code=201)
+async def schedule_screenings(
+    schedule: schemas.ScreeningSchedule,
+    dry_run: bool = False,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to schedule screenings")
+    if not schedule.screenings:
+        raise HTTPException(status_code=400, detail="No screenings to schedule")
+    if len(schedule.screenings) > SCHEDULE_MAX_SLOTS:
+        raise HTTPException(status_code=400, detail=f"At most {SCHEDULE_MAX_SLOTS} screenings per request")
+
+    try:
+        async with theater_locks.hold(slot.theater_id for slot in schedule.screenings):
+            screening_ids = await scheduler.schedule_screenings(
+                db, schedule.screenings, timedelta(minutes=SCHEDULE_TURNAROUND_MINUTES), SCHEDULE_SEAT_BATCH_SIZE, dry_run
+            )
+    except scheduler.ScheduleInvalidError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except scheduler.ScheduleConflictError as e:
+        raise HTTPException(status_code=409, detail=e.conflicts)
+
+    scheduled = {
+        "movie_ids": sorted({slot.movie_id for slot in schedule.screenings}),
+        "days": sorted({slot.screening_time.date().isoformat() for slot in schedule.screenings}),
+    }
+    mark_written("catalogue")
+    apply_screenings_scheduled(scheduled)
+    invalidation_bus.publish("screenings_scheduled", scheduled)
+    return {"created": len(screening_ids), "screening_ids": screening_ids}
+
+@app.get("/screenings", response_model=List[schemas.ScreeningSummary])
+async def read_screenings(
+    day: Optional[date] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    theater_id: Optional[int] = None,
+    movie_id: Optional[int] = None,
+    genre: Optional[str] = None,
+    limit: int = 100,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # Screenings starting in [start, end) across all movies, in start order; a whole (UTC) day with
+    # day=, or the next few hours by default
+    expand = parse_expand(expand, projections.SCREENING_EXPANSIONS)
+    if day is not None:
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+    else:
+        start = scheduler.naive_utc(start) if start else datetime.utcnow()
+        end = scheduler.naive_utc(end) if end else start + timedelta(hours=SHOWTIME_DEFAULT_WINDOW_HOURS)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=SHOWTIME_MAX_WINDOW_DAYS):
+        raise HTTPException(status_code=400, detail=f"The window can span at most {SHOWTIME_MAX_WINDOW_DAYS} days")
+    if not 1 <= limit <= SHOWTIME_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SHOWTIME_MAX_RESULTS}")
+
+    # The index picks the screenings; their current seat counts come from a primary key lookup
+    screening_ids = [
+        showtime.screening_id
+        for showtime in await showtime_index.window(db, start, end, theater_id, movie_id, genre, limit)
+    ]
+    rows = {}
+    if screening_ids:
+        rows = {
+            row.id: row
+            for row in (await db.execute(
+                select(*projections.SCREENING_COLUMNS).filter(models.Screening.id.in_(screening_ids))
+            )).all()
+        }
+    ordered = [rows[screening_id] for screening_id in screening_ids if screening_id in rows]
+    return JSONResponse(await dump_rows(db, ordered, schemas.ScreeningSummary, expand, projections.SCREENING_EXPANSIONS))
+
 @app.get("/screenings/{screening_id}", response_model=schemas.Screening)
-async def read_screening(screening_id: int, db: Session = Depends(get_db)):
-    screening = db.query(models.Screening).filter(models.Screening.id == screening_id).first()
+async def read_screening(screening_id: int, db: AsyncSession = Depends(get_screening_read_db)):
+    screening = await db.scalar(
+        select(models.Screening).options(*SCREENING_LOADERS).filter(models.Screening.id == screening_id)
+    )
     if screening is None:
         raise HTTPException(status_code=404, detail="Screening not found")
     return screening
 
-@app.get("/bookings", response_model=List[schemas.Booking])
+@app.get("/screenings/{screening_id}/quote", response_model=schemas.PriceQuote)
+async def read_screening_quote(screening_id: int, seats: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    screening = await db.get(models.Screening, screening_id)
+    if screening is None:
+        raise HTTPException(status_code=404, detail="Screening not found")
+    try:
+        seat_numbers = [int(seat) for seat in (seats or "").split(",") if seat.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="seats must be a comma separated list of seat numbers")
+
+    table = await get_price_table(db, screening)
+    if any(not 1 <= seat <= table.total_seats for seat in seat_numbers):
+        raise HTTPException(status_code=400, detail=f"Seat numbers must be between 1 and {table.total_seats}")
+    return pricing.quote(table, seat_numbers)
+
+@app.get("/screenings/{screening_id}/seatmap", response_model=schemas.SeatMap)
+async def read_screening_seatmap(
+    screening_id: int,
+    encoding: str = "bitmap",
+    db: AsyncSession = Depends(get_db)
+):
+    if encoding not in ("bitmap", "ranges"):
+        raise HTTPException(status_code=400, detail="encoding must be 'bitmap' or 'ranges'")
+
+    screening = await db.scalar(
+        select(models.Screening).options(joinedload(models.Screening.theater)).filter(models.Screening.id == screening_id)
+    )
+    if screening is None:
+        raise HTTPException(status_code=404, detail="Screening not found")
+    await inventory.ensure_inventory(db, screening)
+
+    # Column-only read of the booked seat numbers, no booking objects are loaded
+    booked_seats = (await db.execute(select(models.ScreeningSeat.seat_number).filter(
+        models.ScreeningSeat.screening_id == screening_id,
+        models.ScreeningSeat.status == inventory.SEAT_BOOKED
+    ))).all()
+    total_seats = screening.theater.total_seats if screening.theater else screening.available_seats + len(booked_seats)
+    booked = SeatBitmap.from_seats(total_seats, (seat for (seat,) in booked_seats))
+    held = SeatBitmap.from_seats(
+        total_seats,
+        (seat for seat in await hold_store.held_seats(screening_id) if seat <= total_seats)
+    )
+    rows, seats_per_row = seat_layout(total_seats, SEATS_PER_ROW)
+
+    return {
+        "screening_id": screening_id,
+        "total_seats": total_seats,
+        "rows": rows,
+        "seats_per_row": seats_per_row,
+        "available_seats": screening.available_seats,
+        "encoding": encoding,
+        "booked": booked.to_base64() if encoding == "bitmap" else booked.to_ranges(),
+        "held": held.to_base64() if encoding == "bitmap" else held.to_ranges(),
+    }
+
+def booking_listing_query(
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    movie_id: Optional[int],
+    status: Optional[str]
+):
+    query = (
+        select(
+            *projections.BOOKING_COLUMNS, models.Movie.title.label("movie_title"),
+            models.Screening.screening_time, models.User.username
+        )
+        .join(models.Screening, models.Booking.screening_id == models.Screening.id)
+        .join(models.Movie, models.Screening.movie_id == models.Movie.id)
+        .join(models.User, models.Booking.user_id == models.User.id)
+    )
+    if date_from:
+        query = query.filter(models.Booking.booking_time >= date_from)
+    if date_to:
+        query = query.filter(models.Booking.booking_time < date_to)
+    if movie_id:
+        query = query.filter(models.Screening.movie_id == movie_id)
+    if status:
+        query = query.filter(models.Booking.status == status)
+    return query
+
+def encode_booking_cursor(booking) -> str:
+    booking_time = booking.booking_time.isoformat() if booking.booking_time else None
+    return base64.urlsafe_b64encode(json.dumps([booking_time, booking.id]).encode()).decode()
+
+def decode_booking_cursor(cursor: str):
+    try:
+        booking_time, booking_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(booking_time) if booking_time is not None else None, int(booking_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/bookings", response_model=schemas.BookingPage)
 async def get_all_bookings(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    movie_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to view all bookings")
-    
-    bookings = (
-        db.query(models.Booking)
-        .options(
-            joinedload(models.Booking.user),
-            joinedload(models.Booking.screening).joinedload(models.Screening.movie)
-        )
-        .order_by(models.Booking.booking_time.desc())
-        .all()
-    )
-    return bookings
+    if not 1 <= limit <= BOOKING_PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {BOOKING_PAGE_MAX_LIMIT}")
+    expand = parse_expand(expand, projections.BOOKING_EXPANSIONS)
 
-@app.post("/bookings", response_model=schemas.Booking)
-async def create_booking(
-    booking: schemas.BookingCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    # Newest first; keyset on (booking_time, id) so deep pages cost the same as the first
+    query = booking_listing_query(date_from, date_to, movie_id, status)
+    if cursor:
+        booking_time, last_id = decode_booking_cursor(cursor)
+        query = query.filter(keyset_after(models.Booking.booking_time, models.Booking.id, True, booking_time, last_id))
+    rows = (await db.execute(
+        query.order_by(*keyset_order(models.Booking.booking_time, models.Booking.id, True)).limit(limit + 1)
+    )).all()
+
+    return JSONResponse({
+        "bookings": await dump_rows(db, rows[:limit], schemas.BookingSummary, expand, projections.BOOKING_EXPANSIONS),
+        "next_cursor": encode_booking_cursor(rows[limit - 1]) if len(rows) > limit else None
+    })
+
+@app.get("/bookings/export")
+async def export_bookings(
+    format: str = "ndjson",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    movie_id: Optional[int] = None,
+    status: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user)
 ):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to export bookings")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    query = booking_listing_query(date_from, date_to, movie_id, status).order_by(models.Booking.id)
+
+    async def stream_rows():
+        # The export owns its session for the life of the response and reads through a
+        # server-side cursor in yield_per batches, so memory stays flat however many rows match
+        async with AsyncSessionLocal() as db:
+            rows = await db.stream(query.execution_options(yield_per=BOOKING_EXPORT_BATCH_SIZE))
+            async for row in rows:
+                yield row
+
+    if format == "csv":
+        return StreamingResponse(
+            exports.csv_lines(stream_rows()),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="bookings.csv"'}
+        )
+    return StreamingResponse(exports.ndjson_lines(stream_rows()), media_type="application/x-ndjson")
+
+async def admitted_ticket(
+    screening_id: int, current_user: models.User, ticket: Optional[str]
+) -> Optional[waitingroom.Admission]:
+    # Screenings without a waiting room are open to everyone; otherwise the user needs a queue
+    # ticket that has been admitted and whose admission window is still open
+    room = waiting_rooms.get(screening_id)
+    if room is None:
+        return None
+    seq = waiting_rooms.verify(ticket, room, current_user.username)
+    if seq is None or not await waiting_rooms.is_admitted(room, seq, current_user.username, waiting_rooms.now()):
+        raise HTTPException(
+            status_code=403,
+            detail="This screening has a waiting room; join the queue and wait to be admitted"
+        )
+    return waitingroom.Admission(room, seq)
+
+async def book_seats(
+    db: AsyncSession,
+    current_user: models.User,
+    screening_id: int,
+    seats: List[int],
+    admission: Optional[waitingroom.Admission] = None
+) -> models.Booking:
+    if not seats:
+        raise HTTPException(status_code=400, detail="No seats selected")
+    if len(set(seats)) != len(seats):
+        raise HTTPException(status_code=400, detail="Duplicate seats selected")
+
+    # Bookings let in through a waiting room take the next commit slot, so their writes never
+    # exceed the pacer's rate however many admitted users check out at once. The wait comes
+    # before any query, and whatever the session already read is ended, so a paced request
+    # holds neither a pooled connection nor an open transaction while it sleeps.
+    if admission is not None:
+        wait = waiting_rooms.pacer.reserve(time.monotonic(), WAITING_ROOM_MAX_COMMIT_WAIT_SECONDS)
+        if wait is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Bookings for this screening are busy, please retry shortly",
+                headers={"Retry-After": str(max(1, math.ceil(WAITING_ROOM_MAX_COMMIT_WAIT_SECONDS)))}
+            )
+        if db.in_transaction():
+            await db.commit()
+        await asyncio.sleep(wait)
+
     # Verify screening exists
-    screening = db.query(models.Screening).filter(models.Screening.id == booking.screening_id).first()
+    screening = await db.get(models.Screening, screening_id)
     if not screening:
         raise HTTPException(status_code=404, detail="Screening not found")
 
     # Verify seats are available
-    if len(booking.seats) > screening.available_seats:
+    if len(seats) > screening.available_seats:
         raise HTTPException(status_code=400, detail="Not enough seats available")
 
-    # Calculate total amount
-    total_amount = screening.price * len(booking.seats)
+    # Seats held by someone else cannot be booked until the hold is released or expires
+    held = await hold_store.held_seats(screening_id, exclude_user_id=current_user.id)
+    if any(seat in held for seat in seats):
+        raise HTTPException(status_code=409, detail="One or more selected seats are held by another customer")
+
+    await inventory.ensure_inventory(db, screening)
+    await stats.ensure_screening_stats(db, screening)
+
+    # Price the seats from the screening's current price table
+    table = await get_price_table(db, screening)
+    total_amount = pricing.quote(table, seats)["total"]
 
     # Create booking
     db_booking = models.Booking(
         user_id=current_user.id,
-        screening_id=booking.screening_id,
-        seats=booking.seats,
+        screening_id=screening_id,
+        num_seats=len(seats),
+        seats=seats,
         total_amount=total_amount,
         booking_time=datetime.utcnow(),
-        status="confirmed"
+        # Seats are claimed either way; a pending booking is cancelled if payment fails or never arrives
+        status=payments.BOOKING_PENDING if payment_provider else payments.BOOKING_CONFIRMED
     )
+    db.add(db_booking)
 
-    # Update available seats
-    screening.available_seats -= len(booking.seats)
+    # Claim the seats atomically; the booking only commits if every seat was still free
+    try:
+        await db.flush()
+        await inventory.claim_seats(db, screening_id, seats, db_booking.id)
+        await stats.record_booking(db, screening, len(seats), total_amount)
+        # With payments enabled the confirmation is queued by the payment worker instead
+        if db_booking.status == payments.BOOKING_CONFIRMED:
+            notifications.enqueue_confirmations(db, [(db_booking.id, screening.screening_time)], reminder_lead)
+        started = time.monotonic()
+        await db.commit()
+        commit_latency.observe(time.monotonic() - started)
+    except inventory.SeatUnavailableError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="One or more selected seats are no longer available")
 
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    if admission is not None:
+        await waiting_rooms.complete(admission.room, admission.seq)
 
-    return db_booking
+    job_wakeup.set()
+    mark_written(f"user:{current_user.id}", f"movie:{screening.movie_id}", f"screening:{screening_id}")
+    pricing_engine.adjust(screening_id, len(seats))
+    publish_seats(screening_id, seats, realtime.SEAT_BOOKED, sold=True, movie_id=screening.movie_id)
+    invalidate_seat_counts(screening.movie_id)
+
+    # Reload with the relationships the response model needs
+    db.expunge(db_booking)
+    return (await db.scalars(
+        select(models.Booking).options(*BOOKING_LOADERS).filter(models.Booking.id == db_booking.id)
+    )).unique().one()
+
+@app.post("/bookings", response_model=schemas.Booking)
+async def create_booking(
+    booking: schemas.BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    queue_ticket: Optional[str] = Header(None, alias="X-Queue-Ticket"),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if idempotency_key is None:
+        admission = await admitted_ticket(booking.screening_id, current_user, queue_ticket)
+        return await book_seats(db, current_user, booking.screening_id, booking.seats, admission)
+    if not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+
+    # Keys are scoped to the user, and bound to the request body they were first used with
+    key = f"{current_user.id}:{idempotency_key}"
+    ttl = timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    try:
+        record = await idempotency_store.begin(
+            key, idempotency.fingerprint("POST", "/bookings", booking.model_dump()), ttl, IDEMPOTENCY_WAIT_SECONDS
+        )
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except idempotency.IdempotencyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"}
+        )
+    if record is not None:
+        return Response(
+            content=record.body, status_code=record.status_code, media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    # Only a successful booking is remembered; a failed attempt rolled back, so the same key may retry it.
+    # Admission is checked only now since a replayed booking has already used its ticket up.
+    try:
+        admission = await admitted_ticket(booking.screening_id, current_user, queue_ticket)
+        db_booking = await book_seats(db, current_user, booking.screening_id, booking.seats, admission)
+        body = render_json(schemas.Booking, db_booking)
+    except BaseException:
+        await idempotency_store.release(key)
+        raise
+    await idempotency_store.complete(key, 200, body, ttl)
+    return Response(content=body, media_type="application/json")
 
 @app.delete("/bookings/{booking_id}", status_code=204)
 async def delete_booking(
     booking_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to delete bookings")
 
-    booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+    booking = await db.get(models.Booking, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
+    # A cancelled booking already gave its seats back and left the aggregates
+    if booking.status == payments.BOOKING_CANCELLED:
+        await db.delete(booking)
+        await db.commit()
+        return None
+
+    screening = await db.get(models.Screening, booking.screening_id)
+    if screening:
+        await stats.ensure_screening_stats(db, screening)
+    await notifications.enqueue_cancellations(db, [booking.id], "cancelled by the cinema")
+
     # Return seats to available pool
-    screening = db.query(models.Screening).filter(models.Screening.id == booking.screening_id).first()
+    tickets = await inventory.release_seats(db, booking)
+    released = (booking.screening_id, booking.seats or [])
+    if screening:
+        await stats.record_booking(db, screening, tickets, booking.total_amount or 0.0, sign=-1)
+
+    await db.delete(booking)
+    await db.commit()
+    job_wakeup.set()
+    mark_written(f"user:{booking.user_id}", f"screening:{booking.screening_id}",
+                 *([f"movie:{screening.movie_id}"] if screening else []))
+    pricing_engine.adjust(released[0], -tickets)
+    publish_seats(*released, realtime.SEAT_RELEASED, sold=True, movie_id=screening.movie_id if screening else None)
     if screening:
-        screening.available_seats += len(booking.seats)
+        invalidate_seat_counts(screening.movie_id)
+
+    return None
+
+# Payment routes
+@app.post("/bookings/{booking_id}/payment-intent", response_model=schemas.PaymentIntent)
+async def create_payment_intent(
+    booking_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if payment_provider is None:
+        raise HTTPException(status_code=503, detail="Payments are not enabled")
+    booking = await db.get(models.Booking, booking_id)
+    if not booking or booking.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if booking.status != payments.BOOKING_PENDING:
+        raise HTTPException(status_code=409, detail=f"Booking is {booking.status}")
+
+    # Charged in the currency's minor unit; the key makes a retried call return the same intent
+    try:
+        intent = await payment_provider.create_intent(
+            amount=round((booking.total_amount or 0) * 100),
+            currency=PAYMENT_CURRENCY,
+            metadata={"booking_id": str(booking.id), "user_id": str(current_user.id)},
+            idempotency_key=f"booking-{booking.id}",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Payment provider error: {e}")
+    if booking.payment_intent_id != intent["id"]:
+        booking.payment_intent_id = intent["id"]
+        await db.commit()
+    return {
+        "booking_id": booking.id,
+        "payment_intent_id": intent["id"],
+        "client_secret": intent["client_secret"],
+        "amount": booking.total_amount,
+        "currency": PAYMENT_CURRENCY,
+    }
 
-    db.delete(booking)
-    db.commit()
+@app.post("/payments/webhook")
+async def payment_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None, alias="Stripe-Signature"),
+    db: AsyncSession = Depends(get_db)
+):
+    if payment_provider is None:
+        raise HTTPException(status_code=503, detail="Payments are not enabled")
+    payload = await request.body()
+    try:
+        event = payment_provider.construct_event(payload, stripe_signature)
+    except stripe_integration.SignatureVerificationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not isinstance(event, dict) or "id" not in event:
+        raise HTTPException(status_code=400, detail="Invalid event")
+
+    # Acknowledge as soon as the event is durable; bookings are updated by the payment worker
+    queued = await payments.enqueue_event(db, event)
+    if queued:
+        payment_wakeup.set()
+    return {"received": True, "duplicate": not queued}
+
+# Seat hold routes
+@app.post("/holds", response_model=schemas.Hold)
+async def create_hold(
+    hold: schemas.HoldCreate,
+    queue_ticket: Optional[str] = Header(None, alias="X-Queue-Ticket"),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    screening = await db.get(models.Screening, hold.screening_id)
+    if not screening:
+        raise HTTPException(status_code=404, detail="Screening not found")
+    await admitted_ticket(hold.screening_id, current_user, queue_ticket)
+
+    if not hold.seats:
+        raise HTTPException(status_code=400, detail="No seats selected")
+    if len(set(hold.seats)) != len(hold.seats):
+        raise HTTPException(status_code=400, detail="Duplicate seats selected")
+
+    # Seats that are already sold cannot be held
+    await inventory.ensure_inventory(db, screening)
+    unavailable = await db.scalar(select(func.count()).select_from(models.ScreeningSeat).filter(
+        models.ScreeningSeat.screening_id == hold.screening_id,
+        models.ScreeningSeat.seat_number.in_(hold.seats),
+        models.ScreeningSeat.status == inventory.SEAT_AVAILABLE
+    )) != len(hold.seats)
+    if unavailable:
+        raise HTTPException(status_code=409, detail="One or more selected seats are no longer available")
+
+    ttl_minutes = hold.ttl_minutes or HOLD_TTL_MINUTES
+    try:
+        db_hold = await hold_store.create(hold.screening_id, current_user.id, hold.seats, timedelta(minutes=ttl_minutes))
+    except holds.SeatHeldError:
+        raise HTTPException(status_code=409, detail="One or more selected seats are held by another customer")
+
+    publish_seats(db_hold.screening_id, db_hold.seats, realtime.SEAT_HELD)
+    return db_hold
+
+async def get_user_hold(hold_id: str, current_user: models.User) -> holds.Hold:
+    hold = await hold_store.get(hold_id)
+    if not hold:
+        raise HTTPException(status_code=404, detail="Hold not found or expired")
+    if hold.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to use this hold")
+    return hold
+
+@app.post("/holds/{hold_id}/confirm", response_model=schemas.Booking)
+async def confirm_hold(
+    hold_id: str,
+    queue_ticket: Optional[str] = Header(None, alias="X-Queue-Ticket"),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    hold = await get_user_hold(hold_id, current_user)
+    admission = await admitted_ticket(hold.screening_id, current_user, queue_ticket)
+    db_booking = await book_seats(db, current_user, hold.screening_id, hold.seats, admission)
+    await hold_store.release(hold_id)
+    return db_booking
 
+@app.delete("/holds/{hold_id}", status_code=204)
+async def release_hold(
+    hold_id: str,
+    current_user: models.User = Depends(get_current_user)
+):
+    hold = await get_user_hold(hold_id, current_user)
+    await hold_store.release(hold_id)
+    publish_seats(hold.screening_id, hold.seats, realtime.SEAT_RELEASED)
     return None
 
+@app.websocket("/ws/screenings/{screening_id}")
+async def watch_screening_seats(websocket: WebSocket, screening_id: int):
+    await websocket.accept()
+    subscriber = seat_hub.subscribe(screening_id)
+
+    async def forward_updates():
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                # Too slow to keep up; the client should reconnect and refetch the seat map
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json(message)
+
+    sender = asyncio.create_task(forward_updates())
+    try:
+        # Client messages are ignored; receiving only detects the disconnect
+        while True:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        seat_hub.unsubscribe(subscriber)
+
+@app.post("/screenings/{screening_id}/waiting-room")
+async def open_waiting_room(
+    screening_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to manage waiting rooms")
+    if not await db.get(models.Screening, screening_id):
+        raise HTTPException(status_code=404, detail="Screening not found")
+    return await waiting_rooms.open(screening_id)
+
+@app.delete("/screenings/{screening_id}/waiting-room", status_code=204)
+async def close_waiting_room(screening_id: int, current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to manage waiting rooms")
+    if not await waiting_rooms.close(screening_id):
+        raise HTTPException(status_code=404, detail="This screening has no waiting room")
+
+def get_waiting_room(screening_id: int) -> waitingroom.Room:
+    room = waiting_rooms.get(screening_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="This screening has no waiting room")
+    return room
+
+@app.post("/screenings/{screening_id}/waiting-room/join", response_model=schemas.QueueTicket)
+async def join_waiting_room(screening_id: int, current_user: models.User = Depends(get_current_user)):
+    room = get_waiting_room(screening_id)
+    now = waiting_rooms.now()
+    seq = await waiting_rooms.join(room, current_user.username, now)
+    if seq is None:
+        raise HTTPException(status_code=404, detail="This screening has no waiting room")
+    return {
+        **await waiting_rooms.status(room, seq, current_user.username, now),
+        "ticket": waiting_rooms.ticket(room, current_user.username, seq),
+    }
+
+@app.get("/screenings/{screening_id}/waiting-room/status", response_model=schemas.QueueStatus)
+async def read_queue_status(
+    screening_id: int,
+    queue_ticket: Optional[str] = Header(None, alias="X-Queue-Ticket"),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Polling doubles as the heartbeat that keeps a queued ticket from being dropped
+    room = get_waiting_room(screening_id)
+    seq = waiting_rooms.verify(queue_ticket, room, current_user.username)
+    if seq is None:
+        raise HTTPException(status_code=403, detail="Invalid queue ticket")
+    now = waiting_rooms.now()
+    await waiting_rooms.seen(room, seq, now)
+    queue_status = await waiting_rooms.status(room, seq, current_user.username, now)
+    if queue_status["position"] is None:
+        raise HTTPException(status_code=410, detail="Queue ticket is no longer valid; join the queue again")
+    return queue_status
+
+@app.websocket("/ws/screenings/{screening_id}/waiting-room")
+async def watch_queue_status(websocket: WebSocket, screening_id: int, ticket: str):
+    # Pushes the ticket's status whenever admissions move the queue, and at least every half
+    # heartbeat so an open connection keeps the ticket alive; closes once admitted or gone
+    await websocket.accept()
+    username = (token_claims(ticket) or {}).get("sub")
+    room = waiting_rooms.get(screening_id)
+    seq = waiting_rooms.verify(ticket, room, username) if room else None
+    if seq is None:
+        await websocket.close(code=1008)
+        return
+    try:
+        while True:
+            current = waiting_rooms.get(screening_id)
+            if current is None or current.epoch != room.epoch:
+                # Closed, so booking is open to everyone; or closed and reopened, so the ticket is void
+                await websocket.send_json({"screening_id": screening_id, "admitted": current is None, "position": None})
+                break
+            changed = waiting_rooms.changed(room)
+            now = waiting_rooms.now()
+            await waiting_rooms.seen(room, seq, now)
+            queue_status = await waiting_rooms.status(room, seq, username, now)
+            await websocket.send_json(queue_status)
+            if queue_status["admitted"] or queue_status["position"] is None:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), WAITING_ROOM_HEARTBEAT_SECONDS / 2)
+            except asyncio.TimeoutError:
+                pass
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
 @app.post("/movies/add", response_model=schemas.Movie)
 async def add_movie(
     movie: schemas.MovieCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to add movies")
     
-    db_movie = models.Movie(**movie.dict())
+    # price belongs to screenings, not the movie row
+    db_movie = models.Movie(**movie.dict(exclude={"price"}))
     db.add(db_movie)
-    db.commit()
-    db.refresh(db_movie)
-    return db_movie
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="A movie with this title and release date already exists")
+    added = {"movie_id": db_movie.id, "title": db_movie.title, "description": db_movie.description, "genre": db_movie.genre}
+    mark_written("catalogue")
+    apply_movie_added(**added)
+    invalidation_bus.publish("movie_added", added)
+
+    return await db.scalar(
+        select(models.Movie).options(*MOVIE_LOADERS).filter(models.Movie.id == db_movie.id)
+    )
+
+@app.post("/movies/import", response_model=schemas.ImportReport)
+async def import_movies(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to import movies")
+    if format is None:
+        is_json = (file.filename or "").endswith((".json", ".ndjson", ".jsonl")) or "json" in (file.content_type or "")
+        format = "json" if is_json else "csv"
+    if format not in ("csv", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'json'")
+
+    # The upload is already spooled to a temporary file; records are read from it one batch at a time
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    report = catalogue_import.ImportReport(max_errors=IMPORT_MAX_ERRORS)
+    try:
+        await catalogue_import.import_movies(
+            db, catalogue_import.iter_records(stream, format), IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS,
+            on_batch=lambda movies: [search_index.add(*movie) for movie in movies], report=report
+        )
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Could not read catalogue: {e}")
+    finally:
+        stream.detach()
+        # Batches before a failure stay committed, so caches must drop them either way
+        if report.inserted or report.updated:
+            mark_written("catalogue")
+            clear_catalogue_caches()
+            invalidation_bus.publish("catalogue_imported", {})
+    return report.as_dict()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if WEB_CONCURRENCY > 1:
+        # Workers are separate processes, so uvicorn needs the app's import string
+        if INVALIDATION_BUS == "local":
+            print("Warning: INVALIDATION_BUS=local with several workers; their caches will diverge")
+        if STATE_STORE == "memory":
+            print("Warning: STATE_STORE=memory with several workers; seat holds, idempotency keys and waiting rooms will diverge")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Float, JSON, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config import Base
@@ -22,12 +22,15 @@ class Movie(Base):
     title = Column(String(255), index=True)
     description = Column(String(1000))
     duration = Column(Integer)  # in minutes
-    release_date = Column(DateTime)
+    release_date = Column(DateTime, index=True)
     genre = Column(String(100))
-    rating = Column(Float)
+    rating = Column(Float, index=True)
     image_url = Column(String(255))
     screenings = relationship("Screening", back_populates="movie")
 
+    # Catalogue imports match existing movies on title and release date, so there is at most one of each
+    __table_args__ = (Index("ix_movies_title_release_date", "title", "release_date", unique=True),)
+
 class Theater(Base):
     __tablename__ = "theaters"
 
@@ -49,6 +52,13 @@ class Screening(Base):
     theater = relationship("Theater", back_populates="screenings")
     bookings = relationship("Booking", back_populates="screening")
 
+    # Listings per movie and per theater, and the showtime index's per-day range scans
+    __table_args__ = (
+        Index("ix_screenings_movie_id_screening_time", "movie_id", "screening_time"),
+        Index("ix_screenings_theater_id_screening_time", "theater_id", "screening_time"),
+        Index("ix_screenings_screening_time", "screening_time"),
+    )
+
 class Booking(Base):
     __tablename__ = "bookings"
 
@@ -56,8 +66,143 @@ class Booking(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     screening_id = Column(Integer, ForeignKey("screenings.id"))
     num_seats = Column(Integer)
+    seats = Column(JSON)  # seat numbers claimed by this booking
     total_amount = Column(Float)
-    booking_time = Column(DateTime, default=datetime.utcnow)
+    booking_time = Column(DateTime, default=datetime.utcnow, index=True)
     status = Column(String(50))  # confirmed, cancelled, pending
+    payment_intent_id = Column(String(255), nullable=True, index=True)
     user = relationship("User", back_populates="bookings")
-    screening = relationship("Screening", back_populates="bookings") 
\ No newline at end of file
+    screening = relationship("Screening", back_populates="bookings")
+
+class ScreeningSeat(Base):
+    __tablename__ = "screening_seats"
+
+    # One row per physical seat of a screening; claims are conditional updates on these rows
+    screening_id = Column(Integer, ForeignKey("screenings.id"), primary_key=True)
+    seat_number = Column(Integer, primary_key=True)
+    status = Column(String(20), default="available")  # available, booked
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True, index=True)
+
+class SalesAggregate(Base):
+    __tablename__ = "sales_aggregates"
+
+    # Running totals per screening, maintained on every booking change; movie, day and total
+    # figures are summed from them. scope is always screening.
+    scope = Column(String(20), primary_key=True)
+    key = Column(String(32), primary_key=True)
+    bookings = Column(Integer, default=0, nullable=False)
+    tickets = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
+    capacity = Column(Integer, default=0, nullable=False)
+
+class PaymentEvent(Base):
+    __tablename__ = "payment_events"
+
+    # Durable queue of verified provider webhooks, drained in batches by the payment worker
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(255), unique=True)  # provider event id; redeliveries are dropped
+    type = Column(String(100))
+    payment_intent_id = Column(String(255), index=True)
+    payload = Column(JSON)
+    status = Column(String(20), default="queued", index=True)  # queued, done, refund_due
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    # Durable background work (notification emails); inserted in the same transaction as the change it reports
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50))
+    payload = Column(JSON)
+    status = Column(String(20), default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    # When a queued job becomes due; for a running job, when its claim lapses and it may be retried
+    run_at = Column(DateTime, default=datetime.utcnow)
+    claimed_by = Column(String(64), nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+class Invalidation(Base):
+    __tablename__ = "invalidations"
+
+    # Cache invalidation messages between workers; each worker polls for rows after the last it saw
+    id = Column(Integer, primary_key=True, index=True)
+    origin = Column(String(64))
+    topic = Column(String(50))
+    payload = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ReplicaHeartbeat(Base):
+    __tablename__ = "replica_heartbeat"
+
+    # One row the primary keeps updating; how far behind a replica's copy is gives its lag
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(Float)  # Unix time on the primary
+
+class SeatHold(Base):
+    __tablename__ = "seat_holds"
+
+    # Seat holds shared by every worker when STATE_STORE is db; held_seats is the per-seat index
+    hold_id = Column(String(32), primary_key=True)
+    screening_id = Column(Integer)
+    user_id = Column(Integer)
+    seats = Column(JSON)
+    expires_at = Column(DateTime, index=True)
+
+class HeldSeat(Base):
+    __tablename__ = "held_seats"
+
+    # At most one hold per seat; a live row of another user makes the seat unavailable to hold
+    screening_id = Column(Integer, primary_key=True)
+    seat_number = Column(Integer, primary_key=True)
+    hold_id = Column(String(32), index=True)
+    user_id = Column(Integer)
+    expires_at = Column(DateTime)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Booking results by Idempotency-Key; status_code stays NULL while the first request runs
+    key = Column(String(300), primary_key=True)
+    fingerprint = Column(String(64))
+    status_code = Column(Integer, nullable=True)
+    body = Column(Text, nullable=True)
+    expires_at = Column(DateTime, index=True)
+
+class WaitingRoom(Base):
+    __tablename__ = "waiting_rooms"
+
+    # One row per screening that has had a waiting room; times are Unix seconds since every
+    # worker reads them. version changes on every admission tick, so only one worker runs each.
+    screening_id = Column(Integer, primary_key=True)
+    is_open = Column(Boolean, default=True)
+    epoch = Column(String(32))
+    next_seq = Column(Integer, default=0)
+    admitted_through = Column(Integer, default=0)
+    allowance = Column(Float, default=0.0)
+    ticked_at = Column(Float)
+    version = Column(Integer, default=0)
+    admitted = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    abandoned = Column(Integer, default=0)
+    expired = Column(Integer, default=0)
+
+class WaitingRoomTicket(Base):
+    __tablename__ = "waiting_room_tickets"
+
+    # Queued (waiting) and admitted (active) tickets of open rooms; finished tickets are deleted
+    screening_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    username = Column(String(255))
+    state = Column(String(10))
+    last_seen = Column(Float)
+    closes_at = Column(Float, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("screening_id", "username", name="uq_waiting_room_tickets_user"),
+        Index("ix_waiting_room_tickets_state", "screening_id", "state", "seq"),
+    )
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional, Tuple
+import models
+import jobs
+from mailer import Mailer
+
+KIND_CONFIRMATION = "booking_confirmation"
+KIND_CANCELLATION = "booking_cancellation"
+KIND_REMINDER = "screening_reminder"
+KINDS = (KIND_CONFIRMATION, KIND_CANCELLATION, KIND_REMINDER)
+
+def booking_details_query():
+    return (
+        select(
+            models.Booking.id, models.Booking.status, models.Booking.seats, models.Booking.total_amount,
+            models.User.email, models.User.username, models.Movie.title,
+            models.Screening.screening_time, models.Theater.name.label("theater"),
+        )
+        .join(models.User, models.Booking.user_id == models.User.id)
+        .join(models.Screening, models.Booking.screening_id == models.Screening.id)
+        .join(models.Movie, models.Screening.movie_id == models.Movie.id)
+        .outerjoin(models.Theater, models.Screening.theater_id == models.Theater.id)
+    )
+
+def details_payload(row) -> dict:
+    return {
+        "booking_id": row.id,
+        "email": row.email,
+        "username": row.username,
+        "movie_title": row.title,
+        "screening_time": row.screening_time.isoformat(),
+        "theater": row.theater,
+        "seats": row.seats or [],
+        "total_amount": row.total_amount,
+    }
+
+def enqueue_confirmations(db: AsyncSession, bookings: Iterable[Tuple[int, datetime]], reminder_lead: timedelta):
+    # Confirmation now, and a reminder ahead of the show unless it starts sooner than that
+    now = datetime.utcnow()
+    for booking_id, screening_time in bookings:
+        jobs.enqueue(db, KIND_CONFIRMATION, {"booking_id": booking_id})
+        remind_at = screening_time - reminder_lead
+        if remind_at > now:
+            jobs.enqueue(db, KIND_REMINDER, {"booking_id": booking_id}, run_at=remind_at)
+
+async def enqueue_cancellations(db: AsyncSession, booking_ids: List[int], reason: str):
+    # Cancelled bookings may be deleted before the job runs, so the email's details are captured now
+    rows = (await db.execute(booking_details_query().filter(models.Booking.id.in_(booking_ids)))).all()
+    for row in rows:
+        jobs.enqueue(db, KIND_CANCELLATION, {**details_payload(row), "reason": reason})
+
+def render(kind: str, details: dict, sender: str) -> EmailMessage:
+    screening_time = datetime.fromisoformat(details["screening_time"]).strftime("%d %b %Y, %H:%M UTC")
+    seats = ", ".join(str(seat) for seat in details["seats"]) or "-"
+    show = f"{details['movie_title']} on {screening_time}" + (f" at {details['theater']}" if details.get("theater") else "")
+
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = details["email"]
+    if kind == KIND_CONFIRMATION:
+        message["Subject"] = f"Booking confirmed: {details['movie_title']}"
+        body = f"Your booking #{details['booking_id']} for {show} is confirmed.\nSeats: {seats}\nTotal: {details['total_amount']:.2f}"
+    elif kind == KIND_REMINDER:
+        message["Subject"] = f"Reminder: {details['movie_title']} starts soon"
+        body = f"Your show {show} is coming up.\nSeats: {seats}"
+    else:
+        message["Subject"] = f"Booking cancelled: {details['movie_title']}"
+        body = f"Your booking #{details['booking_id']} for {show} has been cancelled ({details.get('reason', 'cancelled')}).\nSeats: {seats}"
+    message.set_content(f"Hi {details['username']},\n\n{body}\n")
+    return message
+
+class Notifier:
+    # Job handler for every notification kind: one query for the bookings the batch refers to,
+    # then the whole batch goes out through the mailer in one go
+    def __init__(self, mailer: Mailer, sender: str):
+        self.mailer = mailer
+        self.sender = sender
+
+    async def handle(self, db: AsyncSession, batch: List[models.Job]) -> Dict[int, str]:
+        booking_ids = [job.payload["booking_id"] for job in batch if job.kind != KIND_CANCELLATION]
+        current: Dict[int, tuple] = {}
+        if booking_ids:
+            current = {
+                row.id: row
+                for row in (await db.execute(booking_details_query().filter(models.Booking.id.in_(booking_ids)))).all()
+            }
+
+        sending: List[models.Job] = []
+        messages: List[EmailMessage] = []
+        for job in batch:
+            details: Optional[dict] = job.payload
+            if job.kind != KIND_CANCELLATION:
+                row = current.get(job.payload["booking_id"])
+                # Deleted or cancelled since the job was queued: nothing left to confirm or remind about
+                details = details_payload(row) if row is not None and row.status == "confirmed" else None
+            if not details or not details.get("email"):
+                continue
+            sending.append(job)
+            messages.append(render(job.kind, details, self.sender))
+
+        if not messages:
+            return {}
+        errors = await self.mailer.send_batch(messages)
+        return {job.id: error for job, error in zip(sending, errors) if error}
+
+    def handlers(self) -> dict:
+        return {kind: self.handle for kind in KINDS}
@@ -0,0 +1,237 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, List, Optional
+import models
+import inventory
+import stats
+import notifications
+
+BOOKING_PENDING = "pending"
+BOOKING_CONFIRMED = "confirmed"
+BOOKING_CANCELLED = "cancelled"
+
+EVENT_QUEUED = "queued"
+EVENT_DONE = "done"
+# A payment that succeeded for a booking that no longer holds its seats; the customer is owed a refund
+EVENT_REFUND_DUE = "refund_due"
+
+# Webhook types that settle a pending booking; anything else is acknowledged and dropped
+SUCCEEDED_EVENTS = {"payment_intent.succeeded"}
+FAILED_EVENTS = {"payment_intent.payment_failed", "payment_intent.canceled"}
+
+@dataclass
+class BatchResult:
+    events: int = 0
+    confirmed: int = 0
+    # (screening_id, movie_id, seats) for every booking whose seats went back on sale
+    cancelled: List[tuple] = field(default_factory=list)
+    expired: int = 0
+    # (screening_id, movie_id, seats) for every expired booking whose late payment took its seats back
+    reconfirmed: List[tuple] = field(default_factory=list)
+    refunds_due: int = 0
+
+async def enqueue_event(db: AsyncSession, event: dict) -> bool:
+    # Persists a verified webhook; providers redeliver, so a repeated event id is a no-op
+    data = (event.get("data") or {}).get("object") or {}
+    db.add(models.PaymentEvent(
+        event_id=event["id"],
+        type=event.get("type"),
+        payment_intent_id=data.get("id") if str(data.get("id", "")).startswith("pi_") else None,
+        payload=event,
+        status=EVENT_QUEUED,
+        received_at=datetime.utcnow(),
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+async def cancel_bookings(db: AsyncSession, bookings: List[models.Booking], result: BatchResult):
+    # Puts the seats of unpaid bookings back on sale and takes them out of the sales aggregates
+    screenings = {
+        screening.id: screening
+        for screening in (await db.scalars(select(models.Screening).filter(
+            models.Screening.id.in_({booking.screening_id for booking in bookings})
+        ))).all()
+    }
+    # Rows were created when the booking was made; this only covers bookings older than the aggregates
+    for screening in screenings.values():
+        await stats.ensure_screening_stats(db, screening)
+    for booking in bookings:
+        tickets = await inventory.release_seats(db, booking)
+        screening = screenings.get(booking.screening_id)
+        if screening:
+            await stats.record_booking(db, screening, tickets, booking.total_amount or 0.0, sign=-1)
+        booking.status = BOOKING_CANCELLED
+        result.cancelled.append((booking.screening_id, screening.movie_id if screening else None, booking.seats or []))
+
+async def reconfirm_bookings(db: AsyncSession, bookings: List[models.Booking], result: BatchResult) -> List[tuple]:
+    # A payment that lands after its booking was cancelled takes the seats again if they are all
+    # still free and the show has not started; otherwise the booking stays cancelled
+    screenings = {
+        screening.id: screening
+        for screening in (await db.scalars(select(models.Screening).filter(
+            models.Screening.id.in_({booking.screening_id for booking in bookings})
+        ))).all()
+    }
+    now = datetime.utcnow()
+    confirmed = []
+    for booking in bookings:
+        screening = screenings.get(booking.screening_id)
+        if not screening or screening.screening_time <= now or not booking.seats:
+            continue
+        try:
+            # A savepoint, so a partial claim is undone without losing the rest of the batch
+            async with db.begin_nested():
+                await inventory.claim_seats(db, booking.screening_id, booking.seats, booking.id)
+        except inventory.SeatUnavailableError:
+            continue
+        # The aggregate row exists since the booking was cancelled out of it
+        await stats.record_booking(db, screening, len(booking.seats), booking.total_amount or 0.0)
+        booking.status = BOOKING_CONFIRMED
+        confirmed.append((booking.id, screening.screening_time))
+        result.reconfirmed.append((booking.screening_id, screening.movie_id, booking.seats))
+    return confirmed
+
+async def process_batch(db: AsyncSession, batch_size: int, pending_ttl: timedelta, reminder_lead: timedelta) -> BatchResult:
+    # Drains up to batch_size queued events in one transaction: every succeeded intent is confirmed
+    # with a single UPDATE, failed intents and pending bookings past their TTL are cancelled
+    result = BatchResult()
+    events = (await db.scalars(
+        select(models.PaymentEvent)
+        .filter(models.PaymentEvent.status == EVENT_QUEUED)
+        .order_by(models.PaymentEvent.id)
+        .limit(batch_size)
+    )).all()
+    result.events = len(events)
+    succeeded = {event.payment_intent_id for event in events if event.type in SUCCEEDED_EVENTS and event.payment_intent_id}
+    failed = {event.payment_intent_id for event in events if event.type in FAILED_EVENTS and event.payment_intent_id}
+
+    if succeeded:
+        paid = (await db.execute(
+            select(models.Booking.id, models.Screening.screening_time)
+            .join(models.Screening, models.Booking.screening_id == models.Screening.id)
+            .filter(models.Booking.payment_intent_id.in_(succeeded), models.Booking.status == BOOKING_PENDING)
+            .with_for_update()
+        )).all()
+        if paid:
+            await db.execute(
+                update(models.Booking)
+                .where(models.Booking.id.in_([row.id for row in paid]), models.Booking.status == BOOKING_PENDING)
+                .values(status=BOOKING_CONFIRMED)
+                .execution_options(synchronize_session=False)
+            )
+            notifications.enqueue_confirmations(db, paid, reminder_lead)
+        result.confirmed = len(paid)
+
+        late = (await db.scalars(
+            select(models.Booking)
+            .filter(models.Booking.payment_intent_id.in_(succeeded), models.Booking.status == BOOKING_CANCELLED)
+            .order_by(models.Booking.id)
+            .with_for_update()
+        )).all()
+        if late:
+            notifications.enqueue_confirmations(db, await reconfirm_bookings(db, late, result), reminder_lead)
+
+        # Whatever was paid for but is not confirmed now (expired with its seats resold, cancelled
+        # by the cinema, or unknown) is kept aside for a refund instead of being dropped
+        settled = set((await db.scalars(
+            select(models.Booking.payment_intent_id).filter(
+                models.Booking.payment_intent_id.in_(succeeded), models.Booking.status == BOOKING_CONFIRMED
+            )
+        )).all())
+        refund_due = [
+            event.id for event in events
+            if event.type in SUCCEEDED_EVENTS and event.payment_intent_id in succeeded - settled
+        ]
+        if refund_due:
+            await db.execute(
+                update(models.PaymentEvent)
+                .where(models.PaymentEvent.id.in_(refund_due))
+                .values(status=EVENT_REFUND_DUE, processed_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        result.refunds_due = len(refund_due)
+
+    # A success for the same intent wins over a failure delivered in the same batch
+    failed -= succeeded
+    cutoff = datetime.utcnow() - pending_ttl
+    conditions = [models.Booking.booking_time < cutoff]
+    if failed:
+        conditions.append(models.Booking.payment_intent_id.in_(failed))
+    to_cancel = (await db.scalars(
+        select(models.Booking)
+        .filter(models.Booking.status == BOOKING_PENDING, or_(*conditions))
+        .order_by(models.Booking.id)
+        .limit(batch_size)
+        .with_for_update()
+    )).all()
+    result.expired = sum(1 for booking in to_cancel if booking.payment_intent_id not in failed)
+    if to_cancel:
+        await notifications.enqueue_cancellations(db, [booking.id for booking in to_cancel], "payment not completed")
+        await cancel_bookings(db, to_cancel, result)
+
+    if events:
+        await db.execute(
+            update(models.PaymentEvent)
+            .where(models.PaymentEvent.id.in_([event.id for event in events]), models.PaymentEvent.status == EVENT_QUEUED)
+            .values(status=EVENT_DONE, processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return result
+
+async def read_metrics(db: AsyncSession, limit: int = 100) -> dict:
+    # Queue depth by status, and the payments waiting for a refund
+    counts = dict((await db.execute(
+        select(models.PaymentEvent.status, func.count()).group_by(models.PaymentEvent.status)
+    )).all())
+    refunds = (await db.execute(
+        select(models.PaymentEvent.event_id, models.PaymentEvent.payment_intent_id, models.PaymentEvent.processed_at)
+        .filter(models.PaymentEvent.status == EVENT_REFUND_DUE)
+        .order_by(models.PaymentEvent.id)
+        .limit(limit)
+    )).all()
+    return {
+        "events": counts,
+        "refunds_due": [
+            {"event_id": event_id, "payment_intent_id": intent, "processed_at": processed_at}
+            for event_id, intent, processed_at in refunds
+        ],
+    }
+
+async def run_worker(
+    session_factory,
+    wakeup: asyncio.Event,
+    interval_seconds: float,
+    batch_size: int,
+    pending_ttl: timedelta,
+    reminder_lead: timedelta,
+    on_batch: Optional[Callable[[BatchResult], None]] = None
+):
+    # Woken by the webhook handler as soon as an event is queued, and by a poll otherwise so
+    # events left over from a restart and expired pending bookings are still picked up
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        try:
+            while True:
+                async with session_factory() as db:
+                    result = await process_batch(db, batch_size, pending_ttl, reminder_lead)
+                if on_batch and (result.confirmed or result.cancelled or result.reconfirmed):
+                    on_batch(result)
+                if result.events < batch_size and len(result.cancelled) < batch_size:
+                    break
+                await asyncio.sleep(0)
+        except Exception as e:
+            # Queued events stay queued, so they are retried on the next wake-up
+            print(f"Payment worker error: {e}")
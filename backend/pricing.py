@@ -0,0 +1,290 @@
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from cache import TTLCache
+
+ZONE_FRONT = "front"
+ZONE_STANDARD = "standard"
+ZONE_PREMIUM = "premium"
+ZONE_FACTORS = {ZONE_FRONT: 0.85, ZONE_STANDARD: 1.0, ZONE_PREMIUM: 1.2}
+
+# (share of seats sold from which the step applies, multiplier), ascending
+OCCUPANCY_STEPS: Tuple[Tuple[float, float], ...] = ((0.0, 0.9), (0.3, 1.0), (0.6, 1.1), (0.8, 1.25), (0.95, 1.4))
+# (hours before the show from which the step applies, multiplier), furthest out first
+LEAD_TIME_STEPS: Tuple[Tuple[float, float], ...] = ((168, 0.95), (48, 1.0), (6, 1.05), (float("-inf"), 1.1))
+# Monday first; weekend evenings carry a premium, Tuesday is discount day
+DAY_FACTORS: Tuple[float, ...] = (0.95, 0.85, 0.95, 1.0, 1.1, 1.2, 1.15)
+
+def seat_zone(seat: int, total_seats: int, seats_per_row: int) -> str:
+    # Rows are numbered from the screen: the first quarter is front, 40-80% back is premium
+    rows = max(1, (total_seats + seats_per_row - 1) // seats_per_row) if seats_per_row else 1
+    row_share = ((seat - 1) // seats_per_row) / rows if seats_per_row else 0.5
+    if row_share < 0.25:
+        return ZONE_FRONT
+    if 0.4 <= row_share < 0.8:
+        return ZONE_PREMIUM
+    return ZONE_STANDARD
+
+@dataclass
+class PriceTable:
+    # Every price a screening can charge, precomputed as [lead time step][occupancy step][zone];
+    # a quote is a couple of index lookups and selling seats only moves the occupancy pointer
+    screening_id: int
+    screening_time: datetime
+    base_price: float
+    total_seats: int
+    seats_per_row: int
+    sold: int
+    # Seats sold at which each occupancy step starts
+    thresholds: List[int]
+    prices: List[List[Dict[str, float]]]
+    day_factor: float
+    dynamic: bool = True
+    step: int = 0
+    built_at: datetime = field(default_factory=datetime.utcnow)
+
+    def adjust(self, sold_delta: int):
+        self.sold = min(max(self.sold + sold_delta, 0), self.total_seats)
+        while self.step + 1 < len(self.thresholds) and self.sold >= self.thresholds[self.step + 1]:
+            self.step += 1
+        while self.step > 0 and self.sold < self.thresholds[self.step]:
+            self.step -= 1
+
+    def lead_step(self, now: datetime) -> int:
+        hours = (self.screening_time - now).total_seconds() / 3600
+        for position, (from_hours, _) in enumerate(LEAD_TIME_STEPS):
+            if hours >= from_hours:
+                return position
+        return len(LEAD_TIME_STEPS) - 1
+
+    def zone_prices(self, now: datetime) -> Dict[str, float]:
+        return self.prices[self.lead_step(now)][self.step]
+
+    def seat_price(self, seat: int, now: datetime) -> float:
+        return self.zone_prices(now)[seat_zone(seat, self.total_seats, self.seats_per_row)]
+
+def build_table(
+    screening_id: int,
+    screening_time: datetime,
+    base_price: float,
+    total_seats: int,
+    available_seats: int,
+    seats_per_row: int,
+    min_factor: float,
+    max_factor: float,
+    dynamic: bool = True
+) -> PriceTable:
+    total_seats = max(total_seats or 0, available_seats or 0, 1)
+    day_factor = DAY_FACTORS[screening_time.weekday()] if dynamic else 1.0
+    # Without dynamic pricing every price is clamped to the flat screening price
+    low, high = (base_price * min_factor, base_price * max_factor) if dynamic else (base_price, base_price)
+    prices = [
+        [
+            {
+                zone: round(min(max(base_price * day_factor * lead_factor * occupancy_factor * zone_factor, low), high), 2)
+                for zone, zone_factor in ZONE_FACTORS.items()
+            }
+            for _, occupancy_factor in OCCUPANCY_STEPS
+        ]
+        for _, lead_factor in LEAD_TIME_STEPS
+    ]
+    # A step starts once its share of the house is sold
+    thresholds = [math.ceil(share * total_seats - 1e-9) for share, _ in OCCUPANCY_STEPS]
+    table = PriceTable(
+        screening_id=screening_id,
+        screening_time=screening_time,
+        base_price=base_price,
+        total_seats=total_seats,
+        seats_per_row=seats_per_row,
+        sold=0,
+        thresholds=thresholds,
+        prices=prices,
+        day_factor=day_factor,
+        dynamic=dynamic,
+    )
+    table.adjust(total_seats - (available_seats or 0))
+    return table
+
+class PricingEngine:
+    # Price tables per screening, kept in a TTL cache; bookings and releases adjust the cached table
+    # in place, and the TTL bounds drift from changes made elsewhere (other workers, manual edits)
+    def __init__(self, seats_per_row: int, min_factor: float, max_factor: float, cache: TTLCache, dynamic: bool = True):
+        self.seats_per_row = seats_per_row
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.cache = cache
+        self.dynamic = dynamic
+
+    def lookup(self, screening) -> Optional[PriceTable]:
+        table = self.cache.get(screening.id)
+        # A changed base price or showtime makes the cached table useless
+        if table is None or table.base_price != (screening.price or 0.0) or table.screening_time != screening.screening_time:
+            return None
+        return table
+
+    def build(self, screening, total_seats: Optional[int]) -> PriceTable:
+        table = build_table(
+            screening.id, screening.screening_time, screening.price or 0.0, total_seats or screening.available_seats,
+            screening.available_seats, self.seats_per_row, self.min_factor, self.max_factor, self.dynamic
+        )
+        self.cache.set(screening.id, table)
+        return table
+
+    def adjust(self, screening_id: int, sold_delta: int):
+        table = self.cache.get(screening_id)
+        if table is not None:
+            table.adjust(sold_delta)
+
+    def invalidate(self, screening_id: int):
+        self.cache.invalidate(screening_id)
+
+def quote(table: PriceTable, seats: Iterable[int], now: Optional[datetime] = None) -> dict:
+    now = now or datetime.utcnow()
+    lead_step = table.lead_step(now)
+    zone_prices = table.prices[lead_step][table.step]
+    seat_prices = []
+    for seat in seats:
+        zone = seat_zone(seat, table.total_seats, table.seats_per_row)
+        seat_prices.append({"seat": seat, "zone": zone, "price": zone_prices[zone]})
+    return {
+        "screening_id": table.screening_id,
+        "base_price": table.base_price,
+        "occupancy": round(table.sold / table.total_seats, 4),
+        "factors": {
+            "occupancy": OCCUPANCY_STEPS[table.step][1] if table.dynamic else 1.0,
+            "lead_time": LEAD_TIME_STEPS[lead_step][1] if table.dynamic else 1.0,
+            "day": table.day_factor,
+        },
+        "zones": dict(zone_prices),
+        "seats": seat_prices,
+        "total": round(sum(entry["price"] for entry in seat_prices), 2),
+    }
+
+if __name__ == "__main__":
+    # python pricing.py simulate --seats 240 --base-price 250
+    # python pricing.py replay --day 2024-05-04
+    import argparse
+    import asyncio
+    import random
+    import time
+    from datetime import timedelta
+
+    parser = argparse.ArgumentParser(description="Replay a day of booking traffic through the pricing engine")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    simulate_parser = subcommands.add_parser("simulate", help="synthetic traffic for one screening")
+    simulate_parser.add_argument("--seats", type=int, default=240)
+    simulate_parser.add_argument("--seats-per-row", type=int, default=12)
+    simulate_parser.add_argument("--base-price", type=float, default=250.0)
+    simulate_parser.add_argument("--demand", type=float, default=1.1, help="expected requested seats / capacity")
+    simulate_parser.add_argument("--hours", type=float, default=24, help="booking window before the show")
+    simulate_parser.add_argument("--show-time", default="2024-05-04T19:00")
+    simulate_parser.add_argument("--seed", type=int, default=7)
+    replay_parser = subcommands.add_parser("replay", help="bookings recorded on one day, from the database")
+    replay_parser.add_argument("--day", required=True)
+    replay_parser.add_argument("--seats-per-row", type=int, default=12)
+    parser.add_argument("--min-factor", type=float, default=0.7)
+    parser.add_argument("--max-factor", type=float, default=1.6)
+    args = parser.parse_args()
+
+    def report(label: str, bookings: int, tickets: int, static: float, dynamic: float, quotes: int, elapsed: float):
+        print(f"{label}: {bookings} bookings, {tickets} tickets")
+        print(f"  static revenue  {static:12.2f}")
+        print(f"  dynamic revenue {dynamic:12.2f} ({(dynamic / static - 1) * 100 if static else 0:+.1f}%)")
+        print(f"  {quotes} quotes, {elapsed / max(quotes, 1) * 1e6:.2f} us per quote")
+
+    if args.command == "simulate":
+        # Groups of 1-6 arrive across the booking window, earlier arrivals less often; each group
+        # asks for adjacent free seats, preferring the middle of the house, and walks away if none are left
+        rng = random.Random(args.seed)
+        show_time = datetime.fromisoformat(args.show_time)
+        opens = show_time - timedelta(hours=args.hours)
+        arrivals = []
+        requested = 0
+        while requested < args.seats * args.demand:
+            size = rng.choice((1, 2, 2, 2, 3, 4, 4, 6))
+            arrivals.append((opens + timedelta(hours=args.hours * rng.random() ** 0.5), size))
+            requested += size
+        arrivals.sort()
+
+        table = build_table(1, show_time, args.base_price, args.seats, args.seats, args.seats_per_row,
+                            args.min_factor, args.max_factor)
+        free = list(range(1, args.seats + 1))
+        middle = args.seats / 2
+        static = dynamic = 0.0
+        bookings = tickets = quotes = 0
+        elapsed = 0.0
+        for arrived_at, size in arrivals:
+            if len(free) < size:
+                continue
+            free.sort(key=lambda seat: abs(seat - middle))
+            seats, free = free[:size], free[size:]
+            started = time.perf_counter()
+            total = quote(table, seats, arrived_at)["total"]
+            table.adjust(size)
+            elapsed += time.perf_counter() - started
+            quotes += 1
+            static += args.base_price * size
+            dynamic += total
+            bookings += 1
+            tickets += size
+        report(f"Simulated screening ({args.seats} seats, demand {args.demand:.0%})", bookings, tickets, static, dynamic, quotes, elapsed)
+    else:
+        from sqlalchemy import func, select
+        from config import AsyncSessionLocal
+        import models
+
+        async def replay():
+            day = datetime.fromisoformat(args.day)
+            start, end = day, day + timedelta(days=1)
+            async with AsyncSessionLocal() as db:
+                bookings = (await db.execute(
+                    select(models.Booking.screening_id, models.Booking.seats, models.Booking.num_seats,
+                           models.Booking.total_amount, models.Booking.booking_time)
+                    .filter(models.Booking.booking_time >= start, models.Booking.booking_time < end)
+                    .order_by(models.Booking.booking_time)
+                )).all()
+                screening_ids = {booking.screening_id for booking in bookings}
+                screenings = {
+                    row.id: row
+                    for row in (await db.execute(
+                        select(models.Screening.id, models.Screening.screening_time, models.Screening.price,
+                               models.Theater.total_seats)
+                        .outerjoin(models.Theater, models.Screening.theater_id == models.Theater.id)
+                        .filter(models.Screening.id.in_(screening_ids))
+                    )).all()
+                }
+                # Occupancy each screening already had when the day started
+                sold_before = dict((await db.execute(
+                    select(models.Booking.screening_id, func.coalesce(func.sum(models.Booking.num_seats), 0))
+                    .filter(models.Booking.screening_id.in_(screening_ids), models.Booking.booking_time < start)
+                    .group_by(models.Booking.screening_id)
+                )).all())
+
+            tables: Dict[int, PriceTable] = {}
+            static = dynamic = 0.0
+            tickets = 0
+            elapsed = 0.0
+            for booking in bookings:
+                screening = screenings.get(booking.screening_id)
+                if screening is None:
+                    continue
+                table = tables.get(screening.id)
+                if table is None:
+                    total_seats = screening.total_seats or 0
+                    table = tables[screening.id] = build_table(
+                        screening.id, screening.screening_time, screening.price or 0.0, total_seats,
+                        total_seats - sold_before.get(screening.id, 0), args.seats_per_row,
+                        args.min_factor, args.max_factor
+                    )
+                seats = booking.seats or list(range(1, (booking.num_seats or 0) + 1))
+                started = time.perf_counter()
+                total = quote(table, seats, booking.booking_time)["total"]
+                table.adjust(len(seats))
+                elapsed += time.perf_counter() - started
+                static += booking.total_amount or 0.0
+                dynamic += total
+                tickets += len(seats)
+            report(f"Replay of {args.day} across {len(tables)} screenings", len(bookings), tickets, static, dynamic, len(bookings), elapsed)
+
+        asyncio.run(replay())
@@ -0,0 +1,95 @@
+from fastapi import HTTPException
+from functools import lru_cache
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import models
+import schemas
+
+# Column-only projections used by list endpoints instead of loading ORM objects
+MOVIE_COLUMNS = (
+    models.Movie.id, models.Movie.title, models.Movie.description, models.Movie.duration,
+    models.Movie.release_date, models.Movie.genre, models.Movie.rating, models.Movie.image_url,
+)
+SCREENING_COLUMNS = (
+    models.Screening.id, models.Screening.movie_id, models.Screening.theater_id,
+    models.Screening.screening_time, models.Screening.price, models.Screening.available_seats,
+)
+THEATER_COLUMNS = (models.Theater.id, models.Theater.name, models.Theater.total_seats)
+BOOKING_COLUMNS = (
+    models.Booking.id, models.Booking.user_id, models.Booking.screening_id, models.Booking.num_seats,
+    models.Booking.seats, models.Booking.total_amount, models.Booking.booking_time, models.Booking.status,
+)
+USER_COLUMNS = (
+    models.User.id, models.User.username, models.User.email, models.User.is_admin,
+    models.User.is_active, models.User.created_at,
+)
+
+class Expansion(NamedTuple):
+    # Attribute of the parent row holding the key, the related columns, and the related column it matches
+    key: str
+    columns: tuple
+    match: object
+    schema: type
+    many: bool
+
+MOVIE_EXPANSIONS = {
+    "screenings": Expansion("id", SCREENING_COLUMNS, models.Screening.movie_id, schemas.ScreeningSummary, True),
+}
+SCREENING_EXPANSIONS = {
+    "movie": Expansion("movie_id", MOVIE_COLUMNS, models.Movie.id, schemas.MovieSummary, False),
+    "theater": Expansion("theater_id", THEATER_COLUMNS, models.Theater.id, schemas.Theater, False),
+    "bookings": Expansion("id", BOOKING_COLUMNS, models.Booking.screening_id, schemas.BookingSummary, True),
+}
+BOOKING_EXPANSIONS = {
+    "screening": Expansion("screening_id", SCREENING_COLUMNS, models.Screening.id, schemas.ScreeningSummary, False),
+    "user": Expansion("user_id", USER_COLUMNS, models.User.id, schemas.User, False),
+}
+
+@lru_cache(maxsize=None)
+def get_type_adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+def dump(response_type, value):
+    adapter = get_type_adapter(response_type)
+    return adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+
+def parse_expand(expand: Optional[str], expansions: Dict[str, Expansion]) -> List[str]:
+    names = sorted({name.strip() for name in (expand or "").split(",") if name.strip()})
+    unknown = [name for name in names if name not in expansions]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(unknown)}; allowed: {', '.join(sorted(expansions))}"
+        )
+    return names
+
+async def dump_rows(
+    db: AsyncSession,
+    rows: Sequence,
+    schema: type,
+    expand: Sequence[str] = (),
+    expansions: Optional[Dict[str, Expansion]] = None
+) -> List[dict]:
+    # One extra column-only query per expanded relation, however many rows there are
+    data = dump(List[schema], rows)
+    for name in expand:
+        expansion = expansions[name]
+        keys = {getattr(row, expansion.key) for row in rows}
+        related = (await db.execute(
+            select(*expansion.columns).filter(expansion.match.in_(keys))
+        )).all() if keys else []
+
+        match_key = expansion.match.key
+        if expansion.many:
+            grouped: Dict[object, list] = {key: [] for key in keys}
+            for related_row in related:
+                grouped[getattr(related_row, match_key)].append(related_row)
+            nested = {key: dump(List[expansion.schema], value) for key, value in grouped.items()}
+        else:
+            nested = {getattr(related_row, match_key): dump(expansion.schema, related_row) for related_row in related}
+
+        for item, row in zip(data, rows):
+            item[name] = nested.get(getattr(row, expansion.key), [] if expansion.many else None)
+    return data
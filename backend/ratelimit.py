@@ -0,0 +1,316 @@
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import json
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+@dataclass(frozen=True)
+class RouteClass:
+    # Lower priority values are admitted first from the waiting room
+    name: str
+    priority: int
+    rate: float
+    burst: float
+    # Anonymous classes (login, register) are limited per IP only
+    per_user: bool = True
+
+# (methods or None for any, path pattern, class name or None for exempt); the first match wins
+ROUTE_RULES: Tuple[Tuple[Optional[Tuple[str, ...]], "re.Pattern", Optional[str]], ...] = (
+    (None, re.compile(r"^/payments/webhook$"), None),
+    (("POST",), re.compile(r"^/(login|register|token)$"), "auth"),
+    (("POST", "DELETE"), re.compile(r"^/(bookings|holds)(/|$)"), "booking"),
+)
+DEFAULT_CLASS = "browse"
+
+def classify(method: str, path: str, classes: Dict[str, RouteClass]) -> Optional[RouteClass]:
+    for methods, pattern, name in ROUTE_RULES:
+        if (methods is None or method in methods) and pattern.match(path):
+            return classes.get(name) if name else None
+    return classes.get(DEFAULT_CLASS)
+
+class RateLimitBackend(ABC):
+    # Interface for token bucket storage; the in-memory backend is used unless a shared one is plugged in
+
+    @abstractmethod
+    async def take(self, buckets: Sequence[Tuple[str, float, float]], cost: float = 1.0) -> float:
+        # buckets are (key, rate per second, burst); takes cost from every bucket or from none,
+        # returning 0 when allowed or the seconds until all of them could allow it
+        raise NotImplementedError
+
+    def sweep(self, now: datetime, batch_size: int) -> list:
+        return []
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self):
+        # key -> [tokens, updated_at, rate, burst], least recently used first
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def _refill(self, key: str, rate: float, burst: float, now: float) -> list:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [burst, now, rate, burst]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1], bucket[2], bucket[3] = now, rate, burst
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def take(self, buckets: Sequence[Tuple[str, float, float]], cost: float = 1.0) -> float:
+        now = time.monotonic()
+        states = [self._refill(key, rate, burst, now) for key, rate, burst in buckets]
+        wait = max((((cost - state[0]) / state[2]) for state in states if state[0] < cost), default=0.0)
+        if wait > 0:
+            return wait
+        for state in states:
+            state[0] -= cost
+        return 0.0
+
+    def sweep(self, now: datetime, batch_size: int) -> list:
+        # Buckets that have refilled completely carry no state worth keeping
+        clock = time.monotonic()
+        removed = []
+        while self.buckets and len(removed) < batch_size:
+            key, (tokens, updated_at, rate, burst) = next(iter(self.buckets.items()))
+            if tokens + (clock - updated_at) * rate < burst:
+                break
+            del self.buckets[key]
+            removed.append(key)
+        return removed
+
+# All-or-nothing take across several buckets, run atomically inside Redis
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + 2 * i])
+    local burst = tonumber(ARGV[2 + 2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    available = math.min(burst, available + math.max(0, now - updated) * rate)
+    tokens[i] = available
+    if available < cost then
+        wait = math.max(wait, (cost - available) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + 2 * i])
+    local burst = tonumber(ARGV[2 + 2 * i])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - cost), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return '0'
+"""
+
+class RedisRateLimitBackend(RateLimitBackend):
+    # Shared buckets for running several workers; buckets expire in Redis once they would be full again
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio
+        self.client = redis.asyncio.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(TAKE_SCRIPT)
+
+    async def take(self, buckets: Sequence[Tuple[str, float, float]], cost: float = 1.0) -> float:
+        args: List[float] = [time.time(), cost]
+        for _, rate, burst in buckets:
+            args.extend((rate, burst))
+        wait = await self.script(keys=[self.prefix + key for key, _, _ in buckets], args=args)
+        return float(wait)
+
+class RateLimiter:
+    # Token buckets per IP and, for signed-in users, per user, kept separately for each route class
+    # so browsing cannot spend the tokens a user needs to book. IP buckets are larger since many
+    # users can share an address.
+    def __init__(self, classes: Dict[str, RouteClass], backend: RateLimitBackend, ip_multiplier: float):
+        self.classes = classes
+        self.backend = backend
+        self.ip_multiplier = ip_multiplier
+        self.limited = 0
+
+    async def check(self, route_class: RouteClass, ip: str, user: Optional[str]) -> float:
+        buckets = [(
+            f"ip:{ip}:{route_class.name}", route_class.rate * self.ip_multiplier, route_class.burst * self.ip_multiplier
+        )]
+        if user and route_class.per_user:
+            buckets.append((f"user:{user}:{route_class.name}", route_class.rate, route_class.burst))
+        wait = await self.backend.take(buckets)
+        if wait > 0:
+            self.limited += 1
+        return wait
+
+class AdmissionRejected(Exception):
+    def __init__(self, position: int, eta_seconds: float):
+        super().__init__(f"Waiting room position {position}")
+        self.position = position
+        self.eta_seconds = eta_seconds
+
+class AdmissionController:
+    # Global cap on requests in flight. Requests over the cap wait in a queue ordered by route
+    # priority, then arrival; no client may hold more than a few places in it. A request that
+    # cannot be admitted within max_wait is turned away with its position and estimated wait.
+    def __init__(self, max_concurrent: int, queue_size: int, max_wait_seconds: float, max_queued_per_client: int):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queued_per_client = max_queued_per_client
+        self.active = 0
+        # (priority, arrival, future); entries whose future is already done are skipped
+        self.waiters: list = []
+        self.arrivals = itertools.count()
+        self.waiting = 0
+        self.queued_by_client: Counter = Counter()
+        # Moving average of request duration, for wait estimates
+        self.service_seconds = 0.05
+        self.admitted = 0
+        self.rejected = 0
+
+    def estimate(self, position: int) -> float:
+        return round(position * self.service_seconds / self.max_concurrent, 2)
+
+    async def acquire(self, priority: int, client: str):
+        if self.active < self.max_concurrent and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        position = 1 + sum(1 for waiter_priority, _, future in self.waiters
+                           if waiter_priority <= priority and not future.done())
+        eta = self.estimate(position)
+        if (self.waiting >= self.queue_size or self.queued_by_client[client] >= self.max_queued_per_client
+                or eta > self.max_wait_seconds):
+            self.rejected += 1
+            raise AdmissionRejected(position, eta)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.arrivals), future))
+        self.waiting += 1
+        self.queued_by_client[client] += 1
+        try:
+            await asyncio.wait_for(future, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(position, eta)
+        except asyncio.CancelledError:
+            # The client went away after its slot was handed over; pass the slot on
+            if future.done() and not future.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            self.waiting -= 1
+            self.queued_by_client[client] -= 1
+            if not self.queued_by_client[client]:
+                del self.queued_by_client[client]
+        self.admitted += 1
+
+    def release(self, duration: float):
+        self.service_seconds += 0.1 * (duration - self.service_seconds)
+        # The slot goes straight to the next live waiter, so active is unchanged
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queued": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "service_seconds": round(self.service_seconds, 4),
+        }
+
+class RateLimitMiddleware:
+    # Plain ASGI middleware: rate limits for the request's route class, then admission through
+    # the global concurrency cap. Websockets and exempt routes pass straight through.
+    def __init__(
+        self,
+        app,
+        limiter: RateLimiter,
+        admission: AdmissionController,
+        identify: Callable[[str], Optional[str]],
+        trusted_proxies: Iterable[str] = ()
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.admission = admission
+        self.identify = identify
+        self.trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+
+    def is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_ip(self, scope, headers: Dict[bytes, bytes]) -> str:
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        if not self.trusted_proxies or b"x-forwarded-for" not in headers:
+            return ip
+        # Each proxy appends the address it received the request from, and anything left of a
+        # trusted hop was written by the client, so the client is the rightmost untrusted entry
+        hops = [hop.strip() for hop in headers[b"x-forwarded-for"].decode("latin-1").split(",") if hop.strip()]
+        while self.is_trusted(ip) and hops:
+            ip = hops.pop()
+        return ip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route_class = classify(scope["method"], scope["path"], self.limiter.classes)
+        # Preflight requests carry no credentials and cost nothing
+        if route_class is None or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        ip = self.client_ip(scope, headers)
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        user = self.identify(authorization[7:]) if authorization[:7].lower() == "bearer " else None
+
+        wait = await self.limiter.check(route_class, ip, user)
+        if wait > 0:
+            retry_after = max(1, math.ceil(wait))
+            return await send_json(send, 429, {"detail": "Too many requests", "retry_after": retry_after},
+                                   {"Retry-After": str(retry_after)})
+
+        try:
+            await self.admission.acquire(route_class.priority, f"user:{user}" if user else f"ip:{ip}")
+        except AdmissionRejected as e:
+            retry_after = max(1, math.ceil(e.eta_seconds))
+            return await send_json(send, 503, {
+                "detail": "The service is busy, please retry shortly",
+                "position": e.position,
+                "eta_seconds": e.eta_seconds,
+            }, {"Retry-After": str(retry_after)})
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(time.monotonic() - started)
+
+async def send_json(send, status: int, payload: dict, headers: Dict[str, str]):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+SEAT_HELD = "held"
+SEAT_BOOKED = "booked"
+SEAT_RELEASED = "available"
+
+class Subscriber:
+    def __init__(self, screening_id: int, queue_size: int):
+        self.screening_id = screening_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    async def get(self) -> Optional[dict]:
+        # None means the hub dropped this subscriber for falling behind
+        return await self.queue.get()
+
+class ScreeningHub:
+    # Per-screening fan-out: seat changes are coalesced for a short window, then one
+    # message is pushed to every watcher; watchers whose queue is full are dropped
+    def __init__(self, coalesce_seconds: float, queue_size: int):
+        self.coalesce_seconds = coalesce_seconds
+        self.queue_size = queue_size
+        self.subscribers: Dict[int, Set[Subscriber]] = {}
+        # screening_id -> seat_number -> latest state within the current window
+        self.pending: Dict[int, Dict[int, str]] = {}
+        self.dropped_count = 0
+
+    def subscribe(self, screening_id: int) -> Subscriber:
+        subscriber = Subscriber(screening_id, self.queue_size)
+        self.subscribers.setdefault(screening_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        watchers = self.subscribers.get(subscriber.screening_id)
+        if watchers is not None:
+            watchers.discard(subscriber)
+            if not watchers:
+                del self.subscribers[subscriber.screening_id]
+
+    def watcher_count(self, screening_id: int) -> int:
+        return len(self.subscribers.get(screening_id, ()))
+
+    def publish(self, screening_id: int, seats: Iterable[int], state: str):
+        # Nobody is watching, nothing to coalesce
+        if screening_id not in self.subscribers:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        first_in_window = screening_id not in self.pending
+        changes = self.pending.setdefault(screening_id, {})
+        for seat in seats:
+            changes[seat] = state
+        if first_in_window:
+            loop.call_later(self.coalesce_seconds, self._flush, screening_id)
+
+    def _flush(self, screening_id: int):
+        changes = self.pending.pop(screening_id, None)
+        if not changes:
+            return
+
+        message = {"screening_id": screening_id, "seats": {}}
+        for seat, state in sorted(changes.items()):
+            message["seats"].setdefault(state, []).append(seat)
+
+        for subscriber in list(self.subscribers.get(screening_id, ())):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped_count += 1
+        # Discard the backlog so the close signal is delivered immediately
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import Counter
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from cache import TTLCache
+import models
+
+HEARTBEAT_ID = 1
+
+class Replica:
+    def __init__(self, name: str, session_factory):
+        self.name = name
+        self.session_factory = session_factory
+        # Primary time of the newest heartbeat the replica has applied; None until read, or after an error
+        self.beat: Optional[float] = None
+        self.error: Optional[str] = None
+
+class ReplicaRouter:
+    # Hands out sessions for read-only routes: a replica when one is close enough behind the
+    # primary, otherwise the primary. Lag is measured with a heartbeat row the primary keeps
+    # updating; a replica that has applied a heartbeat newer than a write has that write too.
+    # Writes mark keys (a user, a movie, the catalogue) so reads for those keys wait for a
+    # replica that has caught up with them, which gives read-your-writes after booking.
+    def __init__(self, primary_session_factory, replicas: List[Replica], max_lag_seconds: float,
+                 max_marks: int = 100000):
+        self.primary_session_factory = primary_session_factory
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        # Once every usable replica is within max lag, a mark older than that can no longer matter
+        self.marks = TTLCache(max_marks, max_lag_seconds)
+        self.turn = 0
+        self.reads: Counter = Counter()
+
+    def mark(self, keys: Iterable[str], at: float):
+        for key in keys:
+            if at > self.marks.get(key, 0.0):
+                self.marks.set(key, at)
+
+    def choose(self, keys: Iterable[str], now: float) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        current = [
+            replica for replica in self.replicas
+            if replica.beat is not None and now - replica.beat <= self.max_lag_seconds
+        ]
+        written_at = max((self.marks.get(key, 0.0) for key in keys), default=0.0)
+        fresh = [replica for replica in current if replica.beat >= written_at]
+        if not fresh:
+            self.reads["primary_sticky" if current else "primary_lagging"] += 1
+            return None
+        self.turn += 1
+        replica = fresh[self.turn % len(fresh)]
+        self.reads[replica.name] += 1
+        return replica
+
+    def session(self, keys: Iterable[str] = ()) -> AsyncSession:
+        replica = self.choose(keys, time.time())
+        if replica is None:
+            return self.primary_session_factory()
+        db = replica.session_factory()
+        # The heartbeat the replica had applied when chosen, for caught_up
+        db.info["replica_beat"] = replica.beat
+        return db
+
+    def caught_up(self, db: AsyncSession, keys: Iterable[str]) -> bool:
+        # Whether a session already sees the writes to keys, for keys only known after a first
+        # query; primary sessions always do
+        beat = db.info.get("replica_beat")
+        if beat is None or beat >= max((self.marks.get(key, 0.0) for key in keys), default=0.0):
+            return True
+        self.reads["primary_sticky"] += 1
+        return False
+
+    async def heartbeat(self):
+        now = time.time()
+        async with self.primary_session_factory() as db:
+            updated = await db.execute(
+                update(models.ReplicaHeartbeat).filter(models.ReplicaHeartbeat.id == HEARTBEAT_ID).values(beat_at=now)
+            )
+            if not updated.rowcount:
+                db.add(models.ReplicaHeartbeat(id=HEARTBEAT_ID, beat_at=now))
+            await db.commit()
+        for replica in self.replicas:
+            try:
+                async with replica.session_factory() as db:
+                    replica.beat = await db.scalar(
+                        select(models.ReplicaHeartbeat.beat_at).filter(models.ReplicaHeartbeat.id == HEARTBEAT_ID)
+                    )
+                replica.error = None
+            except Exception as e:
+                # Unreachable or broken replicas are skipped until they answer again
+                replica.beat = None
+                replica.error = str(e)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "max_lag_seconds": self.max_lag_seconds,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "lag_seconds": round(now - replica.beat, 3) if replica.beat is not None else None,
+                    "error": replica.error,
+                }
+                for replica in self.replicas
+            ],
+            "reads": dict(self.reads),
+            "marks": self.marks.stats(),
+        }
+
+async def run_monitor(router: ReplicaRouter, interval_seconds: float):
+    while True:
+        try:
+            await router.heartbeat()
+        except Exception as e:
+            print(f"Replica heartbeat error: {e}")
+        await asyncio.sleep(interval_seconds)
+
+if __name__ == "__main__":
+    # python replicas.py replicate --primary primary.db --replica replica.db --interval 2
+    import argparse
+    import os
+    import sqlite3
+    from contextlib import closing
+
+    parser = argparse.ArgumentParser(description="Stand-in SQLite replication for trying replica routing locally")
+    parser.add_argument("command", choices=["replicate"])
+    parser.add_argument("--primary", required=True, help="primary database file")
+    parser.add_argument("--replica", required=True, help="replica database file")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies, i.e. the replica's lag")
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    def copy_database(primary: str, replica: str):
+        # Copy to a temporary file and swap it in, so readers never see a half-written replica;
+        # the API opens a new SQLite connection per session and picks the new file up
+        temporary = f"{replica}.tmp"
+        with closing(sqlite3.connect(primary)) as source, closing(sqlite3.connect(temporary)) as target:
+            source.backup(target)
+        os.replace(temporary, replica)
+
+    while True:
+        copy_database(args.primary, args.replica)
+        if args.once:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,198 @@
+import asyncio
+import bisect
+import heapq
+import weakref
+from collections import defaultdict
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+import models
+import inventory
+import stats
+
+class ScheduleInvalidError(Exception):
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid slots")
+        self.errors = errors
+
+class ScheduleConflictError(Exception):
+    def __init__(self, conflicts: List[dict]):
+        super().__init__(f"{len(conflicts)} overlapping slots")
+        self.conflicts = conflicts
+
+def naive_utc(value: datetime) -> datetime:
+    # Screening times are stored as naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+class IntervalIndex:
+    # Half-open [start, end) intervals kept sorted by start per theater
+    def __init__(self):
+        self.intervals: Dict[int, List[Tuple[datetime, datetime, Hashable]]] = defaultdict(list)
+
+    def add(self, theater_id: int, start: datetime, end: datetime, ref: Hashable):
+        bisect.insort(self.intervals[theater_id], (start, end, ref))
+
+    def conflicts(self) -> List[Tuple[int, Hashable, Hashable]]:
+        # Sweep each theater's timeline once, keeping a heap of the intervals still running;
+        # every interval still on the heap when a new one starts overlaps it
+        found = []
+        for theater_id, intervals in self.intervals.items():
+            running: List[Tuple[datetime, int, Hashable]] = []
+            for position, (start, end, ref) in enumerate(intervals):
+                while running and running[0][0] <= start:
+                    heapq.heappop(running)
+                found.extend((theater_id, other, ref) for _, _, other in running)
+                heapq.heappush(running, (end, position, ref))
+        return found
+
+class TheaterLocks:
+    # Schedules touching the same theater run one at a time within this process. Across workers
+    # the theater rows locked by schedule_screenings do the same on databases with row locks;
+    # SQLite has none, so it relies on this alone. A theater's lock lives only while a schedule
+    # holds or waits for it, so idle theaters leave nothing behind.
+    def __init__(self):
+        self.locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    def lock(self, theater_id: int) -> asyncio.Lock:
+        lock = self.locks.get(theater_id)
+        if lock is None:
+            lock = self.locks[theater_id] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, theater_ids: Iterable[int]):
+        # Always taken in id order, so two schedules sharing theaters cannot deadlock
+        async with AsyncExitStack() as stack:
+            for theater_id in sorted(set(theater_ids)):
+                await stack.enter_async_context(self.lock(theater_id))
+            yield
+
+async def schedule_screenings(
+    db: AsyncSession,
+    slots: Sequence,
+    turnaround: timedelta,
+    seat_batch_size: int,
+    dry_run: bool = False
+) -> List[int]:
+    # Validates a whole programme, rejects it if any slot overlaps another slot or an existing
+    # screening in the same theater, then inserts screenings and seat inventory in batches
+    for slot in slots:
+        slot.screening_time = naive_utc(slot.screening_time)
+    movie_ids = {slot.movie_id for slot in slots}
+    theater_ids = {slot.theater_id for slot in slots}
+    # The theater rows are locked until commit, so a concurrent schedule for the same theaters
+    # waits here and then sees the screenings this one inserts
+    theater_seats = dict((await db.execute(
+        select(models.Theater.id, models.Theater.total_seats)
+        .filter(models.Theater.id.in_(theater_ids))
+        .order_by(models.Theater.id)
+        .with_for_update()
+    )).all())
+    durations = dict((await db.execute(
+        select(models.Movie.id, models.Movie.duration).filter(models.Movie.id.in_(movie_ids))
+    )).all())
+
+    errors = []
+    for position, slot in enumerate(slots):
+        if slot.movie_id not in durations:
+            errors.append({"index": position, "error": f"Movie {slot.movie_id} not found"})
+        if slot.theater_id not in theater_seats:
+            errors.append({"index": position, "error": f"Theater {slot.theater_id} not found"})
+        if slot.price < 0:
+            errors.append({"index": position, "error": "price must not be negative"})
+        if slot.available_seats is not None and slot.theater_id in theater_seats and not (
+            0 <= slot.available_seats <= theater_seats[slot.theater_id]
+        ):
+            errors.append({
+                "index": position,
+                "error": f"available_seats must be between 0 and the theater's {theater_seats[slot.theater_id]} seats"
+            })
+    if errors:
+        raise ScheduleInvalidError(errors)
+
+    # A slot may sell fewer seats than the theater has; its inventory only holds the seats on sale
+    capacities = [
+        slot.available_seats if slot.available_seats is not None else theater_seats[slot.theater_id]
+        for slot in slots
+    ]
+
+    def slot_end(start: datetime, duration: int) -> datetime:
+        return start + timedelta(minutes=duration or 0) + turnaround
+
+    index = IntervalIndex()
+    for position, slot in enumerate(slots):
+        index.add(slot.theater_id, slot.screening_time, slot_end(slot.screening_time, durations[slot.movie_id]), ("slot", position))
+
+    # Existing screenings that can reach into the programme's window; the longest movie bounds how far back to look
+    window_start = min(slot.screening_time for slot in slots)
+    window_end = max(slot_end(slot.screening_time, durations[slot.movie_id]) for slot in slots)
+    longest = await db.scalar(select(func.max(models.Movie.duration))) or 0
+    # A locking read sees the latest committed screenings even where the transaction's snapshot is older
+    existing = (await db.execute(
+        select(models.Screening.id, models.Screening.theater_id, models.Screening.screening_time, models.Movie.duration)
+        .join(models.Movie, models.Screening.movie_id == models.Movie.id)
+        .filter(
+            models.Screening.theater_id.in_(theater_ids),
+            models.Screening.screening_time >= window_start - timedelta(minutes=longest) - turnaround,
+            models.Screening.screening_time < window_end
+        )
+        .with_for_update(read=True)
+    )).all()
+    for row in existing:
+        index.add(row.theater_id, row.screening_time, slot_end(row.screening_time, row.duration), ("screening", row.id))
+
+    conflicts = []
+    for theater_id, first, second in index.conflicts():
+        # Clashes between screenings that already exist are not this programme's problem
+        if first[0] == "screening" and second[0] == "screening":
+            continue
+        slot_ref, other = (first, second) if first[0] == "slot" else (second, first)
+        conflicts.append({
+            "index": slot_ref[1],
+            "theater_id": theater_id,
+            "conflicts_with": {"index": other[1]} if other[0] == "slot" else {"screening_id": other[1]},
+        })
+    if conflicts:
+        raise ScheduleConflictError(sorted(conflicts, key=lambda conflict: conflict["index"]))
+    if dry_run:
+        return []
+
+    # One executemany for every screening; ids are read back by (theater, start), which the
+    # overlap check has just made unique
+    await db.execute(insert(models.Screening), [
+        {
+            "movie_id": slot.movie_id,
+            "theater_id": slot.theater_id,
+            "screening_time": slot.screening_time,
+            "price": slot.price,
+            "available_seats": capacity,
+        }
+        for slot, capacity in zip(slots, capacities)
+    ])
+    created = {
+        (row.theater_id, row.screening_time): row.id
+        for row in (await db.execute(
+            select(models.Screening.id, models.Screening.theater_id, models.Screening.screening_time).filter(
+                models.Screening.theater_id.in_(theater_ids),
+                models.Screening.screening_time >= window_start,
+                models.Screening.screening_time < window_end
+            )
+        )).all()
+    }
+    screening_ids = [created[(slot.theater_id, slot.screening_time)] for slot in slots]
+
+    # Seat inventory for every new screening, flushed in fixed-size executemany batches
+    batch: List[dict] = []
+    for screening_id, capacity in zip(screening_ids, capacities):
+        batch.extend(inventory.seat_rows(screening_id, capacity))
+        if len(batch) >= seat_batch_size:
+            await db.execute(insert(models.ScreeningSeat), batch)
+            batch = []
+    if batch:
+        await db.execute(insert(models.ScreeningSeat), batch)
+
+    await stats.record_screenings(db, list(zip(screening_ids, capacities)))
+    await db.commit()
+    return screening_ids
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, List, Optional, Union
 from datetime import datetime
+from config import HOLD_TTL_MINUTES
 
 class Token(BaseModel):
     access_token: str
@@ -48,9 +49,9 @@ class MovieBase(BaseModel):
     title: str
     description: str
     duration: int
-    release_date: datetime
+    release_date: Optional[datetime] = None
     genre: str
-    rating: float
+    rating: Optional[float] = None
     image_url: Optional[str] = None
 
 class MovieCreate(BaseModel):
@@ -63,9 +64,8 @@ class MovieCreate(BaseModel):
     image_url: str
     price: Optional[float] = 300.00
 
-class Movie(MovieBase):
+class MovieSummary(MovieBase):
     id: int
-    screenings: List["Screening"] = []
 
     class Config:
         from_attributes = True
@@ -78,13 +78,18 @@ class ScreeningBase(BaseModel):
     available_seats: int
 
 class ScreeningCreate(ScreeningBase):
-    pass
+    # Defaults to the theater's seat count
+    available_seats: Optional[int] = None
 
-class Screening(ScreeningBase):
+class ScreeningSchedule(BaseModel):
+    screenings: List[ScreeningCreate]
+
+class ScheduleResult(BaseModel):
+    created: int
+    screening_ids: List[int]
+
+class ScreeningSummary(ScreeningBase):
     id: int
-    movie: Movie
-    theater: Theater
-    bookings: List["Booking"] = []
 
     class Config:
         from_attributes = True
@@ -96,18 +101,135 @@ class BookingBase(BaseModel):
 class BookingCreate(BookingBase):
     pass
 
+class BookingSummary(BaseModel):
+    id: int
+    user_id: int
+    screening_id: int
+    num_seats: Optional[int] = None
+    seats: Optional[List[int]] = None
+    total_amount: float
+    booking_time: Optional[datetime] = None
+    status: str
+    # Filled in by list endpoints from joined columns
+    movie_title: Optional[str] = None
+    screening_time: Optional[datetime] = None
+    username: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Nested models only embed summaries, so responses never recurse back into their parent
+class Movie(MovieSummary):
+    screenings: List[ScreeningSummary] = []
+
+class Screening(ScreeningSummary):
+    movie: MovieSummary
+    theater: Theater
+    bookings: List[BookingSummary] = []
+
 class Booking(BookingBase):
     id: int
     user_id: int
     total_amount: float
-    booking_time: datetime
+    booking_time: Optional[datetime] = None
     status: str
     screening: Screening
 
     class Config:
         from_attributes = True
 
+class PaymentIntent(BaseModel):
+    booking_id: int
+    payment_intent_id: str
+    client_secret: str
+    amount: float
+    currency: str
+
+class SeatPrice(BaseModel):
+    seat: int
+    zone: str
+    price: float
+
+class PriceQuote(BaseModel):
+    screening_id: int
+    base_price: float
+    occupancy: float
+    factors: Dict[str, float]
+    zones: Dict[str, float]
+    seats: List[SeatPrice]
+    total: float
+
 class MovieList(BaseModel):
-    movies: List[Movie]
+    movies: List[MovieSummary]
     total: int
-    total_pages: int 
\ No newline at end of file
+    total_pages: int
+
+class MovieCursorPage(BaseModel):
+    movies: List[MovieSummary]
+    total: int
+    next_cursor: Optional[str] = None
+
+class BookingPage(BaseModel):
+    bookings: List[BookingSummary]
+    next_cursor: Optional[str] = None
+
+class SalesStats(BaseModel):
+    bookings: int
+    tickets: int
+    revenue: float
+    capacity: int
+    fill_rate: float
+
+class AdminStats(BaseModel):
+    total: SalesStats
+    movie: Optional[SalesStats] = None
+    screening: Optional[SalesStats] = None
+    day: Optional[SalesStats] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[dict]
+
+class ImportReport(BaseModel):
+    inserted: int
+    updated: int
+    failed: int
+    conflicts: int = 0
+    errors: List[ImportRowError]
+
+class HoldCreate(BaseModel):
+    screening_id: int
+    seats: List[int]
+    # Shorter holds may be asked for, never longer than the configured TTL
+    ttl_minutes: Optional[int] = Field(None, gt=0, le=HOLD_TTL_MINUTES)
+
+class Hold(BaseModel):
+    hold_id: str
+    screening_id: int
+    user_id: int
+    seats: List[int]
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class QueueStatus(BaseModel):
+    screening_id: int
+    # 0 once admitted; None when the ticket is no longer in the queue
+    position: Optional[int] = None
+    admitted: bool
+    eta_seconds: Optional[float] = None
+    admission_expires_in: Optional[float] = None
+
+class QueueTicket(QueueStatus):
+    ticket: str
+
+class SeatMap(BaseModel):
+    screening_id: int
+    total_seats: int
+    rows: int
+    seats_per_row: int
+    available_seats: int
+    encoding: str  # "bitmap": base64 bits, seat N at bit N-1 MSB first; "ranges": inclusive [start, end] runs
+    booked: Union[str, List[List[int]]]
+    held: Union[str, List[List[int]]]
@@ -0,0 +1,157 @@
+import bisect
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Matches in the title count for more than matches in the description
+FIELD_WEIGHTS = {"title": 3.0, "genre": 2.0, "description": 1.0}
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+class SearchIndex:
+    # In-process inverted index over movie title, genre and description.
+    # The last query token is matched as a prefix so partially typed words find results.
+    def __init__(self, max_prefix_expansions: int = 50):
+        self.max_prefix_expansions = max_prefix_expansions
+        # term -> movie_id -> field-weighted term frequency
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_terms: Dict[int, Set[str]] = {}
+        # Sorted vocabulary for prefix lookups with bisect
+        self.terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, movie_id: int, title: Optional[str], description: Optional[str], genre: Optional[str]):
+        if movie_id in self.doc_terms:
+            self.remove(movie_id)
+
+        weights: Dict[str, float] = {}
+        for field, text in (("title", title), ("genre", genre), ("description", description)):
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + FIELD_WEIGHTS[field]
+
+        for term, weight in weights.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+            postings[movie_id] = weight
+        self.doc_terms[movie_id] = set(weights)
+
+    def remove(self, movie_id: int):
+        for term in self.doc_terms.pop(movie_id, ()):
+            postings = self.postings[term]
+            postings.pop(movie_id, None)
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    def _expand(self, token: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [token] if token in self.postings else []
+        start = bisect.bisect_left(self.terms, token)
+        expanded = []
+        for term in self.terms[start:start + self.max_prefix_expansions]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def _query_terms(self, query: str) -> List[List[str]]:
+        tokens = tokenize(query)
+        return [self._expand(token, prefix=i == len(tokens) - 1) for i, token in enumerate(tokens)]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        # Every query token must match; results are ranked by summed tf-idf
+        query_terms = self._query_terms(query)
+        if not query_terms or any(not terms for terms in query_terms):
+            return []
+
+        total_docs = len(self.doc_terms)
+        scores: Optional[Dict[int, float]] = None
+        # Start from the rarest token so the candidate set shrinks as fast as possible
+        for terms in sorted(query_terms, key=lambda terms: sum(len(self.postings[term]) for term in terms)):
+            token_scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self.postings[term]
+                idf = math.log(1 + total_docs / len(postings))
+                candidates = postings if scores is None else (m for m in scores if m in postings)
+                for movie_id in candidates:
+                    score = postings[movie_id] * idf
+                    if score > token_scores.get(movie_id, 0.0):
+                        token_scores[movie_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {movie_id: scores[movie_id] + score for movie_id, score in token_scores.items()}
+            if not scores:
+                return []
+
+        def rank(item):
+            return (-item[1], item[0])
+        if limit:
+            return heapq.nsmallest(limit, scores.items(), key=rank)
+        return sorted(scores.items(), key=rank)
+
+    def matches(self, movie_id: int, query: str) -> bool:
+        # Whether a single indexed movie would appear in the results for query
+        doc_terms = self.doc_terms.get(movie_id, set())
+        tokens = tokenize(query)
+        for i, token in enumerate(tokens):
+            if i == len(tokens) - 1:
+                if not any(term.startswith(token) for term in doc_terms):
+                    return False
+            elif token not in doc_terms:
+                return False
+        return bool(tokens)
+
+if __name__ == "__main__":
+    # Query latency at 100k movies: inverted index versus the LIKE '%term%' path of GET /movies,
+    # which counts every match for the total and then fetches one page (SQLite, in memory)
+    import random
+    import sqlite3
+    import time
+
+    # Synthetic vocabulary with a Zipf-like word frequency, as in natural-language titles and plots
+    random.seed(7)
+    syllables = ["ka", "lo", "mi", "ra", "su", "te", "vo", "ne", "di", "ar", "en", "os"]
+    words = sorted({"".join(random.choices(syllables, k=random.randint(2, 4))) for _ in range(8000)})
+    random.shuffle(words)
+    frequencies = [1 / rank for rank in range(1, len(words) + 1)]
+    genres = ["Action", "Drama", "Comedy", "Sci-Fi", "Thriller", "Crime"]
+
+    index = SearchIndex()
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE movies (id INTEGER PRIMARY KEY, title TEXT, description TEXT, genre TEXT)")
+    connection.execute("CREATE INDEX ix_movies_title ON movies (title)")
+    rows = []
+    for movie_id in range(1, 100_001):
+        title = " ".join(random.choices(words, frequencies, k=3))
+        description = " ".join(random.choices(words, frequencies, k=25))
+        genre = random.choice(genres)
+        rows.append((movie_id, title, description, genre))
+        index.add(movie_id, title, description, genre)
+    connection.executemany("INSERT INTO movies VALUES (?, ?, ?, ?)", rows)
+
+    queries = [words[50], words[400], f"{words[20]} {words[300][:3]}", words[2000][:4], "zzz"]
+    for query in queries:
+        started = time.perf_counter()
+        for _ in range(20):
+            results = index.search(query, limit=1000)
+        indexed_ms = (time.perf_counter() - started) / 20 * 1000
+
+        started = time.perf_counter()
+        for _ in range(20):
+            like_total = connection.execute(
+                "SELECT count(*) FROM movies WHERE title LIKE ?", (f"%{query}%",)
+            ).fetchone()[0]
+            connection.execute(
+                "SELECT id FROM movies WHERE title LIKE ? ORDER BY title LIMIT 20", (f"%{query}%",)
+            ).fetchall()
+        like_ms = (time.perf_counter() - started) / 20 * 1000
+        print(f"{query!r:20} index {indexed_ms:8.2f} ms ({len(results)} hits)   LIKE {like_ms:8.2f} ms ({like_total} hits)")
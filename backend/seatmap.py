@@ -0,0 +1,82 @@
+import base64
+import re
+from typing import Iterable, List
+
+class SeatBitmap:
+    # One bit per seat, seat N stored at bit N-1, most significant bit first within each byte
+    def __init__(self, total_seats: int):
+        self.total_seats = total_seats
+        self.bits = bytearray((total_seats + 7) // 8)
+
+    @classmethod
+    def from_seats(cls, total_seats: int, seats: Iterable[int]) -> "SeatBitmap":
+        bitmap = cls(total_seats)
+        for seat in seats:
+            bitmap.set(seat)
+        return bitmap
+
+    def _position(self, seat: int):
+        if not 1 <= seat <= self.total_seats:
+            raise IndexError(f"Seat {seat} out of range 1..{self.total_seats}")
+        index = seat - 1
+        return index >> 3, 0x80 >> (index & 7)
+
+    def set(self, seat: int):
+        byte, mask = self._position(seat)
+        self.bits[byte] |= mask
+
+    def clear(self, seat: int):
+        byte, mask = self._position(seat)
+        self.bits[byte] &= ~mask & 0xFF
+
+    def is_set(self, seat: int) -> bool:
+        byte, mask = self._position(seat)
+        return bool(self.bits[byte] & mask)
+
+    def count(self) -> int:
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+    def to_base64(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode("ascii")
+
+    def to_ranges(self) -> List[List[int]]:
+        # Inclusive [start, end] runs of set seats
+        bit_string = "".join(format(byte, "08b") for byte in self.bits)[:self.total_seats]
+        return [[run.start() + 1, run.end()] for run in re.finditer("1+", bit_string)]
+
+def seat_layout(total_seats: int, seats_per_row: int):
+    rows = (total_seats + seats_per_row - 1) // seats_per_row if seats_per_row else 0
+    return rows, seats_per_row
+
+if __name__ == "__main__":
+    # Compare a 500-seat hall's seat map payload with serialising one booking object per sale
+    import json
+    import random
+    import timeit
+    from datetime import datetime
+
+    total_seats = 500
+    booked = random.sample(range(1, total_seats + 1), 350)
+    bookings = [
+        {
+            "id": i,
+            "user_id": i,
+            "screening_id": 1,
+            "seats": booked[i:i + 2],
+            "total_amount": 600.0,
+            "booking_time": datetime.utcnow().isoformat(),
+            "status": "confirmed",
+        }
+        for i in range(0, len(booked), 2)
+    ]
+    bitmap = SeatBitmap.from_seats(total_seats, booked)
+
+    payloads = {
+        "bitmap (base64)": lambda: json.dumps({"booked": bitmap.to_base64()}),
+        "ranges": lambda: json.dumps({"booked": bitmap.to_ranges()}),
+        "bookings list": lambda: json.dumps(bookings),
+    }
+    for name, encode in payloads.items():
+        size = len(encode())
+        seconds = timeit.timeit(encode, number=1000) / 1000
+        print(f"{name:16} {size:7d} bytes {seconds * 1e6:9.1f} us/encode")
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, NamedTuple, Optional
+from cache import TTLCache
+import models
+
+class Showtime(NamedTuple):
+    screening_time: datetime
+    screening_id: int
+    movie_id: int
+    theater_id: int
+    genre: Optional[str]
+
+class DayShowtimes:
+    # One day's screenings sorted by start time, with the start times in a parallel list for bisect
+    def __init__(self, day: date, showtimes: List[Showtime]):
+        self.day = day
+        self.showtimes = sorted(showtimes)
+        self.times = [showtime.screening_time for showtime in self.showtimes]
+
+    def __len__(self) -> int:
+        return len(self.showtimes)
+
+    def between(self, start: datetime, end: datetime) -> List[Showtime]:
+        return self.showtimes[bisect.bisect_left(self.times, start):bisect.bisect_left(self.times, end)]
+
+async def load_day(db: AsyncSession, day: date) -> DayShowtimes:
+    # A range scan on the screening_time index, joined to the movie for its genre
+    start = datetime.combine(day, time.min)
+    rows = (await db.execute(
+        select(
+            models.Screening.screening_time, models.Screening.id, models.Screening.movie_id,
+            models.Screening.theater_id, models.Movie.genre
+        )
+        .outerjoin(models.Movie, models.Screening.movie_id == models.Movie.id)
+        .filter(models.Screening.screening_time >= start, models.Screening.screening_time < start + timedelta(days=1))
+    )).all()
+    return DayShowtimes(day, [Showtime(*row) for row in rows])
+
+class ShowtimeIndex:
+    # Per-day showtime lists loaded on first use and kept in a TTL cache. Screening changes made
+    # here invalidate their day; the TTL picks up changes made by other processes.
+    def __init__(self, max_days: int, ttl_seconds: float):
+        self.days = TTLCache(max_days, ttl_seconds)
+        self.lock = asyncio.Lock()
+
+    async def day(self, db: AsyncSession, day: date) -> DayShowtimes:
+        showtimes = self.days.get(day)
+        if showtimes is None:
+            # One load per day even when a burst of requests misses at once
+            async with self.lock:
+                showtimes = self.days.get(day)
+                if showtimes is None:
+                    showtimes = await load_day(db, day)
+                    self.days.set(day, showtimes)
+        return showtimes
+
+    async def window(
+        self,
+        db: AsyncSession,
+        start: datetime,
+        end: datetime,
+        theater_id: Optional[int] = None,
+        movie_id: Optional[int] = None,
+        genre: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Showtime]:
+        found: List[Showtime] = []
+        day = start.date()
+        while day <= end.date() and len(found) < limit:
+            for showtime in (await self.day(db, day)).between(start, end):
+                if theater_id is not None and showtime.theater_id != theater_id:
+                    continue
+                if movie_id is not None and showtime.movie_id != movie_id:
+                    continue
+                if genre is not None and showtime.genre != genre:
+                    continue
+                found.append(showtime)
+                if len(found) >= limit:
+                    break
+            day += timedelta(days=1)
+        return found
+
+    def invalidate(self, day: date):
+        self.days.invalidate(day)
+
+    def clear(self):
+        self.days.clear()
+
+    def stats(self) -> dict:
+        return self.days.stats()
+
+if __name__ == "__main__":
+    # python showtimes.py benchmark --screenings 1000000
+    import argparse
+    import random
+    import time as clock
+    from sqlalchemy import create_engine, insert, text
+    from sqlalchemy.orm import Session
+
+    parser = argparse.ArgumentParser(description="Benchmark time-window screening queries")
+    parser.add_argument("command", choices=["benchmark"])
+    parser.add_argument("--screenings", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--theaters", type=int, default=200)
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    genres = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Romance", "Thriller", "Animation"]
+    rng = random.Random(1)
+    first_day = datetime(2024, 1, 1)
+    movie_genres = {movie_id: rng.choice(genres) for movie_id in range(1, args.movies + 1)}
+    print(f"Generating {args.screenings} screenings over {args.days} days...")
+    screenings = [
+        {
+            "id": screening_id,
+            "movie_id": movie_id,
+            "theater_id": rng.randint(1, args.theaters),
+            "screening_time": first_day + timedelta(days=rng.randrange(args.days), minutes=rng.randrange(10 * 60, 24 * 60, 15)),
+            "price": 250.0,
+            "available_seats": 120,
+        }
+        for screening_id, movie_id in enumerate(rng.choices(range(1, args.movies + 1), k=args.screenings), 1)
+    ]
+
+    def evening(day_offset: int):
+        start = first_day + timedelta(days=day_offset, hours=18)
+        return start, start + timedelta(hours=6)
+
+    windows = [evening(rng.randrange(args.days)) for _ in range(args.queries)]
+    window_genres = [rng.choice(genres) for _ in range(args.queries)]
+
+    def timed(label: str, run, queries: int = args.queries):
+        # Full scans are slow enough that a few queries give a stable figure
+        started = clock.perf_counter()
+        total = sum(len(run(window, genre)) for window, genre in zip(windows[:queries], window_genres[:queries]))
+        elapsed = (clock.perf_counter() - started) / queries
+        print(f"  {label:<38} {elapsed * 1000:9.3f} ms/query  ({total / queries:.0f} rows)")
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine, tables=[models.Movie.__table__, models.Screening.__table__])
+    with Session(engine) as session:
+        session.execute(insert(models.Movie), [
+            {"id": movie_id, "title": f"Movie {movie_id}", "genre": genre} for movie_id, genre in movie_genres.items()
+        ])
+        session.execute(insert(models.Screening), screenings)
+        session.commit()
+
+        def sql_window(window, genre):
+            return session.execute(
+                select(models.Screening.id)
+                .join(models.Movie, models.Screening.movie_id == models.Movie.id)
+                .filter(
+                    models.Screening.screening_time >= window[0], models.Screening.screening_time < window[1],
+                    models.Movie.genre == genre
+                )
+                .order_by(models.Screening.screening_time)
+            ).all()
+
+        print("SQLite, tonight's shows for one genre:")
+        timed("with the screening indexes", sql_window)
+        for index in models.Screening.__table__.indexes:
+            session.execute(text(f"DROP INDEX {index.name}"))
+        timed("without them (full scan)", sql_window, queries=3)
+
+    by_day = {}
+    for screening in screenings:
+        by_day.setdefault(screening["screening_time"].date(), []).append(Showtime(
+            screening["screening_time"], screening["id"], screening["movie_id"], screening["theater_id"],
+            movie_genres[screening["movie_id"]]
+        ))
+    index = {day: DayShowtimes(day, showtimes) for day, showtimes in by_day.items()}
+    flat = [showtime for day in index.values() for showtime in day.showtimes]
+
+    print("In-memory:")
+    timed("per-day showtime index", lambda window, genre: [
+        showtime for showtime in index[window[0].date()].between(*window) if showtime.genre == genre
+    ])
+    timed("linear scan of every screening", lambda window, genre: [
+        showtime for showtime in flat if window[0] <= showtime.screening_time < window[1] and showtime.genre == genre
+    ], queries=3)
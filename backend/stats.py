@@ -0,0 +1,208 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import String, and_, cast, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+import models
+
+SCOPE_TOTAL = "total"
+SCOPE_MOVIE = "movie"
+SCOPE_SCREENING = "screening"
+# Days are screening days, so the fill rate of a day compares tickets against that day's shows
+SCOPE_DAY = "day"
+
+# Only per-screening rows are maintained, so a booking updates the one row of its own screening
+# and bookings for different screenings never wait on each other. Movie, day and total figures
+# are summed from the screening rows when read.
+
+def sold_bookings():
+    # Bookings counted in sales figures: cancelled ones gave their seats back, pending ones still
+    # hold theirs and are counted until they are cancelled
+    return or_(models.Booking.status.is_(None), models.Booking.status != "cancelled")
+
+async def ensure_screening_stats(db: AsyncSession, screening: models.Screening):
+    # Aggregate rows are created lazily, like seat inventory
+    has_row = await db.scalar(select(models.SalesAggregate.key).filter(
+        models.SalesAggregate.scope == SCOPE_SCREENING, models.SalesAggregate.key == str(screening.id)
+    ))
+    if has_row is not None:
+        return
+
+    theater = await db.get(models.Theater, screening.theater_id)
+    capacity = theater.total_seats if theater else screening.available_seats
+    try:
+        await db.execute(insert(models.SalesAggregate).values(scope=SCOPE_SCREENING, key=str(screening.id), capacity=capacity))
+        await db.commit()
+    except IntegrityError:
+        # Another request initialised the same screening first
+        await db.rollback()
+
+async def record_screenings(db: AsyncSession, screenings: List[Tuple[int, int]]):
+    # Bulk registration for newly created (screening_id, capacity) pairs, inside the caller's transaction
+    await db.execute(insert(models.SalesAggregate), [
+        {"scope": SCOPE_SCREENING, "key": str(screening_id), "capacity": capacity}
+        for screening_id, capacity in screenings
+    ])
+
+async def record_booking(db: AsyncSession, screening: models.Screening, tickets: int, revenue: float, sign: int = 1):
+    # Bumps the screening's row inside the caller's transaction
+    await db.execute(
+        update(models.SalesAggregate)
+        .where(models.SalesAggregate.scope == SCOPE_SCREENING, models.SalesAggregate.key == str(screening.id))
+        .values(
+            bookings=models.SalesAggregate.bookings + sign,
+            tickets=models.SalesAggregate.tickets + sign * tickets,
+            revenue=models.SalesAggregate.revenue + sign * revenue,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def rebuild_batch(db: AsyncSession, screening_ids: List[int]):
+    keys = [str(screening_id) for screening_id in screening_ids]
+    own_rows = (models.SalesAggregate.scope == SCOPE_SCREENING, models.SalesAggregate.key.in_(keys))
+    # A no-op update takes the rows' write locks (the database's on SQLite) before anything is
+    # counted: a concurrent booking either committed before the count or bumps the row after it
+    await db.execute(
+        update(models.SalesAggregate).where(*own_rows).values(bookings=models.SalesAggregate.bookings)
+        .execution_options(synchronize_session=False)
+    )
+    existing = set((await db.scalars(select(models.SalesAggregate.key).filter(*own_rows))).all())
+
+    booking_totals = (
+        select(
+            models.Booking.screening_id,
+            func.count(models.Booking.id).label("bookings"),
+            func.coalesce(func.sum(models.Booking.num_seats), 0).label("tickets"),
+            func.coalesce(func.sum(models.Booking.total_amount), 0).label("revenue"),
+        )
+        .filter(sold_bookings(), models.Booking.screening_id.in_(screening_ids))
+        .group_by(models.Booking.screening_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(
+            models.Screening.id,
+            func.coalesce(models.Theater.total_seats, models.Screening.available_seats).label("capacity"),
+            func.coalesce(booking_totals.c.bookings, 0).label("bookings"),
+            func.coalesce(booking_totals.c.tickets, 0).label("tickets"),
+            func.coalesce(booking_totals.c.revenue, 0).label("revenue"),
+        )
+        .outerjoin(models.Theater, models.Screening.theater_id == models.Theater.id)
+        .outerjoin(booking_totals, booking_totals.c.screening_id == models.Screening.id)
+        .filter(models.Screening.id.in_(screening_ids))
+    )).all()
+
+    values = [
+        {
+            "scope": SCOPE_SCREENING, "key": str(row.id), "bookings": row.bookings,
+            "tickets": row.tickets, "revenue": row.revenue, "capacity": row.capacity,
+        }
+        for row in rows
+    ]
+    updates = [row for row in values if row["key"] in existing]
+    inserts = [row for row in values if row["key"] not in existing]
+    if updates:
+        await db.execute(update(models.SalesAggregate), updates)
+    if inserts:
+        await db.execute(insert(models.SalesAggregate), inserts)
+
+async def rebuild(db: AsyncSession, batch_size: int = 500) -> int:
+    # Recompute every screening's row from screenings and bookings; used for backfill and repair.
+    # Bookings keep committing meanwhile, so rows are recomputed and written a batch at a time
+    # under their own locks instead of being replaced from one earlier snapshot
+    screening_ids = (await db.scalars(select(models.Screening.id).order_by(models.Screening.id))).all()
+    await db.commit()
+    for start in range(0, len(screening_ids), batch_size):
+        batch = screening_ids[start:start + batch_size]
+        while True:
+            try:
+                await rebuild_batch(db, batch)
+                await db.commit()
+                break
+            except IntegrityError:
+                # A booking created one of the missing rows first; lock it and count again
+                await db.rollback()
+
+    # Rows of other scopes are left over from when movie, day and total rows were maintained
+    # too; rows of deleted screenings go as well
+    await db.execute(delete(models.SalesAggregate).where(or_(
+        models.SalesAggregate.scope != SCOPE_SCREENING,
+        models.SalesAggregate.key.not_in(select(cast(models.Screening.id, String)))
+    )).execution_options(synchronize_session=False))
+    await db.commit()
+    return len(screening_ids)
+
+SUMS = (
+    func.count(models.SalesAggregate.key).label("screenings"),
+    func.coalesce(func.sum(models.SalesAggregate.bookings), 0).label("bookings"),
+    func.coalesce(func.sum(models.SalesAggregate.tickets), 0).label("tickets"),
+    func.coalesce(func.sum(models.SalesAggregate.revenue), 0).label("revenue"),
+    func.coalesce(func.sum(models.SalesAggregate.capacity), 0).label("capacity"),
+)
+
+def screening_sums(*filters):
+    # Sums the rows of the screenings matching filters, found through the screenings indexes
+    return (
+        select(*SUMS)
+        .select_from(models.Screening)
+        .join(models.SalesAggregate, and_(
+            models.SalesAggregate.scope == SCOPE_SCREENING,
+            models.SalesAggregate.key == cast(models.Screening.id, String)
+        ))
+        .filter(*filters)
+    )
+
+def serialize(row) -> Optional[dict]:
+    if row is None:
+        return None
+    return {
+        "bookings": row.bookings,
+        "tickets": row.tickets,
+        "revenue": round(row.revenue, 2),
+        "capacity": row.capacity,
+        "fill_rate": round(row.tickets / row.capacity, 4) if row.capacity else 0.0,
+    }
+
+async def read_stats(
+    db: AsyncSession,
+    movie_id: Optional[int] = None,
+    screening_id: Optional[int] = None,
+    day: Optional[date] = None
+) -> dict:
+    # Sums one row per screening in scope and never touches bookings: the cost grows with the
+    # number of screenings, O(screenings) rather than O(1), but not with the number of bookings
+    stats = {SCOPE_TOTAL: serialize((await db.execute(
+        select(*SUMS).filter(models.SalesAggregate.scope == SCOPE_SCREENING)
+    )).one())}
+    if movie_id is not None:
+        row = (await db.execute(screening_sums(models.Screening.movie_id == movie_id))).one()
+        stats[SCOPE_MOVIE] = serialize(row) if row.screenings else None
+    if screening_id is not None:
+        stats[SCOPE_SCREENING] = serialize(await db.scalar(select(models.SalesAggregate).filter(
+            models.SalesAggregate.scope == SCOPE_SCREENING, models.SalesAggregate.key == str(screening_id)
+        )))
+    if day is not None:
+        start = datetime.combine(day, datetime.min.time())
+        row = (await db.execute(screening_sums(
+            models.Screening.screening_time >= start, models.Screening.screening_time < start + timedelta(days=1)
+        ))).one()
+        stats[SCOPE_DAY] = serialize(row) if row.screenings else None
+    return stats
+
+if __name__ == "__main__":
+    # python stats.py rebuild
+    import argparse
+    import asyncio
+    from config import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Maintain the sales and occupancy aggregates")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    async def run_rebuild():
+        models.Base.metadata.create_all(bind=engine, tables=[models.SalesAggregate.__table__])
+        async with AsyncSessionLocal() as db:
+            count = await rebuild(db)
+        print(f"Rebuilt {count} aggregate rows")
+
+    asyncio.run(run_rebuild())
@@ -1,53 +1,103 @@
-import stripe
-from flask import Flask, request, jsonify
-import os
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
-app = Flask(__name__)
+class SignatureVerificationError(Exception):
+    pass
 
-# Set your secret key. Remember to switch to your live secret key in production!
-# See your keys here: https://dashboard.stripe.com/apikeys
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+def compute_signature(payload: bytes, secret: str, timestamp: int) -> str:
+    signed = f"{timestamp}.".encode() + payload
+    return hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
 
-@app.route('/create-payment-intent', methods=['POST'])
-def create_payment_intent():
+def verify_signature(payload: bytes, header: Optional[str], secret: str, tolerance_seconds: int = 300) -> dict:
+    # Stripe's scheme: "t=<unix time>,v1=<hex hmac-sha256 of 't.payload'>"; any v1 entry may match
+    if not header or not secret:
+        raise SignatureVerificationError("Missing signature")
+    parts: Dict[str, list] = {}
+    for item in header.split(","):
+        name, _, value = item.strip().partition("=")
+        parts.setdefault(name, []).append(value)
     try:
-        # Create a PaymentIntent with the order amount and currency
-        payment_intent = stripe.PaymentIntent.create(
-            amount=1000,  # Amount in cents
-            currency='usd',
-        )
-        return jsonify({'clientSecret': payment_intent['client_secret']})
-    except Exception as e:
-        return jsonify(error=str(e)), 403
+        timestamp = int(parts["t"][0])
+    except (KeyError, ValueError):
+        raise SignatureVerificationError("Malformed signature header")
+    if abs(time.time() - timestamp) > tolerance_seconds:
+        raise SignatureVerificationError("Signature timestamp outside the tolerance")
 
-@app.route('/webhook', methods=['POST'])
-def stripe_webhook():
-    payload = request.get_data(as_text=True)
-    sig_header = request.headers.get('Stripe-Signature')
-    endpoint_secret = os.getenv('STRIPE_ENDPOINT_SECRET')
+    expected = compute_signature(payload, secret, timestamp)
+    if not any(hmac.compare_digest(expected, candidate) for candidate in parts.get("v1", [])):
+        raise SignatureVerificationError("Signature mismatch")
+    try:
+        return json.loads(payload)
+    except ValueError:
+        raise SignatureVerificationError("Invalid payload")
 
-    event = None
+class PaymentProvider(ABC):
+    # Interface for payment backends; the Stripe provider is used when STRIPE_SECRET_KEY is set
 
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
+    def __init__(self, webhook_secret: str):
+        self.webhook_secret = webhook_secret
+
+    @abstractmethod
+    async def create_intent(self, amount: int, currency: str, metadata: dict, idempotency_key: str) -> dict:
+        raise NotImplementedError
+
+    def construct_event(self, payload: bytes, signature: Optional[str]) -> dict:
+        return verify_signature(payload, signature, self.webhook_secret)
+
+class StripeProvider(PaymentProvider):
+    def __init__(self, api_key: str, webhook_secret: str):
+        super().__init__(webhook_secret)
+        import stripe
+        self.stripe = stripe
+        self.api_key = api_key
+
+    async def create_intent(self, amount: int, currency: str, metadata: dict, idempotency_key: str) -> dict:
+        # The Stripe client is blocking; the idempotency key makes repeated calls return the same intent
+        intent = await asyncio.to_thread(
+            self.stripe.PaymentIntent.create,
+            amount=amount,
+            currency=currency,
+            metadata=metadata,
+            idempotency_key=idempotency_key,
+            api_key=self.api_key,
         )
-    except ValueError as e:
-        # Invalid payload
-        return jsonify({'error': 'Invalid payload'}), 400
-    except stripe.error.SignatureVerificationError as e:
-        # Invalid signature
-        return jsonify({'error': 'Invalid signature'}), 400
-
-    # Handle the event
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        # Send booking confirmation notification
-        print('PaymentIntent was successful!')
-    else:
-        print('Unhandled event type {}'.format(event['type']))
-
-    return jsonify({'status': 'success'})
-
-if __name__ == '__main__':
-    app.run(port=4242) 
\ No newline at end of file
+        return {"id": intent["id"], "client_secret": intent["client_secret"]}
+
+class StubProvider(PaymentProvider):
+    # Local stand-in for development and tests: intents live in memory and webhooks are signed
+    # with the same scheme Stripe uses, so the real verification path is exercised
+    def __init__(self, webhook_secret: str = "whsec_stub"):
+        super().__init__(webhook_secret)
+        self.intents: Dict[str, dict] = {}
+        self.intents_by_key: Dict[str, str] = {}
+
+    async def create_intent(self, amount: int, currency: str, metadata: dict, idempotency_key: str) -> dict:
+        intent_id = self.intents_by_key.get(idempotency_key)
+        if intent_id is None:
+            intent_id = f"pi_stub_{uuid.uuid4().hex[:24]}"
+            self.intents[intent_id] = {
+                "id": intent_id,
+                "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:12]}",
+                "amount": amount,
+                "currency": currency,
+                "metadata": metadata,
+            }
+            self.intents_by_key[idempotency_key] = intent_id
+        intent = self.intents[intent_id]
+        return {"id": intent["id"], "client_secret": intent["client_secret"]}
+
+    def webhook(self, event_type: str, intent_id: str) -> tuple:
+        # Returns (payload, signature header) for a webhook delivery about one intent
+        payload = json.dumps({
+            "id": f"evt_stub_{uuid.uuid4().hex[:24]}",
+            "type": event_type,
+            "data": {"object": self.intents.get(intent_id, {"id": intent_id})},
+        }).encode()
+        timestamp = int(time.time())
+        return payload, f"t={timestamp},v1={compute_signature(payload, self.webhook_secret, timestamp)}"
@@ -0,0 +1,85 @@
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import pytest
+
+# The API reads its settings from the environment at import time, so the test database and
+# settings are in place before anything imports config
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+DATABASE_DIR = tempfile.mkdtemp(prefix="movie-booking-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DATABASE_DIR}/test.db",
+    "ASYNC_DATABASE_URL": "",
+    "REPLICA_DATABASE_URLS": "",
+    "SECRET_KEY": "test-secret-key",
+    "ALGORITHM": "HS256",
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "INVALIDATION_BUS": "local",
+    "PAYMENT_PROVIDER": "",
+})
+
+import models
+from config import engine
+
+@pytest.fixture
+def database():
+    # A fresh schema for every test
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+@pytest.fixture
+def app(database):
+    # main is reloaded so every in-process cache, store and index starts empty; requests go
+    # straight to the ASGI app without lifespan, so no background task runs during a test
+    import main
+    main.password_hasher.shutdown()
+    main = importlib.reload(main)
+    asyncio.run(main.create_admin_user())
+    yield main
+    main.password_hasher.shutdown()
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    return TestClient(app.app)
+
+@pytest.fixture
+def admin_headers(client):
+    response = client.post("/login", json={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+@pytest.fixture
+def screening(database):
+    # A 20-seat theater showing one movie tomorrow evening; returns the screening id
+    from datetime import datetime, timedelta
+    from sqlalchemy.orm import Session
+    with Session(database) as db:
+        theater = models.Theater(name="Screen 1", total_seats=20)
+        movie = models.Movie(
+            title="Inception", description="A dream heist", duration=120, release_date=datetime(2010, 7, 16),
+            genre="Sci-Fi", rating=8.8, image_url="x"
+        )
+        db.add_all([theater, movie])
+        db.flush()
+        show = models.Screening(
+            movie_id=movie.id, theater_id=theater.id, price=10.0, available_seats=20,
+            screening_time=(datetime.utcnow() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+        )
+        db.add(show)
+        db.commit()
+        return show.id
+
+def register(client, username: str) -> dict:
+    response = client.post("/register", json={
+        "username": username, "email": f"{username}@example.com", "password": "secret123"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def customer_headers(client):
+    return register(client, "customer")
@@ -0,0 +1,106 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import analytics
+import models
+
+BOOKINGS = [
+    # screening, seats, amount, status
+    (1, 2, 20.0, "confirmed"),
+    (1, 1, 10.0, "confirmed"),
+    (2, 3, 45.0, "confirmed"),
+    (3, 4, 40.0, "confirmed"),
+    (3, 2, 20.0, "cancelled"),
+    (4, 1, 12.0, None),
+]
+
+@pytest.fixture
+def seeded(database):
+    with Session(database) as db:
+        db.execute(insert(models.Theater), [{"id": 1, "name": "One", "total_seats": 50}])
+        db.execute(insert(models.Movie), [
+            {"id": 1, "title": "Drama", "duration": 100, "release_date": datetime(2020, 1, 1), "genre": "Drama"},
+            {"id": 2, "title": "Comedy", "duration": 100, "release_date": datetime(2020, 1, 1), "genre": "Comedy"},
+        ])
+        db.execute(insert(models.Screening), [
+            {"id": 1, "movie_id": 1, "theater_id": 1, "price": 10.0, "available_seats": 47, "screening_time": datetime(2030, 1, 7, 18)},
+            {"id": 2, "movie_id": 1, "theater_id": 1, "price": 15.0, "available_seats": 47, "screening_time": datetime(2030, 1, 7, 21)},
+            {"id": 3, "movie_id": 2, "theater_id": 1, "price": 10.0, "available_seats": 46, "screening_time": datetime(2030, 1, 8, 18)},
+            {"id": 4, "movie_id": 2, "theater_id": 1, "price": 12.0, "available_seats": 49, "screening_time": datetime(2030, 1, 8, 21)},
+        ])
+        db.execute(insert(models.Booking), [
+            {"user_id": 1, "screening_id": screening_id, "num_seats": seats, "seats": list(range(1, seats + 1)),
+             "total_amount": amount, "booking_time": datetime(2029, 12, 1), "status": status}
+            for screening_id, seats, amount, status in BOOKINGS
+        ])
+        db.commit()
+    return database
+
+def snapshot(app):
+    async def load():
+        async with app.AsyncSessionLocal() as db:
+            return await analytics.load_snapshot(db, chunk_size=2)
+    return asyncio.run(load())
+
+def test_group_by_matches_a_plain_loop(app, seeded):
+    genre = {1: "Drama", 2: "Drama", 3: "Comedy", 4: "Comedy"}
+    hour = {1: 18, 2: 21, 3: 18, 4: 21}
+    expected = defaultdict(lambda: {"bookings": 0, "tickets": 0, "revenue": 0.0})
+    for screening_id, seats, amount, status in BOOKINGS:
+        if status == "cancelled":
+            continue
+        group = expected[(genre[screening_id], hour[screening_id])]
+        group["bookings"] += 1
+        group["tickets"] += seats
+        group["revenue"] += amount
+
+    rows = analytics.group_by(snapshot(app), ["genre", "hour"])
+    assert {(row["genre"], row["hour"]): {k: row[k] for k in ("bookings", "tickets", "revenue")} for row in rows} == expected
+    # Highest revenue first
+    assert [row["revenue"] for row in rows] == sorted((row["revenue"] for row in rows), reverse=True)
+
+def test_weekday_and_month_labels(app, seeded):
+    data = snapshot(app)
+    assert {row["weekday"]: row["tickets"] for row in analytics.group_by(data, ["weekday"])} == {0: 6, 1: 5}
+    assert analytics.group_by(data, ["month"]) == [{"month": "2029-12", "bookings": 5, "tickets": 11, "revenue": 127.0}]
+
+def test_unknown_reports_and_dimensions_are_rejected(app, seeded):
+    data = snapshot(app)
+    with pytest.raises(analytics.AnalyticsError):
+        analytics.group_by(data, ["colour"])
+    with pytest.raises(analytics.AnalyticsError):
+        analytics.run_report(data, "forecast")
+
+def test_analytics_endpoint(client, seeded, admin_headers):
+    body = client.get("/admin/analytics?by=movie", headers=admin_headers).json()
+    assert body["bookings"] == 5
+    assert [(row["movie"], row["tickets"]) for row in body["rows"]] == [(1, 6), (2, 5)]
+    assert client.get("/admin/analytics?by=colour", headers=admin_headers).status_code == 400
+
+def test_elasticity_uses_the_prices_actually_paid(app, database):
+    # Base prices never change, but the paid price does: fuller houses sold for less
+    with Session(database) as db:
+        db.execute(insert(models.Theater), [{"id": 1, "name": "One", "total_seats": 100}])
+        db.execute(insert(models.Movie), [
+            {"id": 1, "title": "Drama", "duration": 100, "release_date": datetime(2020, 1, 1), "genre": "Drama"},
+        ])
+        db.execute(insert(models.Screening), [
+            {"id": number, "movie_id": 1, "theater_id": 1, "price": 10.0, "available_seats": 0,
+             "screening_time": datetime(2030, 1, number, 18)}
+            for number in range(1, 5)
+        ])
+        db.execute(insert(models.Booking), [
+            {"user_id": 1, "screening_id": number, "num_seats": 10 * 2 ** number, "seats": [],
+             "total_amount": 10 * 2 ** number * 16.0 / 2 ** number, "booking_time": datetime(2029, 12, 1),
+             "status": "confirmed"}
+            for number in range(1, 5)
+        ])
+        db.commit()
+
+    [report] = analytics.price_elasticity(snapshot(app))
+    # Doubling the tickets sold each time the price halves is an elasticity of -1
+    assert report["theater"] == 1 and report["screenings"] == 4
+    assert report["elasticity"] == pytest.approx(-1.0)
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+import catalogue_import
+import models
+
+CSV = """title,description,duration,release_date,genre,rating,image_url
+Alpha,First,100,2020-01-01,Drama,7.5,a.jpg
+Beta,Second,not a number,2020-01-01,Drama,7.0,b.jpg
+Gamma,Third,90,2021-05-01,Comedy,6.0,c.jpg
+Alpha,First again,110,2020-01-01,Drama,8.0,a.jpg
+"""
+
+def run_import(app, records, **options) -> catalogue_import.ImportReport:
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            return await catalogue_import.import_movies(db, records, **options)
+    return asyncio.run(run())
+
+def movies(app) -> dict:
+    async def read():
+        async with app.AsyncSessionLocal() as db:
+            return dict((await db.execute(select(models.Movie.title, models.Movie.duration))).all())
+    return asyncio.run(read())
+
+def test_json_arrays_and_lines_stream_across_buffer_boundaries():
+    records = [{"title": f"Movie {number}", "description": "x" * 50} for number in range(40)]
+    array = io.StringIO(" [ " + ", ".join(map(repr, records)).replace("'", '"') + " ] ")
+    lines = io.StringIO("\n".join(map(repr, records)).replace("'", '"'))
+    assert list(catalogue_import.iter_json_records(array, chunk_size=16)) == records
+    assert list(catalogue_import.iter_json_records(lines, chunk_size=16)) == records
+
+def test_rows_are_validated_and_upserted_on_title_and_release_date(app, database):
+    report = run_import(app, catalogue_import.iter_records(io.StringIO(CSV), "csv"), batch_size=2)
+    assert (report.inserted, report.updated, report.failed) == (2, 1, 1)
+    assert report.errors == [{"row": 2, "errors": [{"field": "duration", "message": report.errors[0]["errors"][0]["message"]}]}]
+    # The later Alpha row updated the first instead of adding a second movie
+    assert movies(app) == {"Alpha": 110, "Gamma": 90}
+
+    again = run_import(app, catalogue_import.iter_records(io.StringIO(CSV), "csv"))
+    assert (again.inserted, again.updated) == (0, 2)
+
+def test_a_batch_that_keeps_conflicting_reports_only_the_clashing_rows(app, database, monkeypatch):
+    upsert_batch = catalogue_import.upsert_batch
+
+    async def racing(db, batch):
+        # Another import keeps winning the race for Clash
+        if ("Clash", next(iter(batch))[1]) in batch:
+            raise IntegrityError("INSERT INTO movies", {}, Exception("UNIQUE constraint failed"))
+        return await upsert_batch(db, batch)
+
+    monkeypatch.setattr(catalogue_import, "upsert_batch", racing)
+    records = [
+        {"title": title, "description": "", "duration": 100, "release_date": "2020-01-01", "genre": "Drama",
+         "rating": 5.0, "image_url": "x"}
+        for title in ("Calm", "Clash", "Quiet")
+    ]
+    report = run_import(app, records)
+    assert (report.inserted, report.conflicts, report.failed) == (2, 1, 1)
+    assert report.errors[0]["row"] == 2
+    assert movies(app) == {"Calm": 100, "Quiet": 100}
+
+def test_import_endpoint_and_duplicate_adds(client, admin_headers):
+    response = client.post(
+        "/movies/import", files={"file": ("movies.csv", CSV.encode(), "text/csv")}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2 and response.json()["conflicts"] == 0
+    assert client.get("/movies?search=gamma").json()["total"] == 1
+
+    movie = {"title": "Gamma", "description": "", "duration": 90, "release_date": "2021-05-01T00:00:00",
+             "genre": "Drama", "rating": 5.0, "image_url": "x"}
+    assert client.post("/movies/add", json=movie, headers=admin_headers).status_code == 409
+    assert client.post("/movies/import?format=xml", files={"file": ("m.xml", b"<x/>")}, headers=admin_headers).status_code == 400
@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+import hashing
+
+@pytest.fixture
+def hasher():
+    hasher = hashing.PasswordHasher(workers=2, max_queue=1, rounds=4)
+    yield hasher
+    hasher.shutdown()
+
+def test_hash_and_verify_off_the_event_loop(hasher):
+    async def run():
+        hashed = await hasher.hash("secret123")
+        return await asyncio.gather(hasher.verify("secret123", hashed), hasher.verify("wrong", hashed))
+
+    assert asyncio.run(run()) == [True, False]
+    metrics = hasher.metrics()
+    assert metrics["completed"] == 3 and metrics["in_flight"] == 0 and metrics["rejected"] == 0
+
+def test_work_beyond_the_queue_is_rejected(hasher):
+    async def run():
+        hashed = await hasher.hash("secret123")
+        results = await asyncio.gather(
+            *(hasher.verify("secret123", hashed) for _ in range(hasher.capacity + 2)), return_exceptions=True
+        )
+        return results
+
+    results = asyncio.run(run())
+    assert results.count(True) == hasher.capacity
+    assert sum(isinstance(result, hashing.HashingPoolSaturated) for result in results) == 2
+    assert hasher.metrics()["rejected"] == 2
+
+def test_a_saturated_pool_answers_503(app, client, monkeypatch):
+    monkeypatch.setattr(app.password_hasher, "in_flight", app.password_hasher.capacity)
+    response = client.post("/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from conftest import register
+import holds
+import realtime
+
+MINUTE = timedelta(minutes=1)
+
+@pytest.fixture(params=["memory", "db"])
+def store(request, app):
+    if request.param == "memory":
+        return holds.InMemoryHoldStore()
+    return holds.DatabaseHoldStore(app.AsyncSessionLocal)
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_other_customers_cannot_hold_live_seats(store):
+    run(store.create(1, user_id=1, seats=[1, 2], ttl=MINUTE))
+    with pytest.raises(holds.SeatHeldError) as error:
+        run(store.create(1, user_id=2, seats=[2, 3], ttl=MINUTE))
+    assert error.value.seats == [2]
+    # The same seats of another screening are free
+    run(store.create(2, user_id=2, seats=[2, 3], ttl=MINUTE))
+    assert sorted(run(store.held_seats(1))) == [1, 2] and run(store.held_seats(1, exclude_user_id=1)) == {}
+
+def test_lapsed_holds_give_their_seats_up(store):
+    lapsed = run(store.create(1, user_id=1, seats=[1, 2], ttl=-MINUTE))
+    hold = run(store.create(1, user_id=2, seats=[2, 3], ttl=MINUTE))
+    assert run(store.get(lapsed.hold_id)) is None
+    assert run(store.held_seats(1)) == {2: hold.hold_id, 3: hold.hold_id}
+
+def test_re_holding_moves_only_the_overlapping_seats(store):
+    first = run(store.create(1, user_id=1, seats=[1, 2, 3], ttl=MINUTE))
+    second = run(store.create(1, user_id=1, seats=[3, 4], ttl=MINUTE))
+    assert run(store.get(first.hold_id)).seats == [1, 2]
+    assert run(store.held_seats(1)) == {1: first.hold_id, 2: first.hold_id, 3: second.hold_id, 4: second.hold_id}
+
+    third = run(store.create(1, user_id=1, seats=[1, 2], ttl=MINUTE))
+    assert run(store.get(first.hold_id)) is None
+    assert run(store.held_seats(1)) == {1: third.hold_id, 2: third.hold_id, 3: second.hold_id, 4: second.hold_id}
+
+def test_sweeps_take_expired_holds_in_batches(store):
+    expired = [run(store.create(1, user_id=user, seats=[user], ttl=-MINUTE)) for user in range(5)]
+    live = run(store.create(1, user_id=9, seats=[9], ttl=MINUTE))
+    run(store.release(expired[0].hold_id))
+    now = datetime.utcnow()
+    assert [hold.hold_id for hold in run(store.sweep(now, 3))] == [hold.hold_id for hold in expired[1:4]]
+    assert [hold.hold_id for hold in run(store.sweep(now, 3))] == [expired[4].hold_id]
+    assert run(store.held_seats(1)) == {9: live.hold_id}
+
+@pytest.fixture
+def published(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "publish_seats", lambda screening_id, seats, state, **_: calls.append((list(seats), state)))
+    return calls
+
+def test_re_holding_through_the_api_announces_no_release(app, client, screening, customer_headers, published):
+    first = client.post("/holds", json={"screening_id": screening, "seats": [1, 2]}, headers=customer_headers).json()
+    client.post("/holds", json={"screening_id": screening, "seats": [2, 3]}, headers=customer_headers)
+    assert published == [([1, 2], realtime.SEAT_HELD), ([2, 3], realtime.SEAT_HELD)]
+    assert client.get(f"/screenings/{screening}/seatmap?encoding=ranges").json()["held"] == [[1, 3]]
+    # The first hold still holds seat 1
+    booking = client.post(f"/holds/{first['hold_id']}/confirm", headers=customer_headers).json()
+    assert booking["seats"] == [1]
+
+def test_expired_holds_only_announce_seats_still_for_sale(app, client, screening, customer_headers, published):
+    lapsed = asyncio.run(app.hold_store.create(screening, user_id=2, seats=[1, 2, 3], ttl=-MINUTE))
+    # Once it lapsed, seat 1 was sold and seat 3 held by someone else before the sweep ran
+    other = register(client, "other")
+    assert client.post("/bookings", json={"screening_id": screening, "seats": [1]}, headers=other).status_code == 200
+    assert client.post("/holds", json={"screening_id": screening, "seats": [3]}, headers=other).status_code == 200
+    published.clear()
+
+    expired = asyncio.run(app.hold_store.sweep(datetime.utcnow(), 10))
+    assert [hold.hold_id for hold in expired] == [lapsed.hold_id]
+    asyncio.run(app.publish_expired_holds(expired))
+    assert published == [([2], realtime.SEAT_RELEASED)]
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import idempotency
+
+TTL = timedelta(minutes=5)
+
+@pytest.fixture(params=["memory", "db"])
+def store(request, app):
+    if request.param == "memory":
+        return idempotency.InMemoryIdempotencyStore()
+    return idempotency.DatabaseIdempotencyStore(app.AsyncSessionLocal, poll_seconds=0.01)
+
+def test_a_completed_key_replays_and_rejects_another_body(store):
+    async def run():
+        assert await store.begin("1:key", "body-a", TTL, 1) is None
+        await store.complete("1:key", 200, b'{"id": 1}', TTL)
+        record = await store.begin("1:key", "body-a", TTL, 1)
+        assert (record.status_code, record.body) == (200, b'{"id": 1}')
+        with pytest.raises(idempotency.IdempotencyKeyReused):
+            await store.begin("1:key", "body-b", TTL, 1)
+    asyncio.run(run())
+
+def test_a_duplicate_waits_for_the_original(store):
+    async def run():
+        assert await store.begin("1:key", "body", TTL, 1) is None
+        # Still running after the wait, so the duplicate gives up
+        with pytest.raises(idempotency.IdempotencyInProgress):
+            await store.begin("1:key", "body", TTL, 0.05)
+
+        async def finish():
+            await asyncio.sleep(0.05)
+            await store.complete("1:key", 200, b"{}", TTL)
+        duplicate, _ = await asyncio.gather(store.begin("1:key", "body", TTL, 1), finish())
+        assert duplicate.status_code == 200
+    asyncio.run(run())
+
+def test_a_released_key_can_be_taken_again(store):
+    async def run():
+        assert await store.begin("1:key", "body", TTL, 1) is None
+        await store.release("1:key")
+        assert await store.begin("1:key", "body", TTL, 1) is None
+    asyncio.run(run())
+
+def test_sweeps_drop_expired_keys(store):
+    async def run():
+        for number in range(3):
+            await store.begin(f"1:{number}", "body", TTL, 1)
+            await store.complete(f"1:{number}", 200, b"{}", -TTL if number < 2 else TTL)
+        swept = await store.sweep(datetime.utcnow(), 10)
+        assert sorted(record.key for record in swept) == ["1:0", "1:1"]
+        assert await store.begin("1:0", "other", TTL, 1) is None
+        assert (await store.begin("1:2", "body", TTL, 1)).status_code == 200
+    asyncio.run(run())
+
+def test_retried_bookings_are_replayed(client, customer_headers, screening):
+    headers = {**customer_headers, "Idempotency-Key": "checkout-1"}
+    booking = {"screening_id": screening, "seats": [1, 2]}
+    first = client.post("/bookings", json=booking, headers=headers)
+    retry = client.post("/bookings", json=booking, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true" and retry.json()["id"] == first.json()["id"]
+    assert client.post("/bookings", json={**booking, "seats": [3]}, headers=headers).status_code == 422
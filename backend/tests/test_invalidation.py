@@ -0,0 +1,208 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+import pytest
+from conftest import BACKEND_DIR
+import invalidation
+
+WORKERS = 3
+
+def free_port() -> int:
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        return listener.getsockname()[1]
+
+def call(url: str, method: str = "GET", body: Optional[dict] = None, token: Optional[str] = None,
+         headers: Optional[dict] = None):
+    request = urllib.request.Request(url, method=method, data=json.dumps(body).encode() if body is not None else None)
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    for name, value in (headers or {}).items():
+        request.add_header(name, value)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+def answers(url: str) -> bool:
+    try:
+        return call(f"{url}/movies")[0] == 200
+    except OSError:
+        return False
+
+def converges(urls, check, timeout: float = 10) -> bool:
+    # Every worker must pass the check within the timeout
+    deadline = time.monotonic() + timeout
+    pending = list(urls)
+    while pending and time.monotonic() < deadline:
+        pending = [url for url in pending if not check(url)]
+        if pending:
+            time.sleep(0.05)
+    return not pending
+
+@pytest.fixture
+def workers(tmp_path):
+    # Separate API processes on one SQLite database, each with its own caches, talking over the db bus
+    database = tmp_path / "workers.db"
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "SECRET_KEY": uuid.uuid4().hex,
+        "INVALIDATION_BUS": "db",
+        "INVALIDATION_POLL_SECONDS": "0.1",
+    }
+    processes, urls = [], []
+    try:
+        # The first worker creates the schema and the admin account before the others start
+        for _ in range(WORKERS):
+            port = free_port()
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env
+            ))
+            url = f"http://127.0.0.1:{port}"
+            assert converges([url], answers, timeout=30), f"{url} did not start"
+            urls.append(url)
+        yield urls, database
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+def test_workers_converge(workers):
+    urls, database = workers
+    admin = call(f"{urls[0]}/login", "POST", {"username": "admin", "password": "admin123"})[1]["token"]
+
+    # Every worker caches a search and a listing that the new movie belongs in
+    for url in urls:
+        call(f"{url}/movies?search=convergence")
+        call(f"{url}/movies?genre=Documentary")
+    movie = call(f"{urls[0]}/movies/add", "POST", {
+        "title": "Convergence", "description": "Caches agreeing", "duration": 90,
+        "release_date": "2024-01-01T00:00:00", "genre": "Documentary", "rating": 7.5, "image_url": "x",
+    }, admin)[1]
+    assert converges(urls, lambda url: (
+        any(item["id"] == movie["id"] for item in call(f"{url}/movies?search=convergence")[1]["movies"])
+        and any(item["id"] == movie["id"] for item in call(f"{url}/movies?genre=Documentary")[1]["movies"])
+    ))
+
+    # Screenings reach the cached movie detail and the per-day showtime index
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+    for url in urls:
+        call(f"{url}/movies/{movie['id']}")
+        call(f"{url}/screenings?day={day.date().isoformat()}")
+    # Theaters have no API yet
+    with sqlite3.connect(database) as connection:
+        theater_id = connection.execute("INSERT INTO theaters (name, total_seats) VALUES ('Check', 40)").lastrowid
+    screening_id = call(f"{urls[-1]}/screenings/schedule", "POST", {"screenings": [{
+        "movie_id": movie["id"], "theater_id": theater_id, "screening_time": day.isoformat(), "price": 200,
+    }]}, admin)[1]["screening_ids"][0]
+    assert converges(urls, lambda url: (
+        any(s["id"] == screening_id for s in call(f"{url}/movies/{movie['id']}")[1]["screenings"])
+        and any(s["id"] == screening_id for s in call(f"{url}/screenings?day={day.date().isoformat()}")[1])
+    ))
+
+    # Seat counts in the cached detail follow a booking made elsewhere
+    seats_before = next(s["available_seats"] for s in call(f"{urls[0]}/movies/{movie['id']}")[1]["screenings"])
+    customer = call(f"{urls[0]}/register", "POST", {
+        "username": "customer", "email": "customer@example.com", "password": "secret123"
+    })[1]["access_token"]
+    for url in urls:
+        call(f"{url}/users/me", token=customer)
+    assert call(f"{urls[0]}/bookings", "POST", {"screening_id": screening_id, "seats": [1, 2]}, customer)[0] == 200
+    assert converges(urls, lambda url: (
+        next(s["available_seats"] for s in call(f"{url}/movies/{movie['id']}")[1]["screenings"]) == seats_before - 2
+    ))
+
+    # Every worker has the customer's account cached from /users/me; renaming it must revoke the old token
+    me = call(f"{urls[0]}/users/me", token=customer)[1]
+    call(f"{urls[0]}/users/{me['id']}", "PUT", {"username": "renamed"}, admin)
+    assert converges(urls, lambda url: call(f"{url}/users/me", token=customer)[0] == 401)
+
+def test_workers_share_holds_idempotency_keys_and_waiting_rooms(workers):
+    urls, database = workers
+    admin = call(f"{urls[0]}/login", "POST", {"username": "admin", "password": "admin123"})[1]["token"]
+    movie = call(f"{urls[0]}/movies/add", "POST", {
+        "title": "Shared State", "description": "One queue for every worker", "duration": 90,
+        "release_date": "2024-01-01T00:00:00", "genre": "Drama", "rating": 7.0, "image_url": "x",
+    }, admin)[1]
+    with sqlite3.connect(database) as connection:
+        theater_id = connection.execute("INSERT INTO theaters (name, total_seats) VALUES ('Shared', 40)").lastrowid
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+    screening_id = call(f"{urls[0]}/screenings/schedule", "POST", {"screenings": [{
+        "movie_id": movie["id"], "theater_id": theater_id, "screening_time": day.isoformat(), "price": 10,
+    }]}, admin)[1]["screening_ids"][0]
+    ann, bob = (
+        call(f"{urls[0]}/register", "POST", {
+            "username": name, "email": f"{name}@example.com", "password": "secret123"
+        })[1]["access_token"]
+        for name in ("ann", "bob")
+    )
+
+    # A hold taken on one worker blocks the seats on every other
+    hold = call(f"{urls[0]}/holds", "POST", {"screening_id": screening_id, "seats": [1, 2]}, ann)[1]
+    assert call(f"{urls[1]}/holds", "POST", {"screening_id": screening_id, "seats": [2, 3]}, bob)[0] == 409
+    assert call(f"{urls[2]}/bookings", "POST", {"screening_id": screening_id, "seats": [2]}, bob)[0] == 409
+    assert call(f"{urls[2]}/screenings/{screening_id}/seatmap?encoding=ranges")[1]["held"] == [[1, 2]]
+    assert call(f"{urls[1]}/holds/{hold['hold_id']}/confirm", "POST", token=ann)[0] == 200
+    assert call(f"{urls[2]}/screenings/{screening_id}/seatmap?encoding=ranges")[1]["held"] == []
+
+    # A retry that lands on another worker replays the first booking instead of making a second
+    key = {"Idempotency-Key": "checkout-1"}
+    booking = {"screening_id": screening_id, "seats": [5]}
+    first = call(f"{urls[0]}/bookings", "POST", booking, ann, key)[1]
+    assert call(f"{urls[1]}/bookings", "POST", booking, ann, key)[1]["id"] == first["id"]
+    assert call(f"{urls[2]}/bookings", "POST", {**booking, "seats": [6]}, ann, key)[0] == 422
+
+    # A waiting room opened on one worker gates bookings on all of them, and admits from one queue
+    assert call(f"{urls[0]}/screenings/{screening_id}/waiting-room", "POST", token=admin)[0] == 200
+    # A worker that has not seen the room yet answers 404 for it
+    assert converges(urls, lambda url: call(f"{url}/screenings/{screening_id}/waiting-room/status", token=bob)[0] == 403)
+    for url in urls:
+        assert call(f"{url}/bookings", "POST", {"screening_id": screening_id, "seats": [10]}, bob)[0] == 403
+    tickets = {
+        "bob": call(f"{urls[1]}/screenings/{screening_id}/waiting-room/join", "POST", token=bob)[1],
+        "ann": call(f"{urls[2]}/screenings/{screening_id}/waiting-room/join", "POST", token=ann)[1],
+    }
+    assert [tickets[name]["position"] for name in ("bob", "ann")] == [1, 2]
+    queued = {"X-Queue-Ticket": tickets["bob"]["ticket"]}
+    assert converges(urls, lambda url: call(
+        f"{url}/screenings/{screening_id}/waiting-room/status", token=bob, headers=queued
+    )[1]["admitted"])
+    assert call(f"{urls[0]}/bookings", "POST", {"screening_id": screening_id, "seats": [10]}, bob, queued)[0] == 200
+    stats = call(f"{urls[2]}/admin/metrics/traffic", token=admin)[1]["waiting_rooms"]["rooms"]
+    assert [(room["admitted"], room["completed"]) for room in stats] == [(2, 1)]
+
+    # Closing it on another worker opens booking to everyone again
+    assert call(f"{urls[1]}/screenings/{screening_id}/waiting-room", "DELETE", token=admin)[0] == 204
+    assert converges(urls, lambda url: call(
+        f"{url}/screenings/{screening_id}/waiting-room/status", token=bob, headers=queued
+    )[0] == 404)
+    assert call(f"{urls[2]}/bookings", "POST", {"screening_id": screening_id, "seats": [11]}, ann)[0] == 200
+
+def test_database_bus_waits_for_ids_committed_out_of_order():
+    bus = invalidation.DatabaseBus(None, 0.1, timedelta(hours=1), gap_seconds=5)
+    bus.cursor = 10
+    bus.seen.update({11, 13})
+    bus.advance(now=100.0)
+    # 12 may still commit, so the cursor stops before it
+    assert bus.cursor == 11 and bus.gaps == {12: 100.0}
+    bus.advance(now=104.0)
+    assert bus.cursor == 11
+    bus.advance(now=105.0)
+    assert bus.cursor == 13 and not bus.gaps and not bus.seen
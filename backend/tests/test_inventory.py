@@ -0,0 +1,151 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from config import DATABASE_URL, get_async_database_url
+import inventory
+import models
+
+@pytest.fixture
+def session_factory(database):
+    # SQLite takes one writer at a time; the others wait on its lock instead of failing
+    engine = create_async_engine(get_async_database_url(DATABASE_URL), connect_args={"timeout": 60})
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+async def create_screening(session_factory, seats: int) -> tuple:
+    async with session_factory() as db:
+        user = models.User(username="buyer", email="buyer@example.com")
+        movie = models.Movie(title="Stress", duration=90, release_date=datetime.utcnow())
+        theater = models.Theater(name="Stress", total_seats=seats)
+        db.add_all([user, movie, theater])
+        await db.flush()
+        screening = models.Screening(
+            movie_id=movie.id, theater_id=theater.id, screening_time=datetime.utcnow() + timedelta(days=1),
+            price=100.0, available_seats=seats
+        )
+        db.add(screening)
+        await db.commit()
+        await inventory.ensure_inventory(db, screening)
+        return screening.id, user.id
+
+async def attempt(session_factory, screening_id: int, user_id: int, seats: List[int], outcomes: Counter):
+    # Same sequence as book_seats: insert the booking, claim its seats, commit or roll back
+    async with session_factory() as db:
+        booking = models.Booking(
+            user_id=user_id, screening_id=screening_id, num_seats=len(seats), seats=seats,
+            total_amount=0.0, booking_time=datetime.utcnow(), status="confirmed"
+        )
+        db.add(booking)
+        try:
+            await db.flush()
+            await inventory.claim_seats(db, screening_id, seats, booking.id)
+            await db.commit()
+            outcomes["booked"] += 1
+        except inventory.SeatUnavailableError:
+            await db.rollback()
+            outcomes["unavailable"] += 1
+        except OperationalError:
+            await db.rollback()
+            outcomes["lock_errors"] += 1
+
+def test_concurrent_claims_never_oversell(session_factory):
+    total_seats, clients, max_seats = 40, 300, 4
+    rng = random.Random(1)
+
+    async def run():
+        screening_id, user_id = await create_screening(session_factory, total_seats)
+        # Requests are drawn from a small hot block so nearly every attempt collides with others
+        hot = list(range(1, max_seats * 4 + 1))
+        requests = [
+            rng.sample(hot if rng.random() < 0.8 else range(1, total_seats + 1), rng.randint(1, max_seats))
+            for _ in range(clients)
+        ]
+        outcomes: Counter = Counter()
+        await asyncio.gather(*(attempt(session_factory, screening_id, user_id, seats, outcomes) for seats in requests))
+
+        async with session_factory() as db:
+            bookings = (await db.execute(
+                select(models.Booking.id, models.Booking.seats).filter(models.Booking.screening_id == screening_id)
+            )).all()
+            booked_rows = dict((await db.execute(
+                select(models.ScreeningSeat.seat_number, models.ScreeningSeat.booking_id).filter(
+                    models.ScreeningSeat.screening_id == screening_id,
+                    models.ScreeningSeat.status == inventory.SEAT_BOOKED
+                )
+            )).all())
+            seat_rows = await db.scalar(select(func.count()).select_from(models.ScreeningSeat).filter(
+                models.ScreeningSeat.screening_id == screening_id
+            ))
+            available = await db.scalar(select(models.Screening.available_seats).filter(models.Screening.id == screening_id))
+        return outcomes, bookings, booked_rows, seat_rows, available
+
+    outcomes, bookings, booked_rows, seat_rows, available = asyncio.run(run())
+
+    assert outcomes["booked"] > 0 and outcomes["unavailable"] > 0
+    assert len(bookings) == outcomes["booked"]
+    sold = Counter(seat for _, seats in bookings for seat in seats)
+    assert [seat for seat, count in sold.items() if count > 1] == []
+    assert booked_rows == {seat: booking_id for booking_id, seats in bookings for seat in seats}
+    assert seat_rows == total_seats
+    assert available == total_seats - len(booked_rows)
+
+def test_claim_fails_whole_when_one_seat_is_taken(session_factory):
+    async def run():
+        screening_id, user_id = await create_screening(session_factory, 10)
+        outcomes: Counter = Counter()
+        await attempt(session_factory, screening_id, user_id, [3, 4], outcomes)
+        await attempt(session_factory, screening_id, user_id, [4, 5], outcomes)
+        async with session_factory() as db:
+            booked = (await db.scalars(select(models.ScreeningSeat.seat_number).filter(
+                models.ScreeningSeat.status == inventory.SEAT_BOOKED
+            ).order_by(models.ScreeningSeat.seat_number))).all()
+            available = await db.scalar(select(models.Screening.available_seats))
+        return outcomes, booked, available
+
+    outcomes, booked, available = asyncio.run(run())
+    assert outcomes == Counter(booked=1, unavailable=1)
+    assert booked == [3, 4]
+    assert available == 8
+
+def test_inventory_created_late_keeps_the_seats_of_earlier_bookings(session_factory):
+    async def run():
+        async with session_factory() as db:
+            user = models.User(username="buyer", email="buyer@example.com")
+            movie = models.Movie(title="Legacy", duration=90, release_date=datetime.utcnow())
+            theater = models.Theater(name="Legacy", total_seats=10)
+            db.add_all([user, movie, theater])
+            await db.flush()
+            screening = models.Screening(
+                movie_id=movie.id, theater_id=theater.id, screening_time=datetime.utcnow() + timedelta(days=1),
+                price=100.0, available_seats=7
+            )
+            db.add(screening)
+            await db.flush()
+            # Booked before seat rows existed; the cancelled booking gave its seats back
+            kept = models.Booking(user_id=user.id, screening_id=screening.id, seats=[2, 3, 4], status="confirmed")
+            db.add_all([kept, models.Booking(user_id=user.id, screening_id=screening.id, seats=[5], status="cancelled")])
+            await db.commit()
+            await inventory.ensure_inventory(db, screening)
+            screening_id, user_id, kept_id = screening.id, user.id, kept.id
+
+        outcomes: Counter = Counter()
+        await attempt(session_factory, screening_id, user_id, [4, 5], outcomes)
+        await attempt(session_factory, screening_id, user_id, [5, 6], outcomes)
+        async with session_factory() as db:
+            seats = dict((await db.execute(select(models.ScreeningSeat.seat_number, models.ScreeningSeat.booking_id).filter(
+                models.ScreeningSeat.status == inventory.SEAT_BOOKED
+            ))).all())
+            available = await db.scalar(select(models.Screening.available_seats))
+        return outcomes, seats, kept_id, available
+
+    outcomes, seats, kept_id, available = asyncio.run(run())
+    assert outcomes == Counter(booked=1, unavailable=1)
+    assert {seat: booking for seat, booking in seats.items() if seat < 5} == {2: kept_id, 3: kept_id, 4: kept_id}
+    assert sorted(seats) == [2, 3, 4, 5, 6]
+    assert available == 5
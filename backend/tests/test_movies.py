@@ -0,0 +1,37 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import models
+
+@pytest.fixture
+def catalogue(database):
+    with Session(database) as db:
+        db.execute(insert(models.Movie), [
+            {"id": number, "title": f"Movie {number:02d}", "description": "", "duration": 100,
+             "release_date": datetime(2020, 1, 1), "genre": "Drama", "rating": number % 10, "image_url": "x"}
+            for number in range(1, 26)
+        ])
+        db.commit()
+    return database
+
+def test_offset_and_cursor_pages_cover_the_catalogue_once(client, catalogue):
+    page = client.get("/movies?limit=10&skip=20").json()
+    assert page["total"] == 25 and page["total_pages"] == 3
+    assert [movie["title"] for movie in page["movies"]] == [f"Movie {number}" for number in range(21, 26)]
+
+    seen, cursor = [], None
+    while True:
+        body = client.get("/movies", params={"pagination": "cursor", "sort": "rating", "limit": 7, "cursor": cursor}).json()
+        seen.extend(movie["id"] for movie in body["movies"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(1, 26))
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-5", "limit=101", "skip=-1", "pagination=pages"])
+def test_out_of_range_paging_is_rejected(client, catalogue, query):
+    assert client.get(f"/movies?{query}").status_code == 400
+
+def test_the_largest_page(client, catalogue):
+    assert len(client.get("/movies?limit=100").json()["movies"]) == 25
@@ -0,0 +1,70 @@
+import asyncio
+import re
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+import jobs
+import mailer
+import models
+import notifications
+
+LEASE = timedelta(minutes=5)
+
+def run_batch(app, notifier: notifications.Notifier) -> int:
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            return await jobs.run_batch(db, notifier.handlers(), 10, LEASE, 3, 60, 600)
+    return asyncio.run(run())
+
+def confirmations(app) -> list:
+    async def read():
+        async with app.AsyncSessionLocal() as db:
+            return (await db.scalars(
+                select(models.Job).filter(models.Job.kind == notifications.KIND_CONFIRMATION).order_by(models.Job.id)
+            )).all()
+    return asyncio.run(read())
+
+def test_a_dropped_connection_retries_only_the_unsent_emails(app, client, customer_headers, screening):
+    for seat in (1, 2, 3):
+        client.post("/bookings", json={"screening_id": screening, "seats": [seat]}, headers=customer_headers)
+    # The sink runs on its own loop in a thread, since every batch runs in a fresh asyncio.run
+    sink = mailer.SMTPSink(port=0, disconnect_after=2)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(sink.start(), loop).result(5)
+        notifier = notifications.Notifier(mailer.SMTPMailer("127.0.0.1", sink.port, timeout=5), "tickets@example.com")
+
+        started = datetime.utcnow()
+        assert run_batch(app, notifier) == 3
+        assert len(sink.messages) == 2
+        *sent, unsent = confirmations(app)
+        assert [job.status for job in sent] == [jobs.JOB_DONE] * 2
+        assert unsent.status == jobs.JOB_QUEUED and unsent.attempts == 1
+        assert "SMTPServerDisconnected" in unsent.last_error
+        # Backed off by half to all of the base delay
+        assert started + timedelta(seconds=29) <= unsent.run_at <= datetime.utcnow() + timedelta(seconds=61)
+        assert run_batch(app, notifier) == 0
+
+        # Once the backoff has passed the server is back, and only the remaining email goes out
+        sink.disconnect_after = None
+        async def make_due():
+            async with app.AsyncSessionLocal() as db:
+                await db.execute(update(models.Job).where(models.Job.id == unsent.id).values(run_at=datetime.utcnow()))
+                await db.commit()
+        asyncio.run(make_due())
+        assert run_batch(app, notifier) == 1
+        assert len(sink.messages) == 3
+        assert [job.status for job in confirmations(app)] == [jobs.JOB_DONE] * 3
+        bodies = [message.get_body(("plain",)).get_content() for message in sink.messages]
+        assert sorted(int(re.search(r"#(\d+)", body).group(1)) for body in bodies) == [1, 2, 3]
+    finally:
+        asyncio.run_coroutine_threadsafe(sink.stop(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+def test_retry_delays_grow_to_the_cap():
+    for attempts, ceiling in ((1, 60), (2, 120), (3, 240), (8, 600)):
+        delay = jobs.retry_delay(attempts, 60, 600).total_seconds()
+        assert ceiling / 2 <= delay <= ceiling
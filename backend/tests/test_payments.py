@@ -0,0 +1,103 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from conftest import register
+import payments
+import stripe_integration
+
+@pytest.fixture
+def provider(app):
+    # Bookings read the provider at request time, so swapping it in turns payments on
+    app.payment_provider = stripe_integration.StubProvider("whsec_test")
+    return app.payment_provider
+
+def book(client, headers, screening, seats) -> dict:
+    booking = client.post("/bookings", json={"screening_id": screening, "seats": seats}, headers=headers).json()
+    intent = client.post(f"/bookings/{booking['id']}/payment-intent", headers=headers).json()
+    return {**booking, "payment_intent_id": intent["payment_intent_id"]}
+
+def deliver(client, provider, event_type: str, intent_id: str):
+    payload, signature = provider.webhook(event_type, intent_id)
+    return client.post("/payments/webhook", content=payload, headers={"Stripe-Signature": signature})
+
+def drain(app) -> payments.BatchResult:
+    # What the payment worker does when the webhook wakes it
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            return await payments.process_batch(db, 100, timedelta(minutes=15), timedelta(hours=2))
+    return asyncio.run(run())
+
+def status(database, booking_id: int) -> str:
+    with Session(database) as db:
+        return db.execute(text("SELECT status FROM bookings WHERE id = :id"), {"id": booking_id}).scalar()
+
+def event_statuses(database) -> list:
+    with Session(database) as db:
+        return list(db.execute(text("SELECT status FROM payment_events ORDER BY id")).scalars())
+
+def test_a_succeeded_payment_confirms_the_booking(app, client, database, provider, customer_headers, screening):
+    booking = book(client, customer_headers, screening, [1, 2])
+    assert booking["status"] == payments.BOOKING_PENDING
+
+    response = deliver(client, provider, "payment_intent.succeeded", booking["payment_intent_id"])
+    assert response.json() == {"received": True, "duplicate": False}
+    # Nothing changes until the worker applies the queued event
+    assert status(database, booking["id"]) == payments.BOOKING_PENDING
+    result = drain(app)
+    assert result.events == 1 and result.confirmed == 1
+    assert status(database, booking["id"]) == payments.BOOKING_CONFIRMED
+    assert event_statuses(database) == [payments.EVENT_DONE]
+
+def test_a_failed_payment_cancels_the_booking_and_frees_its_seats(app, client, database, provider, customer_headers, screening):
+    booking = book(client, customer_headers, screening, [1, 2])
+    deliver(client, provider, "payment_intent.payment_failed", booking["payment_intent_id"])
+    result = drain(app)
+    assert status(database, booking["id"]) == payments.BOOKING_CANCELLED
+    assert [(screening_id, seats) for screening_id, _, seats in result.cancelled] == [(screening, [1, 2])]
+
+    other = register(client, "other")
+    assert client.post("/bookings", json={"screening_id": screening, "seats": [1, 2]}, headers=other).status_code == 200
+
+def test_a_redelivered_webhook_is_applied_once(app, client, database, provider, customer_headers, screening):
+    booking = book(client, customer_headers, screening, [1, 2])
+    payload, signature = provider.webhook("payment_intent.succeeded", booking["payment_intent_id"])
+    for duplicate in (False, True):
+        response = client.post("/payments/webhook", content=payload, headers={"Stripe-Signature": signature})
+        assert response.json() == {"received": True, "duplicate": duplicate}
+    assert drain(app).events == 1
+    assert drain(app).events == 0
+    assert event_statuses(database) == [payments.EVENT_DONE]
+
+def test_a_forged_webhook_is_rejected(client, provider, customer_headers, screening):
+    booking = book(client, customer_headers, screening, [1])
+    payload, _ = provider.webhook("payment_intent.succeeded", booking["payment_intent_id"])
+    response = client.post("/payments/webhook", content=payload, headers={"Stripe-Signature": "t=1,v1=forged"})
+    assert response.status_code == 400
+
+def test_a_late_payment_takes_back_seats_that_are_still_free(app, client, database, provider, customer_headers, screening):
+    booking = book(client, customer_headers, screening, [1, 2])
+    deliver(client, provider, "payment_intent.canceled", booking["payment_intent_id"])
+    drain(app)
+    deliver(client, provider, "payment_intent.succeeded", booking["payment_intent_id"])
+    result = drain(app)
+    assert [(screening_id, seats) for screening_id, _, seats in result.reconfirmed] == [(screening, [1, 2])]
+    assert status(database, booking["id"]) == payments.BOOKING_CONFIRMED
+
+def test_a_payment_after_the_seats_were_resold_is_kept_for_a_refund(
+    app, client, database, provider, admin_headers, customer_headers, screening
+):
+    booking = book(client, customer_headers, screening, [1, 2])
+    deliver(client, provider, "payment_intent.payment_failed", booking["payment_intent_id"])
+    drain(app)
+    other = register(client, "other")
+    assert client.post("/bookings", json={"screening_id": screening, "seats": [2, 3]}, headers=other).status_code == 200
+
+    deliver(client, provider, "payment_intent.succeeded", booking["payment_intent_id"])
+    result = drain(app)
+    assert result.refunds_due == 1 and not result.reconfirmed
+    assert status(database, booking["id"]) == payments.BOOKING_CANCELLED
+    assert event_statuses(database) == [payments.EVENT_DONE, payments.EVENT_REFUND_DUE]
+    metrics = client.get("/admin/metrics/payments", headers=admin_headers).json()
+    assert [refund["payment_intent_id"] for refund in metrics["refunds_due"]] == [booking["payment_intent_id"]]
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import pytest
+import pricing
+
+# A Saturday evening
+SHOW = datetime(2030, 1, 5, 20, 0)
+
+def table(dynamic: bool = True, available: int = 100) -> pricing.PriceTable:
+    return pricing.build_table(1, SHOW, 100.0, 100, available, 10, 0.7, 1.6, dynamic)
+
+def test_zones_follow_rows_from_the_screen():
+    zones = [pricing.seat_zone(seat, 100, 10) for seat in range(1, 101, 10)]
+    assert zones == ["front"] * 3 + ["standard"] + ["premium"] * 4 + ["standard"] * 2
+
+def test_occupancy_steps_move_with_sales_and_returns():
+    prices = table()
+    assert prices.thresholds == [0, 30, 60, 80, 95]
+    prices.adjust(29)
+    assert prices.step == 0
+    prices.adjust(1)
+    assert prices.step == 1
+    prices.adjust(70)
+    assert prices.step == 4 and prices.sold == 100
+    prices.adjust(-41)
+    assert prices.step == 1
+
+def test_prices_combine_the_factors_within_the_bounds():
+    prices = table()
+    week_out = SHOW - timedelta(days=8)
+    # Saturday 1.2, a week out 0.95, empty house 0.9, premium row 1.2
+    assert pricing.quote(prices, [55], now=week_out)["seats"][0]["price"] == round(100 * 1.2 * 0.95 * 0.9 * 1.2, 2)
+    prices.adjust(100)
+    last_minute = pricing.quote(prices, [55], now=SHOW - timedelta(hours=1))
+    assert last_minute["seats"][0]["price"] == 160.0
+    assert last_minute["factors"] == {"occupancy": 1.4, "lead_time": 1.1, "day": 1.2}
+
+def test_without_dynamic_pricing_every_seat_costs_the_screening_price():
+    prices = table(dynamic=False, available=3)
+    quote = pricing.quote(prices, [1, 55, 100], now=SHOW - timedelta(hours=1))
+    assert [seat["price"] for seat in quote["seats"]] == [100.0, 100.0, 100.0]
+    assert quote["factors"] == {"occupancy": 1.0, "lead_time": 1.0, "day": 1.0}
+
+def test_bookings_charge_the_flat_price_unless_dynamic_pricing_is_enabled(app, client, screening, customer_headers):
+    assert not app.pricing_engine.dynamic
+    booking = client.post("/bookings", json={"screening_id": screening, "seats": [1, 20]}, headers=customer_headers).json()
+    assert booking["total_amount"] == 20.0
+
+    app.pricing_engine.dynamic = True
+    app.pricing_engine.invalidate(screening)
+    quote = client.get(f"/screenings/{screening}/quote?seats=1,20").json()
+    assert quote["total"] != 20.0
+    assert client.get(f"/screenings/{screening}/quote?seats=21").status_code == 400
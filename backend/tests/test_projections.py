@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+import models
+
+# Expected statements per request with every cache cleared first; the signed-in user's lookup is
+# the first statement of the authenticated endpoints. One per page query plus one per expanded
+# relation, however many rows come back.
+EXPECTED = {
+    "/movies?limit=100": 2,
+    "/movies?limit=100&expand=screenings": 3,
+    "/movies?pagination=cursor&limit=100&sort=rating&expand=screenings": 3,
+    "/movies/featured?expand=screenings": 2,
+    "/movies/1/screenings?expand=bookings,movie,theater": 4,
+    "/bookings?limit=500&expand=screening,user": 4,
+    "/users/me/bookings?expand=screening,user": 4,
+}
+
+def seed(engine, movie_count: int):
+    with Session(engine) as db:
+        db.execute(insert(models.Theater), [{"id": 1, "name": "Check", "total_seats": 100}])
+        db.execute(insert(models.Movie), [
+            {"id": number, "title": f"Movie {number}", "description": "", "duration": 100,
+             "release_date": datetime(2020, 1, 1), "genre": "Drama", "rating": number % 10, "image_url": "x"}
+            for number in range(1, movie_count + 1)
+        ])
+        db.execute(insert(models.Screening), [
+            {"id": number, "movie_id": 1 + number % movie_count, "theater_id": 1, "price": 200.0,
+             "screening_time": datetime(2030, 1, 1) + timedelta(hours=number), "available_seats": 98}
+            for number in range(1, 3 * movie_count + 1)
+        ])
+        db.execute(insert(models.Booking), [
+            {"user_id": 1, "screening_id": 1 + number % (3 * movie_count), "num_seats": 2, "seats": [1, 2],
+             "total_amount": 400.0, "booking_time": datetime(2024, 1, 1) + timedelta(minutes=number),
+             "status": "confirmed"}
+            for number in range(5 * movie_count)
+        ])
+        db.commit()
+
+@pytest.mark.parametrize("movie_count", [3, 60])
+def test_list_endpoints_issue_a_fixed_number_of_statements(app, client, database, movie_count):
+    seed(database, movie_count)
+    headers = {"Authorization": f"Bearer {app.create_access_token({'sub': 'admin'})}"}
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(app.async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        counts = {}
+        for path in EXPECTED:
+            app.movie_cache.clear()
+            app.movie_count_cache.clear()
+            app.principal_cache.clear()
+            statements.clear()
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.text)
+            counts[path] = len(statements)
+    finally:
+        event.remove(app.async_engine.sync_engine, "before_cursor_execute", count)
+    assert counts == EXPECTED
@@ -0,0 +1,45 @@
+import asyncio
+import realtime
+
+def test_changes_within_the_window_arrive_as_one_message():
+    async def run():
+        hub = realtime.ScreeningHub(coalesce_seconds=0.01, queue_size=4)
+        subscriber = hub.subscribe(1)
+        hub.publish(1, [3, 4], realtime.SEAT_HELD)
+        hub.publish(1, [4], realtime.SEAT_BOOKED)
+        hub.publish(1, [9], realtime.SEAT_RELEASED)
+        # Another screening's watchers are not told
+        hub.publish(2, [1], realtime.SEAT_HELD)
+        return await asyncio.wait_for(subscriber.get(), 1), subscriber.queue.empty()
+
+    message, drained = asyncio.run(run())
+    assert message == {"screening_id": 1, "seats": {"held": [3], "booked": [4], "available": [9]}}
+    assert drained
+
+def test_a_slow_watcher_is_dropped_without_holding_back_the_rest():
+    async def run():
+        hub = realtime.ScreeningHub(coalesce_seconds=0.001, queue_size=1)
+        slow, fast = hub.subscribe(1), hub.subscribe(1)
+        hub.publish(1, [1], realtime.SEAT_HELD)
+        await asyncio.sleep(0.02)
+        assert (await fast.get())["seats"] == {"held": [1]}
+        hub.publish(1, [2], realtime.SEAT_HELD)
+        await asyncio.sleep(0.02)
+        return hub, slow, fast
+
+    hub, slow, fast = asyncio.run(run())
+    assert slow.dropped and slow.queue.get_nowait() is None
+    assert not fast.dropped and fast.queue.get_nowait()["seats"] == {"held": [2]}
+    assert hub.dropped_count == 1 and hub.watcher_count(1) == 1
+
+def test_nothing_is_queued_without_watchers():
+    async def run():
+        hub = realtime.ScreeningHub(coalesce_seconds=0.01, queue_size=4)
+        hub.publish(1, [1], realtime.SEAT_HELD)
+        subscriber = hub.subscribe(1)
+        hub.unsubscribe(subscriber)
+        hub.publish(1, [2], realtime.SEAT_HELD)
+        return hub
+
+    hub = asyncio.run(run())
+    assert hub.pending == {} and hub.subscribers == {}
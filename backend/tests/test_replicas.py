@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from config import DATABASE_URL
+import replicas
+
+PRIMARY = DATABASE_URL[len("sqlite:///"):]
+
+def copy_database(primary: str, replica: str):
+    # Swapped in whole, as replicas.py replicate does, so readers never see a half-written file
+    temporary = f"{replica}.tmp"
+    with closing(sqlite3.connect(primary)) as source, closing(sqlite3.connect(temporary)) as target:
+        source.backup(target)
+    os.replace(temporary, replica)
+
+@pytest.fixture
+def router(app, tmp_path):
+    replica_path = str(tmp_path / "replica.db")
+    copy_database(PRIMARY, replica_path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{replica_path}")
+    router = replicas.ReplicaRouter(app.AsyncSessionLocal, [replicas.Replica(
+        "replica1", async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    )], max_lag_seconds=1.0)
+    # The API's dependencies and write marks look the router up by name
+    app.replica_router = router
+    router.path = replica_path
+    yield router
+    asyncio.run(engine.dispose())
+
+def replicate(router):
+    # The replica applies everything up to a heartbeat written after the latest write
+    asyncio.run(router.heartbeat())
+    copy_database(PRIMARY, router.path)
+    asyncio.run(router.heartbeat())
+
+def replica_has(router, sql: str, *params) -> bool:
+    with closing(sqlite3.connect(router.path)) as connection:
+        return bool(connection.execute(sql, params).fetchone()[0])
+
+def add_movie(client, headers, title: str) -> dict:
+    return client.post("/movies/add", json={
+        "title": title, "description": "Read from the replica", "duration": 100,
+        "release_date": "2024-01-01T00:00:00", "genre": "Drama", "rating": 8.0, "image_url": "x",
+    }, headers=headers).json()
+
+def test_catalogue_reads_use_a_current_replica(router, client):
+    replicate(router)
+    for limit in range(1, 4):
+        assert client.get(f"/movies?limit={limit}").status_code == 200
+    assert router.reads["replica1"] == 3
+
+def test_reads_after_a_write_stay_on_the_primary_until_the_replica_catches_up(router, app, client, admin_headers):
+    replicate(router)
+    movie = add_movie(client, admin_headers, "Replicated")
+    assert not replica_has(router, "SELECT COUNT(*) FROM movies WHERE id = ?", movie["id"])
+    assert client.get(f"/movies/{movie['id']}").status_code == 200
+    assert router.reads["primary_sticky"] == 1
+
+    replicate(router)
+    app.movie_cache.clear()
+    before = router.reads["replica1"]
+    assert client.get(f"/movies/{movie['id']}").status_code == 200
+    assert router.reads["replica1"] == before + 1
+
+def test_booking_history_is_read_your_writes(router, app, client, admin_headers):
+    movie = add_movie(client, admin_headers, "History")
+    with closing(sqlite3.connect(PRIMARY)) as connection:
+        theater_id = connection.execute("INSERT INTO theaters (name, total_seats) VALUES ('Check', 40)").lastrowid
+        connection.commit()
+    screening_time = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0).isoformat()
+    screening_id = client.post("/screenings/schedule", json={"screenings": [{
+        "movie_id": movie["id"], "theater_id": theater_id, "screening_time": screening_time, "price": 200,
+    }]}, headers=admin_headers).json()["screening_ids"][0]
+    token = client.post("/register", json={
+        "username": "customer", "email": "customer@example.com", "password": "secret123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    replicate(router)
+
+    booking = client.post("/bookings", json={"screening_id": screening_id, "seats": [1, 2]}, headers=headers).json()
+    assert not replica_has(router, "SELECT COUNT(*) FROM bookings WHERE id = ?", booking["id"])
+    history = client.get("/users/me/bookings", headers=headers).json()
+    assert any(item["id"] == booking["id"] for item in history)
+
+    replicate(router)
+    before = router.reads["replica1"]
+    history = client.get("/users/me/bookings", headers=headers).json()
+    assert router.reads["replica1"] == before + 1
+    assert any(item["id"] == booking["id"] for item in history)
+
+def test_a_lagging_replica_is_skipped(router, client):
+    replicate(router)
+    time.sleep(router.max_lag_seconds + 0.1)
+    asyncio.run(router.heartbeat())
+    assert client.get("/movies?limit=4").status_code == 200
+    assert router.reads["primary_lagging"] == 1
+
+    replicate(router)
+    assert client.get("/movies?limit=5").status_code == 200
+    assert router.reads["replica1"] == 1
+
+def test_an_unreachable_replica_reports_its_error(router):
+    os.remove(router.path)
+    os.makedirs(router.path)
+    asyncio.run(router.heartbeat())
+    replica = router.stats()["replicas"][0]
+    assert replica["lag_seconds"] is None and replica["error"]
+
+def test_bookings_leave_listings_on_the_replica_but_expanded_seat_counts_fresh(router, app, client, admin_headers):
+    movie = add_movie(client, admin_headers, "Busy")
+    with closing(sqlite3.connect(PRIMARY)) as connection:
+        theater_id = connection.execute("INSERT INTO theaters (name, total_seats) VALUES ('Check', 40)").lastrowid
+        connection.commit()
+    screening_time = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0).isoformat()
+    client.post("/screenings/schedule", json={"screenings": [{
+        "movie_id": movie["id"], "theater_id": theater_id, "screening_time": screening_time, "price": 200,
+    }]}, headers=admin_headers)
+    token = client.post("/register", json={
+        "username": "customer", "email": "customer@example.com", "password": "secret123"
+    }).json()["access_token"]
+    replicate(router)
+
+    screening_id = client.get(f"/movies/{movie['id']}").json()["screenings"][0]["id"]
+    client.post("/bookings", json={"screening_id": screening_id, "seats": [1, 2]}, headers={"Authorization": f"Bearer {token}"})
+    app.movie_cache.clear()
+    before = router.reads["replica1"]
+    assert client.get("/movies?limit=10").status_code == 200
+    assert router.reads["replica1"] == before + 1
+
+    # The page comes from the replica, its screenings and seat counts from the primary
+    sticky = router.reads["primary_sticky"]
+    body = client.get("/movies?limit=10&expand=screenings").json()
+    assert router.reads["replica1"] == before + 2 and router.reads["primary_sticky"] == sticky + 1
+    assert body["movies"][0]["screenings"][0]["available_seats"] == 38
@@ -0,0 +1,92 @@
+import asyncio
+import gc
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+import models
+import scheduler
+
+DAY = (datetime.utcnow() + timedelta(days=2)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+@pytest.fixture
+def theaters(database):
+    with Session(database) as db:
+        db.execute(insert(models.Theater), [
+            {"id": 1, "name": "One", "total_seats": 30}, {"id": 2, "name": "Two", "total_seats": 10}
+        ])
+        db.execute(insert(models.Movie), [
+            {"id": 1, "title": "Long", "duration": 150, "release_date": datetime(2020, 1, 1)},
+        ])
+        db.commit()
+    return database
+
+def slot(theater_id: int, hours: float, **extra) -> dict:
+    return {
+        "movie_id": 1, "theater_id": theater_id, "price": 10.0,
+        "screening_time": (DAY + timedelta(hours=hours)).isoformat(), **extra
+    }
+
+def test_interval_index_reports_every_overlap():
+    index = scheduler.IntervalIndex()
+    index.add(1, DAY, DAY + timedelta(hours=3), "a")
+    index.add(1, DAY + timedelta(hours=1), DAY + timedelta(hours=2), "b")
+    index.add(1, DAY + timedelta(hours=3), DAY + timedelta(hours=4), "c")
+    index.add(2, DAY, DAY + timedelta(hours=3), "d")
+    # Touching intervals are half-open, so c does not clash with a
+    assert index.conflicts() == [(1, "a", "b")]
+
+def test_a_programme_is_inserted_whole_with_its_seat_inventory(client, theaters, admin_headers):
+    response = client.post("/screenings/schedule", json={"screenings": [
+        slot(1, 0), slot(1, 3), slot(2, 0, available_seats=6),
+    ]}, headers=admin_headers)
+    assert response.status_code == 201
+    ids = response.json()["screening_ids"]
+
+    with Session(theaters) as db:
+        seats = dict(db.execute(
+            select(models.ScreeningSeat.screening_id, func.count()).group_by(models.ScreeningSeat.screening_id)
+        ).all())
+        available = dict(db.execute(select(models.Screening.id, models.Screening.available_seats)).all())
+        capacity = dict(db.execute(select(models.SalesAggregate.key, models.SalesAggregate.capacity)).all())
+    # A slot selling fewer seats than its theater has only gets inventory for those seats
+    assert seats == {ids[0]: 30, ids[1]: 30, ids[2]: 6}
+    assert available == {ids[0]: 30, ids[1]: 30, ids[2]: 6}
+    assert capacity == {str(ids[0]): 30, str(ids[1]): 30, str(ids[2]): 6}
+
+def test_overlaps_and_invalid_slots_reject_the_whole_programme(client, theaters, admin_headers):
+    assert client.post("/screenings/schedule", json={"screenings": [slot(1, 0)]}, headers=admin_headers).status_code == 201
+
+    clash = client.post("/screenings/schedule", json={"screenings": [slot(2, 0), slot(1, 2)]}, headers=admin_headers)
+    assert clash.status_code == 409
+    assert clash.json()["detail"] == [{"index": 1, "theater_id": 1, "conflicts_with": {"screening_id": 1}}]
+
+    invalid = client.post("/screenings/schedule", json={"screenings": [
+        slot(3, 0), slot(2, 5, available_seats=11), slot(2, 8, price=-1),
+    ]}, headers=admin_headers)
+    assert invalid.status_code == 400
+    assert [error["index"] for error in invalid.json()["detail"]] == [0, 1, 2]
+
+    dry_run = client.post("/screenings/schedule?dry_run=true", json={"screenings": [slot(2, 0)]}, headers=admin_headers)
+    assert dry_run.status_code == 201 and dry_run.json()["screening_ids"] == []
+    with Session(theaters) as db:
+        assert db.scalar(select(func.count()).select_from(models.Screening)) == 1
+
+def test_theater_locks_serialise_and_are_dropped_when_idle():
+    locks = scheduler.TheaterLocks()
+    order = []
+
+    async def schedule(name: str, theater_ids):
+        async with locks.hold(theater_ids):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(schedule("a", [2, 1]), schedule("b", [1, 3]), schedule("c", [4]))
+
+    asyncio.run(run())
+    assert order.index("a end") < order.index("b start")
+    assert order.index("c start") < order.index("a end")
+    gc.collect()
+    assert len(locks.locks) == 0
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import models
+from search import SearchIndex
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add(1, "The Dark Knight", "Batman faces the Joker", "Action")
+    index.add(2, "Dark Waters", "A lawyer takes on a chemical giant", "Drama")
+    index.add(3, "Knight and Day", "A spy comedy", "Action")
+    return index
+
+def test_every_token_must_match_and_the_last_is_a_prefix(index):
+    # Equal scores fall back to the id order
+    assert [movie_id for movie_id, _ in index.search("dark")] == [1, 2]
+    assert [movie_id for movie_id, _ in index.search("dark kni")] == [1]
+    assert index.search("dark comedy") == []
+    assert index.search("") == []
+
+def test_title_matches_outrank_description_matches(index):
+    index.add(4, "Gotham", "The joker returns", "Crime")
+    index.add(5, "Joker", "", "Drama")
+    assert [movie_id for movie_id, _ in index.search("joker")] == [5, 1, 4]
+    assert index.search("joker", limit=1) == index.search("joker")[:1]
+
+def test_matches_agrees_with_search(index):
+    for query in ("dark", "dark kni", "action", "spy", "zebra"):
+        found = {movie_id for movie_id, _ in index.search(query)}
+        assert {movie_id for movie_id in (1, 2, 3) if index.matches(movie_id, query)} == found
+
+def test_updates_and_removals_leave_no_stale_terms(index):
+    index.add(2, "Bright Waters", "", "Drama")
+    assert [movie_id for movie_id, _ in index.search("dark")] == [1]
+    index.remove(1)
+    assert index.search("batman") == [] and "batman" not in index.terms
+    assert len(index) == 2
+
+def test_filters_and_counts_apply_to_every_match_beyond_the_ranking_cap(app, client, database, monkeypatch):
+    with Session(database) as db:
+        db.execute(insert(models.Movie), [
+            {"id": number, "title": f"Heist {number}", "description": "", "duration": 100,
+             "release_date": datetime(2020, 1, 1), "genre": "Crime" if number % 2 else "Drama",
+             "rating": number, "image_url": "x"}
+            for number in range(1, 31)
+        ])
+        db.commit()
+    asyncio.run(app.load_search_index())
+    monkeypatch.setattr(app, "SEARCH_MAX_RESULTS", 5)
+
+    body = client.get("/movies?search=heist&genre=Drama&sort=rating&limit=3").json()
+    assert body["total"] == 15
+    # The best rated Drama comes back even though other matches rank level with it
+    assert [movie["title"] for movie in body["movies"]] == ["Heist 30", "Heist 28", "Heist 26"]
+
+    ranked = client.get("/movies?search=heist&sort=relevance&limit=5").json()
+    assert ranked["total"] == 30 and len(ranked["movies"]) == 5
+    assert client.get("/movies?search=heist&sort=relevance&skip=5&limit=5").status_code == 400
@@ -0,0 +1,45 @@
+import base64
+import pytest
+from seatmap import SeatBitmap, seat_layout
+
+def test_bitmap_stores_seat_one_in_the_top_bit():
+    bitmap = SeatBitmap.from_seats(10, [1, 2, 9])
+    assert bytes(bitmap.bits) == bytes([0b11000000, 0b10000000])
+    assert bitmap.is_set(9) and not bitmap.is_set(10)
+    assert bitmap.count() == 3
+
+def test_clear_and_bounds():
+    bitmap = SeatBitmap.from_seats(8, [3, 4])
+    bitmap.clear(3)
+    assert [seat for seat in range(1, 9) if bitmap.is_set(seat)] == [4]
+    with pytest.raises(IndexError):
+        bitmap.set(9)
+    with pytest.raises(IndexError):
+        bitmap.set(0)
+
+def test_ranges_are_inclusive_runs():
+    bitmap = SeatBitmap.from_seats(20, [1, 2, 3, 7, 18, 19, 20])
+    assert bitmap.to_ranges() == [[1, 3], [7, 7], [18, 20]]
+    assert SeatBitmap(5).to_ranges() == []
+
+def test_a_500_seat_hall_fits_in_under_a_hundred_bytes():
+    encoded = SeatBitmap.from_seats(500, range(1, 501, 2)).to_base64()
+    assert len(encoded) < 100
+    assert len(base64.b64decode(encoded)) == 63
+
+def test_layout():
+    assert seat_layout(25, 10) == (3, 10)
+    assert seat_layout(25, 0) == (0, 0)
+
+def test_seatmap_endpoint_shows_booked_and_held_seats(client, screening, customer_headers):
+    assert client.post("/bookings", json={"screening_id": screening, "seats": [1, 2]}, headers=customer_headers).status_code == 200
+    assert client.post("/holds", json={"screening_id": screening, "seats": [5]}, headers=customer_headers).status_code == 200
+
+    body = client.get(f"/screenings/{screening}/seatmap?encoding=ranges").json()
+    assert body["total_seats"] == 20 and body["available_seats"] == 18
+    assert body["booked"] == [[1, 2]] and body["held"] == [[5, 5]]
+
+    bitmap = client.get(f"/screenings/{screening}/seatmap").json()
+    assert base64.b64decode(bitmap["booked"])[0] == 0b11000000
+    assert client.get(f"/screenings/{screening}/seatmap?encoding=json").status_code == 400
+    assert client.get("/screenings/999/seatmap").status_code == 404
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import models
+import showtimes
+
+START = datetime(2030, 3, 1)
+
+@pytest.fixture
+def programme(database):
+    # Two theaters, two genres, a screening every three hours over three days
+    with Session(database) as db:
+        db.execute(insert(models.Theater), [{"id": 1, "name": "One", "total_seats": 10}, {"id": 2, "name": "Two", "total_seats": 10}])
+        db.execute(insert(models.Movie), [
+            {"id": 1, "title": "Drama", "duration": 100, "release_date": datetime(2020, 1, 1), "genre": "Drama"},
+            {"id": 2, "title": "Horror", "duration": 100, "release_date": datetime(2020, 1, 1), "genre": "Horror"},
+        ])
+        db.execute(insert(models.Screening), [
+            {"id": number, "movie_id": 1 + number % 2, "theater_id": 1 + number // 2 % 2, "price": 10.0,
+             "available_seats": 10, "screening_time": START + timedelta(hours=3 * number)}
+            for number in range(24)
+        ])
+        db.commit()
+    return database
+
+def test_day_lists_are_searched_by_start_time():
+    day = showtimes.DayShowtimes(START.date(), [
+        showtimes.Showtime(START + timedelta(hours=hour), hour, 1, 1, "Drama") for hour in (21, 9, 15, 12)
+    ])
+    assert [s.screening_id for s in day.between(START + timedelta(hours=12), START + timedelta(hours=21))] == [12, 15]
+
+def test_windows_cross_days_and_apply_filters(client, programme):
+    tonight = client.get("/screenings", params={"start": (START + timedelta(hours=18)).isoformat(),
+                                                "end": (START + timedelta(hours=30)).isoformat()}).json()
+    assert [s["id"] for s in tonight] == [6, 7, 8, 9]
+
+    horror = client.get("/screenings", params={"day": "2030-03-02", "genre": "Horror", "theater_id": 1}).json()
+    assert [s["id"] for s in horror] == [9, 13]
+    assert [s["id"] for s in client.get("/screenings", params={"day": "2030-03-01", "limit": 3}).json()] == [0, 1, 2]
+
+def test_scheduling_reaches_a_cached_day(client, programme, admin_headers):
+    assert len(client.get("/screenings", params={"day": "2030-03-04"}).json()) == 0
+    client.post("/screenings/schedule", json={"screenings": [
+        {"movie_id": 1, "theater_id": 1, "price": 10.0, "screening_time": "2030-03-04T18:00:00"}
+    ]}, headers=admin_headers)
+    assert len(client.get("/screenings", params={"day": "2030-03-04"}).json()) == 1
+
+@pytest.mark.parametrize("params", [
+    {"start": "2030-03-02T00:00:00", "end": "2030-03-01T00:00:00"},
+    {"start": "2030-03-01T00:00:00", "end": "2030-05-01T00:00:00"},
+    {"day": "2030-03-01", "limit": 0},
+])
+def test_invalid_windows_are_rejected(client, programme, params):
+    assert client.get("/screenings", params=params).status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import insert, select
+import models
+import stats
+
+def sales(app, key: str):
+    async def read():
+        async with app.AsyncSessionLocal() as db:
+            return await db.get(models.SalesAggregate, (stats.SCOPE_SCREENING, key))
+    return asyncio.run(read())
+
+def test_bookings_and_cancellations_keep_the_screening_row_current(app, client, screening, customer_headers, admin_headers):
+    first = client.post("/bookings", json={"screening_id": screening, "seats": [1, 2]}, headers=customer_headers).json()
+    second = client.post("/bookings", json={"screening_id": screening, "seats": [3]}, headers=customer_headers).json()
+    assert client.delete(f"/bookings/{first['id']}", headers=admin_headers).status_code == 204
+
+    body = client.get(f"/admin/stats?screening_id={screening}&movie_id=1", headers=admin_headers).json()
+    assert body["screening"] == {
+        "bookings": 1, "tickets": 1, "revenue": second["total_amount"], "capacity": 20, "fill_rate": 0.05
+    }
+    assert body["movie"] == body["total"] == body["screening"]
+    assert client.get("/admin/stats", headers=customer_headers).status_code == 403
+
+def test_rebuild_repairs_drift_and_drops_stale_rows(app, client, screening, customer_headers):
+    booking = client.post("/bookings", json={"screening_id": screening, "seats": [1, 2]}, headers=customer_headers).json()
+
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            row = await db.get(models.SalesAggregate, (stats.SCOPE_SCREENING, str(screening)))
+            row.tickets = 99
+            db.add(models.SalesAggregate(scope=stats.SCOPE_MOVIE, key="1"))
+            db.add(models.SalesAggregate(scope=stats.SCOPE_SCREENING, key="404"))
+            await db.commit()
+            return await stats.rebuild(db, batch_size=1)
+
+    assert asyncio.run(run()) == 1
+    row = sales(app, str(screening))
+    assert (row.bookings, row.tickets, row.revenue, row.capacity) == (1, 2, booking["total_amount"], 20)
+
+    async def keys():
+        async with app.AsyncSessionLocal() as db:
+            return (await db.execute(select(models.SalesAggregate.scope, models.SalesAggregate.key))).all()
+    assert asyncio.run(keys()) == [(stats.SCOPE_SCREENING, str(screening))]
+
+def test_a_booking_committed_while_rebuilding_is_kept(app, client, screening, customer_headers, monkeypatch):
+    booking = client.post("/bookings", json={"screening_id": screening, "seats": [1]}, headers=customer_headers).json()
+    rebuild_batch = stats.rebuild_batch
+
+    async def booking_lands_first(db, screening_ids):
+        # Another request books and bumps the row after rebuild listed the screenings
+        async with app.AsyncSessionLocal() as other:
+            await other.execute(insert(models.Booking).values(
+                user_id=2, screening_id=screening, num_seats=3, seats=[4, 5, 6], total_amount=30.0,
+                booking_time=datetime.utcnow(), status="confirmed"
+            ))
+            await stats.record_booking(other, await other.get(models.Screening, screening), 3, 30.0)
+            await other.commit()
+        monkeypatch.setattr(stats, "rebuild_batch", rebuild_batch)
+        await rebuild_batch(db, screening_ids)
+
+    monkeypatch.setattr(stats, "rebuild_batch", booking_lands_first)
+
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            await stats.rebuild(db)
+    asyncio.run(run())
+    row = sales(app, str(screening))
+    assert (row.bookings, row.tickets, row.revenue) == (2, 4, booking["total_amount"] + 30.0)
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from jose import jwt
+from conftest import register
+import waitingroom
+
+def room(max_active: int = 10) -> waitingroom.WaitingRoom:
+    return waitingroom.WaitingRoom(1, max_active, admission_seconds=60, heartbeat_seconds=30)
+
+def test_tickets_are_admitted_in_arrival_order_and_dropped_when_abandoned():
+    queue = room()
+    first, second, third = (queue.join(name, now=0) for name in ("ann", "bob", "cat"))
+    assert queue.join("ann", now=1) == first
+    assert [queue.position(seq) for seq in (first, second, third)] == [1, 2, 3]
+
+    # bob stopped polling, so he is dropped when he reaches the front
+    queue.seen(first, 25)
+    queue.seen(third, 25)
+    assert queue.admit(2, now=40) == [first, third]
+    assert queue.abandoned == 1 and queue.position(second) is None
+    assert queue.is_admitted(first, "ann", 40) and not queue.is_admitted(first, "cat", 40)
+
+    queue.expire(now=100)
+    assert queue.expired == 2 and not queue.is_admitted(third, "cat", 100)
+
+def test_admissions_follow_the_rate_up_to_the_active_limit():
+    queue = room(max_active=3)
+    for number in range(10):
+        queue.join(f"user{number}", now=0)
+    assert queue.tick(now=0, rate=2, elapsed=0.5) == [1]
+    assert queue.tick(now=1, rate=2, elapsed=1) == [2, 3]
+    # Three admitted and none finished, so nobody else gets in
+    assert queue.tick(now=2, rate=100, elapsed=1) == []
+    assert queue.complete(2)
+    assert queue.tick(now=3, rate=100, elapsed=1) == [4]
+
+def test_the_pacer_spaces_commits_and_slows_with_the_database():
+    latency = waitingroom.CommitLatency(initial_seconds=0.001)
+    pacer = waitingroom.WritePacer(target_per_second=10, pool_size=5, utilization=0.5, latency=latency)
+    assert [pacer.reserve(now=0, max_wait=1) for _ in range(3)] == [0, pytest.approx(0.1), pytest.approx(0.2)]
+    assert pacer.reserve(now=0, max_wait=0.25) is None and pacer.rejected == 1
+    latency.seconds = 0.5
+    assert pacer.rate() == 5.0
+
+def settings() -> tuple:
+    secret = "test"
+    pacer = waitingroom.WritePacer(10, 5, 0.5, waitingroom.CommitLatency())
+    return (
+        pacer, lambda claims, ttl: jwt.encode(claims, secret, algorithm="HS256"),
+        lambda token: jwt.decode(token, secret, algorithms=["HS256"]),
+        3, 60, 30, timedelta(hours=1), 0.8
+    )
+
+@pytest.fixture(params=["memory", "db"])
+def rooms(request, app) -> waitingroom.WaitingRoomManager:
+    if request.param == "memory":
+        return waitingroom.InMemoryWaitingRoomManager(*settings())
+    return waitingroom.DatabaseWaitingRoomManager(app.AsyncSessionLocal, *settings(), tick_seconds=0.5)
+
+def test_tickets_only_verify_against_the_room_that_issued_them(rooms):
+    asyncio.run(rooms.open(1))
+    first = rooms.get(1)
+    ticket = rooms.ticket(first, "ann", asyncio.run(rooms.join(first, "ann", 0)))
+    assert rooms.verify(ticket, first, "ann") == 1
+    assert rooms.verify(ticket, first, "bob") is None
+
+    asyncio.run(rooms.close(1))
+    assert asyncio.run(rooms.join(first, "bob", 0)) is None
+    asyncio.run(rooms.open(1))
+    reopened = rooms.get(1)
+    asyncio.run(rooms.join(reopened, "bob", 0))
+    # Same screening and sequence number, but issued by the room that was closed
+    assert rooms.verify(ticket, reopened, "ann") is None
+
+def test_managers_admit_in_order_up_to_the_active_limit(rooms):
+    async def run():
+        start = rooms.now()
+        await rooms.open(1)
+        room = rooms.get(1)
+        seqs = [await rooms.join(room, f"user{number}", start) for number in range(5)]
+        assert await rooms.join(room, "user0", start) == seqs[0]
+        admitted = {}
+        for step in range(4):
+            for screening_id, seqs_in in (await rooms.tick(start + step)).items():
+                admitted.setdefault(screening_id, []).extend(seqs_in)
+        # max_active is 3, and nobody has booked yet
+        assert admitted[1] == seqs[:3]
+        assert await rooms.status(room, seqs[0], "user0", start + 3) == {
+            "screening_id": 1, "position": 0, "admitted": True, "eta_seconds": 0.0, "admission_expires_in": 58.0
+        }
+        assert not await rooms.is_admitted(room, seqs[0], "user1", start + 3)
+        assert (await rooms.status(room, seqs[4], "user4", start + 3))["position"] == 2
+
+        assert await rooms.complete(room, seqs[0]) and not await rooms.complete(room, seqs[0])
+        admitted = (await rooms.tick(start + 4))[1]
+        assert admitted == [seqs[3]]
+        stats = (await rooms.stats())["rooms"][0]
+        assert (stats["waiting"], stats["active"], stats["admitted"], stats["completed"]) == (1, 3, 4, 1)
+    asyncio.run(run())
+
+def test_booking_through_the_waiting_room(app, client, screening, customer_headers, admin_headers):
+    assert client.post(f"/screenings/{screening}/waiting-room", headers=admin_headers).status_code == 200
+    booking = {"screening_id": screening, "seats": [1]}
+    assert client.post("/bookings", json=booking, headers=customer_headers).status_code == 403
+
+    joined = client.post(f"/screenings/{screening}/waiting-room/join", headers=customer_headers).json()
+    queue = {**customer_headers, "X-Queue-Ticket": joined["ticket"]}
+    assert joined["position"] == 1 and not joined["admitted"]
+    assert client.post("/bookings", json=booking, headers=queue).status_code == 403
+
+    # Someone else's ticket is no good even once it is admitted
+    other = register(client, "other")
+    asyncio.run(app.waiting_rooms.tick(app.waiting_rooms.now() + 1))
+    asyncio.run(app.waiting_rooms.tick(app.waiting_rooms.now() + 2))
+    assert client.get(f"/screenings/{screening}/waiting-room/status", headers=queue).json()["admitted"]
+    assert client.post("/bookings", json=booking, headers={**other, "X-Queue-Ticket": joined["ticket"]}).status_code == 403
+    assert client.post("/bookings", json=booking, headers=queue).status_code == 200
+
+    # Closing and reopening the room voids the tickets it issued
+    client.delete(f"/screenings/{screening}/waiting-room", headers=admin_headers)
+    client.post(f"/screenings/{screening}/waiting-room", headers=admin_headers)
+    client.post(f"/screenings/{screening}/waiting-room/join", headers=other)
+    asyncio.run(app.waiting_rooms.tick(app.waiting_rooms.now() + 3))
+    status = client.get(f"/screenings/{screening}/waiting-room/status", headers=queue)
+    assert status.status_code == 403
+    assert client.post("/bookings", json={"screening_id": screening, "seats": [2]}, headers=queue).status_code == 403
@@ -0,0 +1,774 @@
+import asyncio
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import models
+
+TICKET_TYPE = "queue"
+
+class CommitLatency:
+    # Moving average of booking commit time, the signal the admission rate is tuned to
+    def __init__(self, initial_seconds: float = 0.01, alpha: float = 0.1):
+        self.seconds = initial_seconds
+        self.alpha = alpha
+        self.samples = 0
+
+    def observe(self, seconds: float):
+        self.seconds += self.alpha * (seconds - self.seconds)
+        self.samples += 1
+
+class WritePacer:
+    # Spaces booking commits for waiting-room screenings at least 1/rate apart, so no second ever
+    # sees more than rate of them. The rate is the configured target, lowered when commits slow
+    # down so the pool stays at the target utilization.
+    def __init__(self, target_per_second: float, pool_size: int, utilization: float, latency: CommitLatency):
+        self.target_per_second = target_per_second
+        self.pool_size = pool_size
+        self.utilization = utilization
+        self.latency = latency
+        # Theoretical arrival time of the next commit slot
+        self.next_slot = 0.0
+        self.reserved = 0
+        self.rejected = 0
+
+    def rate(self) -> float:
+        capacity = self.pool_size * self.utilization / max(self.latency.seconds, 1e-4)
+        return max(1.0, min(self.target_per_second, capacity))
+
+    def reserve(self, now: float, max_wait: float) -> Optional[float]:
+        # Seconds to wait for the reserved slot, or None if the next one is too far off
+        slot = max(self.next_slot, now)
+        if slot - now > max_wait:
+            self.rejected += 1
+            return None
+        self.next_slot = slot + 1.0 / self.rate()
+        self.reserved += 1
+        return slot - now
+
+class WaitingRoom:
+    # FIFO queue for one screening. Tickets are numbered in arrival order and everything up to
+    # admitted_through has left the queue, so joining, admitting and the position lookup are all
+    # O(1). Admitted tickets may book until their admission window closes.
+    def __init__(self, screening_id: int, max_active: int, admission_seconds: float, heartbeat_seconds: float):
+        self.screening_id = screening_id
+        self.max_active = max_active
+        self.admission_seconds = admission_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        # Sequence numbers restart in every room, so tickets carry the room's epoch and a ticket
+        # from a closed room cannot be replayed against a new one for the same screening
+        self.epoch = uuid.uuid4().hex
+        self.next_seq = 1
+        self.admitted_through = 0
+        # Waiting tickets in arrival order: seq -> [last seen, username]
+        self.waiting: "OrderedDict[int, list]" = OrderedDict()
+        # Admitted tickets in admission order: seq -> (window closes at, username)
+        self.active: "OrderedDict[int, Tuple[float, str]]" = OrderedDict()
+        self.tickets: Dict[str, int] = {}
+        # Admissions earned but not yet handed out, carried between ticks
+        self.allowance = 0.0
+        # Set and replaced whenever tickets are admitted, for status pushes
+        self.changed = asyncio.Event()
+        self.admitted = 0
+        self.completed = 0
+        self.abandoned = 0
+        self.expired = 0
+
+    def join(self, username: str, now: float) -> int:
+        # Joining again while queued or admitted keeps the original place
+        seq = self.tickets.get(username)
+        if seq is not None:
+            self.seen(seq, now)
+            return seq
+        seq = self.next_seq
+        self.next_seq += 1
+        self.waiting[seq] = [now, username]
+        self.tickets[username] = seq
+        return seq
+
+    def seen(self, seq: int, now: float):
+        entry = self.waiting.get(seq)
+        if entry is not None:
+            entry[0] = now
+
+    def position(self, seq: int) -> Optional[int]:
+        # 0 once admitted; None when the ticket has completed, expired or been dropped.
+        # Abandoned tickets still ahead are counted, so this is an upper bound.
+        if seq in self.waiting:
+            return seq - self.admitted_through
+        if seq in self.active:
+            return 0
+        return None
+
+    def is_admitted(self, seq: int, username: str, now: float) -> bool:
+        entry = self.active.get(seq)
+        return entry is not None and entry[1] == username and entry[0] > now
+
+    def admission_expires_in(self, seq: int, now: float) -> Optional[float]:
+        entry = self.active.get(seq)
+        return max(0.0, entry[0] - now) if entry else None
+
+    def complete(self, seq: int) -> bool:
+        entry = self.active.pop(seq, None)
+        if entry is None:
+            return False
+        self.tickets.pop(entry[1], None)
+        self.completed += 1
+        return True
+
+    def expire(self, now: float):
+        # Windows all have the same length, so the oldest admission closes first
+        while self.active:
+            seq, (closes_at, username) = next(iter(self.active.items()))
+            if closes_at > now:
+                break
+            del self.active[seq]
+            self.tickets.pop(username, None)
+            self.expired += 1
+
+    def admit(self, count: int, now: float) -> List[int]:
+        # Tickets that stopped polling are dropped as they reach the front instead of taking a slot
+        admitted: List[int] = []
+        while self.waiting and len(admitted) < count:
+            seq, (last_seen, username) = self.waiting.popitem(last=False)
+            self.admitted_through = seq
+            if now - last_seen > self.heartbeat_seconds:
+                self.tickets.pop(username, None)
+                self.abandoned += 1
+                continue
+            self.active[seq] = (now + self.admission_seconds, username)
+            admitted.append(seq)
+        self.admitted += len(admitted)
+        return admitted
+
+    def tick(self, now: float, rate: float, elapsed: float) -> List[int]:
+        self.expire(now)
+        if not self.waiting:
+            self.allowance = 0.0
+            return []
+        self.allowance = min(self.allowance + rate * elapsed, float(self.max_active))
+        admitted = self.admit(min(int(self.allowance), self.max_active - len(self.active)), now)
+        self.allowance -= len(admitted)
+        if admitted:
+            self.changed.set()
+            self.changed = asyncio.Event()
+        return admitted
+
+    def stats(self) -> dict:
+        return {
+            "screening_id": self.screening_id,
+            "waiting": len(self.waiting),
+            "active": len(self.active),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "abandoned": self.abandoned,
+            "expired": self.expired,
+        }
+
+class RoomRef(NamedTuple):
+    # A database-backed room as seen by one worker
+    screening_id: int
+    epoch: str
+
+Room = Union[WaitingRoom, RoomRef]
+
+class Admission(NamedTuple):
+    room: Room
+    seq: int
+
+class WaitingRoomManager(ABC):
+    # Waiting rooms for the screenings an admin has switched one on for. Admission is paced so
+    # the bookings admitted users go on to make stay within the write pacer's rate: the rate is
+    # split across open rooms and scaled up by how many admitted users actually book. Each of the
+    # workers paces its own commits, so their pacers together make up the rate.
+    def __init__(
+        self,
+        pacer: WritePacer,
+        issue: Callable[[dict, timedelta], str],
+        decode: Callable[[str], Optional[dict]],
+        max_active: int,
+        admission_seconds: float,
+        heartbeat_seconds: float,
+        ticket_ttl: timedelta,
+        headroom: float,
+        workers: int = 1
+    ):
+        self.pacer = pacer
+        self.issue = issue
+        self.decode = decode
+        self.max_active = max_active
+        self.admission_seconds = admission_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.ticket_ttl = ticket_ttl
+        self.headroom = headroom
+        self.workers = workers
+
+    def now(self) -> float:
+        # The clock room times are kept on
+        return time.monotonic()
+
+    @abstractmethod
+    def get(self, screening_id: int) -> Optional[Room]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def open(self, screening_id: int) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def close(self, screening_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def join(self, room: Room, username: str, now: float) -> Optional[int]:
+        # The ticket's sequence number; None if the room has closed meanwhile
+        raise NotImplementedError
+
+    @abstractmethod
+    async def seen(self, room: Room, seq: int, now: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def lookup(self, room: Room, seq: int, username: str, now: float) -> Tuple[Optional[int], Optional[float]]:
+        # (position, seconds left of the admission window); the window only for the admitted user
+        raise NotImplementedError
+
+    @abstractmethod
+    async def complete(self, room: Room, seq: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def changed(self, room: Room) -> asyncio.Event:
+        # Set when the room admits tickets or closes
+        raise NotImplementedError
+
+    @abstractmethod
+    async def tick(self, now: float) -> Dict[int, List[int]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def totals(self) -> Tuple[int, int, int]:
+        # (admissions completed, admissions expired, open rooms) for the admission rate
+        raise NotImplementedError
+
+    @abstractmethod
+    async def room_stats(self) -> List[dict]:
+        raise NotImplementedError
+
+    def conversion(self) -> float:
+        # Share of finished admissions that ended in a booking, smoothed towards 1 until there is
+        # data; admissions still open are left out since most of their bookings are yet to come
+        completed, expired, _ = self.totals()
+        return max(0.1, (completed + 10) / (completed + expired + 10))
+
+    def admit_rate(self) -> float:
+        # Admissions per second for each open room
+        return self.pacer.rate() * self.workers * self.headroom / self.conversion() / max(1, self.totals()[2])
+
+    def eta(self, position: int) -> float:
+        return round(position / max(self.admit_rate(), 1e-6), 1)
+
+    def ticket(self, room: Room, username: str, seq: int) -> str:
+        return self.issue(
+            {"sub": username, "typ": TICKET_TYPE, "scr": room.screening_id, "epoch": room.epoch, "seq": seq},
+            self.ticket_ttl
+        )
+
+    def verify(self, ticket: Optional[str], room: Room, username: str) -> Optional[int]:
+        # The ticket's sequence number if it is a valid queue ticket for this user, issued by this
+        # very room
+        claims = self.decode(ticket) if ticket else None
+        if (not claims or claims.get("typ") != TICKET_TYPE or claims.get("sub") != username
+                or claims.get("scr") != room.screening_id or claims.get("epoch") != room.epoch
+                or not isinstance(claims.get("seq"), int)):
+            return None
+        return claims["seq"]
+
+    async def is_admitted(self, room: Room, seq: int, username: str, now: float) -> bool:
+        return (await self.lookup(room, seq, username, now))[1] is not None
+
+    async def status(self, room: Room, seq: int, username: str, now: float) -> dict:
+        position, closes_in = await self.lookup(room, seq, username, now)
+        admitted = closes_in is not None
+        return {
+            "screening_id": room.screening_id,
+            "position": position,
+            "admitted": admitted,
+            "eta_seconds": 0.0 if admitted else (self.eta(position) if position else None),
+            "admission_expires_in": round(closes_in, 1) if admitted else None,
+        }
+
+    async def stats(self) -> dict:
+        return {
+            "write_rate": round(self.pacer.rate(), 2),
+            "admit_rate": round(self.admit_rate(), 2),
+            "conversion": round(self.conversion(), 3),
+            "commit_latency_ms": round(self.pacer.latency.seconds * 1000, 2),
+            "commits_paced": self.pacer.reserved,
+            "commits_rejected": self.pacer.rejected,
+            "rooms": await self.room_stats(),
+        }
+
+class InMemoryWaitingRoomManager(WaitingRoomManager):
+    # Rooms in this process, for a single worker
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rooms: Dict[int, WaitingRoom] = {}
+        self.ticked_at: Optional[float] = None
+        # Totals of rooms already closed, for the conversion estimate
+        self.closed_completed = 0
+        self.closed_expired = 0
+
+    def get(self, screening_id: int) -> Optional[WaitingRoom]:
+        return self.rooms.get(screening_id)
+
+    def open_room(self, screening_id: int) -> WaitingRoom:
+        room = self.rooms.get(screening_id)
+        if room is None:
+            room = self.rooms[screening_id] = WaitingRoom(
+                screening_id, self.max_active, self.admission_seconds, self.heartbeat_seconds
+            )
+        return room
+
+    async def open(self, screening_id: int) -> dict:
+        return self.open_room(screening_id).stats()
+
+    async def close(self, screening_id: int) -> bool:
+        room = self.rooms.pop(screening_id, None)
+        if room is None:
+            return False
+        self.closed_completed += room.completed
+        self.closed_expired += room.expired
+        # Wake anyone watching so they see the room is gone
+        room.changed.set()
+        return True
+
+    async def join(self, room: WaitingRoom, username: str, now: float) -> Optional[int]:
+        return room.join(username, now) if self.rooms.get(room.screening_id) is room else None
+
+    async def seen(self, room: WaitingRoom, seq: int, now: float):
+        room.seen(seq, now)
+
+    async def lookup(self, room: WaitingRoom, seq: int, username: str, now: float) -> Tuple[Optional[int], Optional[float]]:
+        closes_in = room.admission_expires_in(seq, now) if room.is_admitted(seq, username, now) else None
+        return room.position(seq), closes_in
+
+    async def complete(self, room: WaitingRoom, seq: int) -> bool:
+        return room.complete(seq)
+
+    def changed(self, room: WaitingRoom) -> asyncio.Event:
+        return room.changed
+
+    def advance(self, now: float) -> Dict[int, List[int]]:
+        elapsed = 0.0 if self.ticked_at is None else now - self.ticked_at
+        self.ticked_at = now
+        rate = self.admit_rate()
+        return {screening_id: room.tick(now, rate, elapsed) for screening_id, room in list(self.rooms.items())}
+
+    async def tick(self, now: float) -> Dict[int, List[int]]:
+        return self.advance(now)
+
+    def totals(self) -> Tuple[int, int, int]:
+        return (
+            self.closed_completed + sum(room.completed for room in self.rooms.values()),
+            self.closed_expired + sum(room.expired for room in self.rooms.values()),
+            len(self.rooms),
+        )
+
+    async def room_stats(self) -> List[dict]:
+        return [room.stats() for room in self.rooms.values()]
+
+TICKET_WAITING = "waiting"
+TICKET_ACTIVE = "active"
+
+class DatabaseWaitingRoomManager(WaitingRoomManager):
+    # Rooms and tickets in the waiting_rooms and waiting_room_tickets tables, so every worker
+    # queues into and admits from the same rooms. Times are Unix seconds, since a monotonic
+    # clock means nothing to another process. Every worker runs the admitter, and a room's
+    # version column lets one of them tick it each interval. Which rooms are open is refreshed
+    # every tick, so a room opened or closed on another worker is seen within one interval.
+    def __init__(self, session_factory, *args, tick_seconds: float = 0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session_factory = session_factory
+        self.tick_seconds = tick_seconds
+        # Open rooms and how far each has admitted, as of the last refresh
+        self.rooms: Dict[int, RoomRef] = {}
+        self.admitted_through: Dict[int, int] = {}
+        self.finished: Tuple[int, int] = (0, 0)
+        self.events: Dict[int, asyncio.Event] = {}
+
+    def now(self) -> float:
+        return time.time()
+
+    def get(self, screening_id: int) -> Optional[RoomRef]:
+        return self.rooms.get(screening_id)
+
+    async def open(self, screening_id: int) -> dict:
+        async with self.session_factory() as db:
+            while True:
+                row = await db.get(models.WaitingRoom, screening_id, with_for_update=True)
+                if row is None:
+                    row = models.WaitingRoom(screening_id=screening_id, is_open=False, version=0)
+                    db.add(row)
+                if not row.is_open:
+                    # Tickets left from an earlier room are void along with its epoch
+                    await db.execute(delete(models.WaitingRoomTicket).where(
+                        models.WaitingRoomTicket.screening_id == screening_id
+                    ))
+                    row.is_open, row.epoch, row.ticked_at = True, uuid.uuid4().hex, self.now()
+                    row.next_seq = row.admitted_through = row.admitted = row.completed = row.abandoned = row.expired = 0
+                    row.allowance = 0.0
+                    row.version = (row.version or 0) + 1
+                try:
+                    await db.commit()
+                    break
+                except IntegrityError:
+                    # Opened on another worker at the same moment
+                    await db.rollback()
+            self.rooms[screening_id] = RoomRef(screening_id, row.epoch)
+            self.admitted_through.setdefault(screening_id, row.admitted_through)
+            return (await self.room_stats(db, [screening_id]))[0]
+
+    async def close(self, screening_id: int) -> bool:
+        async with self.session_factory() as db:
+            closed = (await db.execute(
+                update(models.WaitingRoom)
+                .where(models.WaitingRoom.screening_id == screening_id, models.WaitingRoom.is_open.is_(True))
+                .values(is_open=False)
+            )).rowcount
+            await db.execute(delete(models.WaitingRoomTicket).where(
+                models.WaitingRoomTicket.screening_id == screening_id
+            ))
+            await db.commit()
+        self.rooms.pop(screening_id, None)
+        self.notify(screening_id)
+        return closed == 1
+
+    async def join(self, room: RoomRef, username: str, now: float) -> Optional[int]:
+        ticket = (models.WaitingRoomTicket.screening_id == room.screening_id)
+        async with self.session_factory() as db:
+            seq = await db.scalar(select(models.WaitingRoomTicket.seq).filter(
+                ticket, models.WaitingRoomTicket.username == username
+            ))
+            if seq is not None:
+                await self.touch(db, room, seq, now)
+                return seq
+            # The room row is locked only for the increment, so joins stay short under a spike
+            taken = (await db.execute(
+                update(models.WaitingRoom)
+                .where(
+                    models.WaitingRoom.screening_id == room.screening_id, models.WaitingRoom.epoch == room.epoch,
+                    models.WaitingRoom.is_open.is_(True)
+                )
+                .values(next_seq=models.WaitingRoom.next_seq + 1)
+            )).rowcount
+            if taken != 1:
+                await db.rollback()
+                return None
+            seq = await db.scalar(select(models.WaitingRoom.next_seq).filter(
+                models.WaitingRoom.screening_id == room.screening_id
+            ))
+            db.add(models.WaitingRoomTicket(
+                screening_id=room.screening_id, seq=seq, username=username, state=TICKET_WAITING, last_seen=now
+            ))
+            try:
+                await db.commit()
+                return seq
+            except IntegrityError:
+                # The same user joining through another worker at the same moment
+                await db.rollback()
+                return await db.scalar(select(models.WaitingRoomTicket.seq).filter(
+                    ticket, models.WaitingRoomTicket.username == username
+                ))
+
+    async def seen(self, room: RoomRef, seq: int, now: float):
+        async with self.session_factory() as db:
+            await self.touch(db, room, seq, now)
+
+    async def touch(self, db, room: RoomRef, seq: int, now: float):
+        # Heartbeats a few times per heartbeat interval are enough, so most polls write nothing
+        await db.execute(
+            update(models.WaitingRoomTicket)
+            .where(
+                models.WaitingRoomTicket.screening_id == room.screening_id, models.WaitingRoomTicket.seq == seq,
+                models.WaitingRoomTicket.state == TICKET_WAITING,
+                models.WaitingRoomTicket.last_seen < now - self.heartbeat_seconds / 4
+            )
+            .values(last_seen=now)
+        )
+        await db.commit()
+
+    async def lookup(self, room: RoomRef, seq: int, username: str, now: float) -> Tuple[Optional[int], Optional[float]]:
+        async with self.session_factory() as db:
+            row = (await db.execute(
+                select(models.WaitingRoomTicket.state, models.WaitingRoomTicket.username, models.WaitingRoomTicket.closes_at)
+                .filter(models.WaitingRoomTicket.screening_id == room.screening_id, models.WaitingRoomTicket.seq == seq)
+            )).first()
+        if row is None:
+            return None, None
+        if row.state == TICKET_WAITING:
+            # From the last refresh, so at most one tick behind; never below 1 while still queued
+            return max(1, seq - self.admitted_through.get(room.screening_id, 0)), None
+        admitted = row.username == username and row.closes_at > now
+        return 0, (row.closes_at - now if admitted else None)
+
+    async def complete(self, room: RoomRef, seq: int) -> bool:
+        async with self.session_factory() as db:
+            removed = (await db.execute(delete(models.WaitingRoomTicket).where(
+                models.WaitingRoomTicket.screening_id == room.screening_id, models.WaitingRoomTicket.seq == seq,
+                models.WaitingRoomTicket.state == TICKET_ACTIVE
+            ))).rowcount
+            if removed:
+                await db.execute(
+                    update(models.WaitingRoom)
+                    .where(models.WaitingRoom.screening_id == room.screening_id, models.WaitingRoom.epoch == room.epoch)
+                    .values(completed=models.WaitingRoom.completed + 1)
+                )
+            await db.commit()
+        return bool(removed)
+
+    def changed(self, room: RoomRef) -> asyncio.Event:
+        return self.events.setdefault(room.screening_id, asyncio.Event())
+
+    def notify(self, screening_id: int):
+        event = self.events.pop(screening_id, None)
+        if event is not None:
+            event.set()
+
+    async def tick(self, now: float) -> Dict[int, List[int]]:
+        admitted: Dict[int, List[int]] = {}
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(models.WaitingRoom.screening_id, models.WaitingRoom.version, models.WaitingRoom.ticked_at,
+                       models.WaitingRoom.allowance, models.WaitingRoom.admitted_through)
+                .filter(models.WaitingRoom.is_open.is_(True))
+            )).all()
+            await db.commit()
+            rate = self.admit_rate()
+            for row in rows:
+                if now - row.ticked_at < self.tick_seconds / 2:
+                    # Another worker ticked it moments ago
+                    continue
+                claimed = (await db.execute(
+                    update(models.WaitingRoom)
+                    .where(models.WaitingRoom.screening_id == row.screening_id, models.WaitingRoom.version == row.version)
+                    .values(version=row.version + 1, ticked_at=now)
+                )).rowcount
+                if claimed != 1:
+                    await db.rollback()
+                    continue
+                admitted[row.screening_id] = await self.advance(db, row, now, rate, now - row.ticked_at)
+                await db.commit()
+            await self.refresh(db)
+        return admitted
+
+    async def advance(self, db, row, now: float, rate: float, elapsed: float) -> List[int]:
+        # WaitingRoom.tick, on the room's rows
+        tickets = (models.WaitingRoomTicket.screening_id == row.screening_id)
+        expired = (await db.execute(delete(models.WaitingRoomTicket).where(
+            tickets, models.WaitingRoomTicket.state == TICKET_ACTIVE, models.WaitingRoomTicket.closes_at <= now
+        ))).rowcount
+        counts = dict((await db.execute(
+            select(models.WaitingRoomTicket.state, func.count()).filter(tickets).group_by(models.WaitingRoomTicket.state)
+        )).all())
+        admitted: List[int] = []
+        abandoned = 0
+        through = row.admitted_through
+        allowance = 0.0
+        if counts.get(TICKET_WAITING):
+            allowance = min(row.allowance + rate * elapsed, float(self.max_active))
+            slots = min(int(allowance), self.max_active - counts.get(TICKET_ACTIVE, 0))
+            # Tickets that stopped polling are dropped as they reach the front instead of taking a slot
+            while len(admitted) < slots:
+                batch = (await db.execute(
+                    select(models.WaitingRoomTicket.seq, models.WaitingRoomTicket.last_seen)
+                    .filter(tickets, models.WaitingRoomTicket.state == TICKET_WAITING)
+                    .order_by(models.WaitingRoomTicket.seq)
+                    .limit(slots - len(admitted))
+                )).all()
+                if not batch:
+                    break
+                dropped = [seq for seq, last_seen in batch if now - last_seen > self.heartbeat_seconds]
+                entering = [seq for seq, last_seen in batch if now - last_seen <= self.heartbeat_seconds]
+                if dropped:
+                    await db.execute(delete(models.WaitingRoomTicket).where(
+                        tickets, models.WaitingRoomTicket.seq.in_(dropped)
+                    ))
+                if entering:
+                    await db.execute(
+                        update(models.WaitingRoomTicket)
+                        .where(tickets, models.WaitingRoomTicket.seq.in_(entering))
+                        .values(state=TICKET_ACTIVE, closes_at=now + self.admission_seconds)
+                    )
+                admitted.extend(entering)
+                abandoned += len(dropped)
+                through = batch[-1].seq
+            allowance -= len(admitted)
+        await db.execute(
+            update(models.WaitingRoom)
+            .where(models.WaitingRoom.screening_id == row.screening_id)
+            .values(
+                admitted_through=through, allowance=allowance,
+                admitted=models.WaitingRoom.admitted + len(admitted),
+                abandoned=models.WaitingRoom.abandoned + abandoned,
+                expired=models.WaitingRoom.expired + expired,
+            )
+        )
+        return admitted
+
+    async def refresh(self, db):
+        rows = (await db.execute(select(
+            models.WaitingRoom.screening_id, models.WaitingRoom.is_open, models.WaitingRoom.epoch,
+            models.WaitingRoom.admitted_through, models.WaitingRoom.completed, models.WaitingRoom.expired
+        ))).all()
+        await db.commit()
+        rooms = {row.screening_id: RoomRef(row.screening_id, row.epoch) for row in rows if row.is_open}
+        through = {row.screening_id: row.admitted_through for row in rows if row.is_open}
+        # Wake watchers of rooms that admitted, closed or were reopened since the last refresh
+        for screening_id in set(self.rooms) | set(rooms):
+            if (self.rooms.get(screening_id) != rooms.get(screening_id)
+                    or self.admitted_through.get(screening_id) != through.get(screening_id)):
+                self.notify(screening_id)
+        self.rooms, self.admitted_through = rooms, through
+        self.finished = (sum(row.completed or 0 for row in rows), sum(row.expired or 0 for row in rows))
+
+    def totals(self) -> Tuple[int, int, int]:
+        return self.finished[0], self.finished[1], len(self.rooms)
+
+    async def room_stats(self, db=None, screening_ids: Optional[List[int]] = None) -> List[dict]:
+        if db is None:
+            async with self.session_factory() as db:
+                return await self.room_stats(db, screening_ids)
+        query = select(models.WaitingRoom).filter(models.WaitingRoom.is_open.is_(True))
+        if screening_ids is not None:
+            query = query.filter(models.WaitingRoom.screening_id.in_(screening_ids))
+        rooms = (await db.scalars(query)).all()
+        counts = {
+            (screening_id, state): count
+            for screening_id, state, count in (await db.execute(
+                select(models.WaitingRoomTicket.screening_id, models.WaitingRoomTicket.state, func.count())
+                .filter(models.WaitingRoomTicket.screening_id.in_([room.screening_id for room in rooms]))
+                .group_by(models.WaitingRoomTicket.screening_id, models.WaitingRoomTicket.state)
+            )).all()
+        }
+        return [
+            {
+                "screening_id": room.screening_id,
+                "waiting": counts.get((room.screening_id, TICKET_WAITING), 0),
+                "active": counts.get((room.screening_id, TICKET_ACTIVE), 0),
+                "admitted": room.admitted,
+                "completed": room.completed,
+                "abandoned": room.abandoned,
+                "expired": room.expired,
+            }
+            for room in rooms
+        ]
+
+async def run_admitter(manager: WaitingRoomManager, interval: float):
+    while True:
+        try:
+            await manager.tick(manager.now())
+        except Exception as e:
+            print(f"Waiting room admitter error: {e}")
+        await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    # python waitingroom.py simulate --users 20000 --target-writes 50
+    import argparse
+    import heapq
+    import random
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description="Simulate an on-sale spike through a waiting room")
+    parser.add_argument("command", choices=["simulate"])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--spike-seconds", type=float, default=60, help="all users arrive within this window")
+    parser.add_argument("--target-writes", type=float, default=50, help="booking commits per second")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--utilization", type=float, default=0.5)
+    parser.add_argument("--commit-ms", type=float, default=8, help="commit latency of an idle database")
+    parser.add_argument("--max-active", type=int, default=10000)
+    parser.add_argument("--admission-seconds", type=float, default=240)
+    parser.add_argument("--conversion", type=float, default=0.7, help="share of admitted users who book")
+    parser.add_argument("--abandon", type=float, default=0.1, help="share of users who give up while queued")
+    parser.add_argument("--tick", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    latency = CommitLatency(args.commit_ms / 1000)
+    pacer = WritePacer(args.target_writes, args.pool_size, args.utilization, latency)
+    manager = InMemoryWaitingRoomManager(
+        pacer, lambda claims, ttl: "", lambda ticket: None, args.max_active, args.admission_seconds,
+        heartbeat_seconds=30, ticket_ttl=timedelta(hours=1), headroom=0.9
+    )
+    room = manager.open_room(1)
+
+    # (time, order, kind, seq); a heap of future events stepped through with the admitter's ticks
+    events: list = []
+    order = 0
+
+    def schedule(at: float, kind: str, seq: int):
+        global order
+        order += 1
+        heapq.heappush(events, (at, order, kind, seq))
+
+    joined_at: Dict[int, float] = {}
+    gives_up: Dict[int, float] = {}
+    for user in range(args.users):
+        at = rng.uniform(0, args.spike_seconds)
+        schedule(at, "join", user)
+    waits: List[float] = []
+    writes: Counter = Counter()
+    recent: List[float] = []
+    now = 0.0
+    horizon = args.spike_seconds + args.users / max(args.target_writes * 0.5, 1) + args.admission_seconds
+    while now < horizon and (events or room.waiting or room.active):
+        while events and events[0][0] <= now:
+            at, _, kind, key = heapq.heappop(events)
+            if kind == "join":
+                seq = room.join(f"user{key}", at)
+                joined_at[seq] = at
+                if rng.random() < args.abandon:
+                    gives_up[seq] = at + rng.uniform(5, 120)
+                schedule(at + 5, "poll", seq)
+            elif kind == "poll":
+                # Queued users poll every few seconds until they are admitted or give up
+                if key not in room.waiting or (key in gives_up and at >= gives_up[key]):
+                    continue
+                room.seen(key, at)
+                schedule(at + 5, "poll", key)
+            elif kind == "book":
+                wait = pacer.reserve(at, max_wait=30)
+                if wait is None:
+                    continue
+                commit_at = at + wait
+                writes[int(commit_at)] += 1
+                # Commit time grows with load as the pool saturates
+                recent = [t for t in recent if t > commit_at - 1] + [commit_at]
+                load = min(0.95, len(recent) * (args.commit_ms / 1000) / args.pool_size)
+                latency.observe(args.commit_ms / 1000 / (1 - load))
+                room.complete(key)
+
+        for seq in manager.advance(now)[1]:
+            waits.append(now - joined_at[seq])
+            if rng.random() < args.conversion:
+                # Seat selection and checkout take a while after admission
+                schedule(now + rng.uniform(20, 180), "book", seq)
+        now += args.tick
+
+    if not waits:
+        raise SystemExit("Nobody was admitted")
+    waits.sort()
+    peak = max(writes.values(), default=0)
+    print(f"Users {args.users} over {args.spike_seconds:.0f}s, target {args.target_writes:.0f} commits/s")
+    print(f"  admitted          {room.admitted}  (dropped after abandoning: {room.abandoned}, windows expired: {room.expired})")
+    print(f"  booked            {sum(writes.values())}  (turned away by the pacer: {pacer.rejected})")
+    print(f"  queue wait        p50 {waits[len(waits) // 2]:.0f}s  p95 {waits[int(len(waits) * 0.95)]:.0f}s  max {waits[-1]:.0f}s")
+    print(f"  commits/s         peak {peak}  mean {sum(writes.values()) / max(1, len(writes)):.1f}  (commit latency {latency.seconds * 1000:.1f} ms)")
+    print(f"  peak within target: {'yes' if peak <= math.ceil(args.target_writes) else 'NO'}")
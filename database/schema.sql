@@ -47,10 +47,177 @@ CREATE TABLE IF NOT EXISTS bookings (
     user_id INT NOT NULL,
     screening_id INT NOT NULL,
     seats JSON NOT NULL,
+    num_seats INT NULL,
     total_amount FLOAT NOT NULL,
     booking_time DATETIME DEFAULT CURRENT_TIMESTAMP,
     status VARCHAR(50) DEFAULT 'pending',
+    payment_intent_id VARCHAR(255) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_bookings_payment_intent (payment_intent_id),
     FOREIGN KEY (user_id) REFERENCES users(id),
     FOREIGN KEY (screening_id) REFERENCES screenings(id)
-); 
\ No newline at end of file
+); 
+CREATE TABLE IF NOT EXISTS screening_seats (
+    screening_id INT NOT NULL,
+    seat_number INT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'available',
+    booking_id INT NULL,
+    PRIMARY KEY (screening_id, seat_number),
+    INDEX idx_screening_seats_booking (booking_id),
+    FOREIGN KEY (screening_id) REFERENCES screenings(id),
+    FOREIGN KEY (booking_id) REFERENCES bookings(id)
+);
+
+-- Additions to tables that may already exist. MySQL has no IF NOT EXISTS for ADD COLUMN or
+-- CREATE INDEX, so these helpers check information_schema first and the file can be re-run
+-- against an existing database.
+DROP PROCEDURE IF EXISTS add_column_if_not_exists;
+DROP PROCEDURE IF EXISTS create_index_if_not_exists;
+DELIMITER //
+CREATE PROCEDURE add_column_if_not_exists(IN table_in VARCHAR(64), IN column_in VARCHAR(64), IN definition TEXT)
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = table_in AND column_name = column_in
+    ) THEN
+        SET @ddl = CONCAT('ALTER TABLE `', table_in, '` ADD COLUMN `', column_in, '` ', definition);
+        PREPARE statement FROM @ddl;
+        EXECUTE statement;
+        DEALLOCATE PREPARE statement;
+    END IF;
+END //
+CREATE PROCEDURE create_index_if_not_exists(IN table_in VARCHAR(64), IN index_in VARCHAR(64), IN definition TEXT)
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = table_in AND index_name = index_in
+    ) THEN
+        SET @ddl = CONCAT('CREATE ', definition);
+        PREPARE statement FROM @ddl;
+        EXECUTE statement;
+        DEALLOCATE PREPARE statement;
+    END IF;
+END //
+DELIMITER ;
+
+CALL add_column_if_not_exists('bookings', 'num_seats', 'INT NULL AFTER seats');
+-- Bookings made before the column existed count the seats in their JSON list
+UPDATE bookings SET num_seats = JSON_LENGTH(seats) WHERE num_seats IS NULL;
+
+CALL create_index_if_not_exists('movies', 'idx_movies_rating', 'INDEX idx_movies_rating ON movies (rating)');
+CALL create_index_if_not_exists('movies', 'idx_movies_release_date', 'INDEX idx_movies_release_date ON movies (release_date)');
+CALL create_index_if_not_exists('movies', 'idx_movies_title_release_date', 'UNIQUE INDEX idx_movies_title_release_date ON movies (title, release_date)');
+CALL create_index_if_not_exists('bookings', 'idx_bookings_booking_time', 'INDEX idx_bookings_booking_time ON bookings (booking_time, id)');
+CALL create_index_if_not_exists('screenings', 'idx_screenings_movie_id_screening_time', 'INDEX idx_screenings_movie_id_screening_time ON screenings (movie_id, screening_time)');
+CALL create_index_if_not_exists('screenings', 'idx_screenings_theater_id_screening_time', 'INDEX idx_screenings_theater_id_screening_time ON screenings (theater_id, screening_time)');
+CALL create_index_if_not_exists('screenings', 'idx_screenings_screening_time', 'INDEX idx_screenings_screening_time ON screenings (screening_time)');
+
+DROP PROCEDURE add_column_if_not_exists;
+DROP PROCEDURE create_index_if_not_exists;
+
+CREATE TABLE IF NOT EXISTS sales_aggregates (
+    scope VARCHAR(20) NOT NULL,
+    `key` VARCHAR(32) NOT NULL,
+    bookings INT NOT NULL DEFAULT 0,
+    tickets INT NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    capacity INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, `key`)
+);
+
+CREATE TABLE IF NOT EXISTS payment_events (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_id VARCHAR(255) UNIQUE,
+    type VARCHAR(100),
+    payment_intent_id VARCHAR(255),
+    payload JSON,
+    status VARCHAR(20) DEFAULT 'queued',
+    received_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    processed_at DATETIME NULL,
+    INDEX idx_payment_events_status (status, id),
+    INDEX idx_payment_events_intent (payment_intent_id)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(50),
+    payload JSON,
+    status VARCHAR(20) DEFAULT 'queued',
+    attempts INT DEFAULT 0,
+    run_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    claimed_by VARCHAR(64) NULL,
+    last_error TEXT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    INDEX ix_jobs_status_run_at (status, run_at),
+    INDEX ix_jobs_claimed_by (claimed_by)
+);
+
+CREATE TABLE IF NOT EXISTS invalidations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    origin VARCHAR(64),
+    topic VARCHAR(50),
+    payload JSON,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_invalidations_created_at (created_at)
+);
+
+CREATE TABLE IF NOT EXISTS replica_heartbeat (
+    id INT PRIMARY KEY,
+    beat_at DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS seat_holds (
+    hold_id VARCHAR(32) PRIMARY KEY,
+    screening_id INT,
+    user_id INT,
+    seats JSON,
+    expires_at DATETIME,
+    INDEX ix_seat_holds_expires_at (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS held_seats (
+    screening_id INT NOT NULL,
+    seat_number INT NOT NULL,
+    hold_id VARCHAR(32),
+    user_id INT,
+    expires_at DATETIME,
+    PRIMARY KEY (screening_id, seat_number),
+    INDEX ix_held_seats_hold_id (hold_id)
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    `key` VARCHAR(300) PRIMARY KEY,
+    fingerprint VARCHAR(64),
+    status_code INT NULL,
+    body TEXT NULL,
+    expires_at DATETIME,
+    INDEX ix_idempotency_keys_expires_at (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS waiting_rooms (
+    screening_id INT PRIMARY KEY,
+    is_open BOOLEAN DEFAULT TRUE,
+    epoch VARCHAR(32),
+    next_seq INT DEFAULT 0,
+    admitted_through INT DEFAULT 0,
+    allowance DOUBLE DEFAULT 0,
+    ticked_at DOUBLE,
+    version INT DEFAULT 0,
+    admitted INT DEFAULT 0,
+    completed INT DEFAULT 0,
+    abandoned INT DEFAULT 0,
+    expired INT DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS waiting_room_tickets (
+    screening_id INT NOT NULL,
+    seq INT NOT NULL,
+    username VARCHAR(255),
+    state VARCHAR(10),
+    last_seen DOUBLE,
+    closes_at DOUBLE NULL,
+    PRIMARY KEY (screening_id, seq),
+    UNIQUE KEY uq_waiting_room_tickets_user (screening_id, username),
+    INDEX ix_waiting_room_tickets_state (screening_id, state, seq)
+);
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import {
   Container,
@@ -22,6 +22,12 @@ const Booking = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [totalAmount, setTotalAmount] = useState(0);
+  const [zonePrices, setZonePrices] = useState(null);
+  // One key per seat selection, so a retried submit cannot book the same seats twice
+  const idempotencyKey = useMemo(
+    () => (window.crypto && window.crypto.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random()}`),
+    [screeningId, selectedSeats.join(',')] // eslint-disable-line react-hooks/exhaustive-deps
+  );
 
   useEffect(() => {
     const fetchMovieDetails = async () => {
@@ -60,7 +66,7 @@ const Booking = () => {
           seats: selectedSeats,
         },
         {
-          headers: { Authorization: `Bearer ${token}` },
+          headers: { Authorization: `Bearer ${token}`, 'Idempotency-Key': idempotencyKey },
         }
       );
 
@@ -78,8 +84,30 @@ const Booking = () => {
   };
 
   useEffect(() => {
-    setTotalAmount(selectedSeats.length * (movie?.price || 0));
-  }, [selectedSeats, movie?.price]);
+    // Prices depend on occupancy, showtime and seat zone, so the server quotes the selection
+    if (!screeningId) {
+      return undefined;
+    }
+    let cancelled = false;
+    axios
+      .get(`http://localhost:8000/screenings/${screeningId}/quote`, {
+        params: { seats: selectedSeats.join(',') },
+      })
+      .then((response) => {
+        if (!cancelled) {
+          setTotalAmount(response.data.total);
+          setZonePrices(response.data.zones);
+        }
+      })
+      .catch(() => {
+        if (!cancelled) {
+          setTotalAmount(0);
+        }
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [screeningId, selectedSeats]);
 
   if (loading) {
     return (
@@ -141,7 +169,12 @@ const Booking = () => {
                 Duration: {movie.duration} minutes
               </Typography>
               <Typography sx={{ color: 'rgba(255, 255, 255, 0.7)', mb: 1 }}>
-                Price per seat: ₹{movie.price}
+                Price per seat:{' '}
+                {zonePrices
+                  ? Object.entries(zonePrices)
+                      .map(([zone, price]) => `${zone} ₹${price}`)
+                      .join(' · ')
+                  : '—'}
               </Typography>
               <Typography variant="h6" sx={{ color: '#4CAF50', mt: 2 }}>
                 Total Amount: ₹{totalAmount}
@@ -11,6 +11,8 @@ import {
   TableRow,
   CircularProgress,
   Alert,
+  Button,
+  Box,
 } from '@mui/material';
 import axios from 'axios';
 
@@ -18,27 +20,39 @@ const Bookings = () => {
   const [bookings, setBookings] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  useEffect(() => {
-    const fetchBookings = async () => {
-      try {
-        const token = localStorage.getItem('token');
-        const response = await axios.get('http://localhost:8000/bookings', {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        setBookings(response.data);
-        setLoading(false);
-      } catch (err) {
-        setError('Failed to load bookings');
-        setLoading(false);
-      }
-    };
+  // The API returns one page at a time; next_cursor fetches the following page
+  const fetchBookings = async (cursor = null) => {
+    const token = localStorage.getItem('token');
+    const response = await axios.get('http://localhost:8000/bookings', {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+      params: cursor ? { cursor } : {},
+    });
+    setBookings((previous) => (cursor ? [...previous, ...response.data.bookings] : response.data.bookings));
+    setNextCursor(response.data.next_cursor);
+  };
 
-    fetchBookings();
+  useEffect(() => {
+    fetchBookings()
+      .catch(() => setError('Failed to load bookings'))
+      .finally(() => setLoading(false));
   }, []);
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      await fetchBookings(nextCursor);
+    } catch (err) {
+      setError('Failed to load bookings');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <Container sx={{ display: 'flex', justifyContent: 'center', alignItems: 'center', minHeight: '100vh' }}>
@@ -81,7 +95,7 @@ const Bookings = () => {
               <TableRow key={booking.id}>
                 <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{booking.id}</TableCell>
                 <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{booking.movie_title}</TableCell>
-                <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{booking.seats.join(', ')}</TableCell>
+                <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{(booking.seats || []).join(', ')}</TableCell>
                 <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>₹{booking.total_amount}</TableCell>
                 <TableCell sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{booking.status}</TableCell>
               </TableRow>
@@ -89,6 +103,13 @@ const Bookings = () => {
           </TableBody>
         </Table>
       </TableContainer>
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+          <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 };
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import {
   Box,
@@ -8,7 +8,9 @@ import {
   Grid,
   IconButton,
   Divider,
+  Chip,
 } from '@mui/material';
+import axios from 'axios';
 import PlayArrowIcon from '@mui/icons-material/PlayArrow';
 import FacebookIcon from '@mui/icons-material/Facebook';
 import TwitterIcon from '@mui/icons-material/Twitter';
@@ -19,6 +21,33 @@ import EmailIcon from '@mui/icons-material/Email';
 
 const Home = () => {
   const navigate = useNavigate();
+  const [tonightsShows, setTonightsShows] = useState([]);
+
+  useEffect(() => {
+    // Everything still to start before midnight, local time
+    const start = new Date();
+    const end = new Date(start);
+    end.setHours(24, 0, 0, 0);
+    axios
+      .get('http://localhost:8000/screenings', {
+        params: { start: start.toISOString(), end: end.toISOString(), expand: 'movie', limit: 12 },
+      })
+      .then((response) => setTonightsShows(response.data))
+      .catch(() => setTonightsShows([]));
+  }, []);
+
+  const handleShowClick = (show) => {
+    navigate('/seat-selection', {
+      state: {
+        movieId: show.movie_id,
+        screeningId: show.id,
+        movieTitle: show.movie?.title,
+        showTime: show.screening_time,
+        showDate: new Date(show.screening_time).toLocaleDateString(),
+        price: show.price,
+      },
+    });
+  };
 
   return (
     <Box 
@@ -99,6 +128,35 @@ const Home = () => {
         </Box>
       </Box>
 
+      {/* Tonight's Shows */}
+      {tonightsShows.length > 0 && (
+        <Container maxWidth="lg" sx={{ pb: 6 }}>
+          <Typography variant="h5" sx={{ mb: 2, fontWeight: 'bold', textShadow: '1px 1px 2px rgba(0,0,0,0.5)' }}>
+            Tonight's Shows
+          </Typography>
+          <Box sx={{ display: 'flex', flexWrap: 'wrap', gap: 1.5 }}>
+            {tonightsShows.map((show) => (
+              <Chip
+                key={show.id}
+                clickable
+                onClick={() => handleShowClick(show)}
+                label={`${show.movie?.title || 'Movie'} · ${new Date(show.screening_time + 'Z').toLocaleTimeString([], {
+                  hour: '2-digit',
+                  minute: '2-digit',
+                })}`}
+                sx={{
+                  color: 'white',
+                  background: 'rgba(255, 255, 255, 0.1)',
+                  backdropFilter: 'blur(8px)',
+                  border: '1px solid rgba(255, 255, 255, 0.2)',
+                  '&:hover': { background: 'rgba(25, 118, 210, 0.6)' },
+                }}
+              />
+            ))}
+          </Box>
+        </Container>
+      )}
+
       {/* Contact Section */}
       <Box
         sx={{
@@ -1,12 +1,39 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { Container, Grid, Card, CardContent, Typography, Box, Button } from '@mui/material';
 import { useNavigate } from 'react-router-dom';
+import axios from 'axios';
 import MovieIcon from '@mui/icons-material/Movie';
 import PeopleIcon from '@mui/icons-material/People';
 import ConfirmationNumberIcon from '@mui/icons-material/ConfirmationNumber';
 
 const Dashboard = () => {
   const navigate = useNavigate();
+  const [stats, setStats] = useState(null);
+
+  useEffect(() => {
+    const fetchStats = async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const response = await axios.get('http://localhost:8000/admin/stats', {
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
+        });
+        setStats(response.data.total);
+      } catch (err) {
+        setStats(null);
+      }
+    };
+
+    fetchStats();
+  }, []);
+
+  const figures = stats ? [
+    { label: 'Revenue', value: `₹${stats.revenue.toLocaleString()}` },
+    { label: 'Tickets Sold', value: stats.tickets.toLocaleString() },
+    { label: 'Bookings', value: stats.bookings.toLocaleString() },
+    { label: 'Fill Rate', value: `${(stats.fill_rate * 100).toFixed(1)}%` },
+  ] : [];
 
   const cards = [
     {
@@ -34,6 +61,20 @@ const Dashboard = () => {
       <Typography variant="h4" component="h1" gutterBottom sx={{ color: 'white', mb: 4 }}>
         Admin Dashboard
       </Typography>
+      {figures.length > 0 && (
+        <Grid container spacing={2} sx={{ mb: 4 }}>
+          {figures.map((figure) => (
+            <Grid item xs={6} md={3} key={figure.label}>
+              <Card sx={{ background: 'rgba(0, 0, 0, 0.5)', border: '1px solid rgba(255, 255, 255, 0.1)', color: 'white' }}>
+                <CardContent sx={{ textAlign: 'center' }}>
+                  <Typography variant="h5">{figure.value}</Typography>
+                  <Typography sx={{ color: 'rgba(255, 255, 255, 0.7)' }}>{figure.label}</Typography>
+                </CardContent>
+              </Card>
+            </Grid>
+          ))}
+        </Grid>
+      )}
       <Grid container spacing={4}>
         {cards.map((card) => (
           <Grid item xs={12} sm={6} md={4} key={card.title}>